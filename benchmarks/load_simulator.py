@@ -0,0 +1,149 @@
+"""
+Fleet load simulator: the chart-data request rate a fleet of kiosks puts
+on Superset, with and without staggering (dashboard_stagger.py).
+
+Every simulated kiosk comes back from the same power cut within
+--boot-spread seconds, loads its dashboard, switches to the next one at
+every rotation boundary (a load, as without pre-warmed tabs) and
+refreshes it in between:
+
+    fixed      Superset's auto-refresh timer (every --refresh-seconds after
+               the page loaded) and the shared wall-clock rotation boundaries
+    staggered  the controller's RefreshScheduler and the rotation shifted by
+               the kiosk's offset, both from its device ID ("kiosk-<n>")
+
+Every load and refresh fires one /api/v1/chart/data request per chart at
+the local Superset stand-in, like the browser does. Time runs --speed
+times faster than real time; the request rate is reported per simulated
+second from the stand-in's own request log.
+
+    python benchmarks/load_simulator.py --kiosks 50 --duration 1800 --speed 30
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from dashboard_stagger import RefreshScheduler, phase, rotation_offset_seconds  # noqa: E402
+from superset_standin import SupersetStandIn  # noqa: E402
+
+
+def kiosk_events(index, staggered, args, start):
+    """Simulated times of one kiosk's dashboard loads and refreshes, from start to start + duration."""
+    device = f"kiosk-{index}"
+    end = start + args.duration
+    now = start + random.uniform(0, args.boot_spread)
+    offset = rotation_offset_seconds(device, args.rotation_spread) if staggered else 0
+    refresher = None
+    if staggered:
+        refresher = RefreshScheduler(args.refresh_seconds, phase(device, "refresh"), args.jitter, clock=lambda: now)
+    events = [now]  # the first dashboard
+    auto_refresh_at = now + args.refresh_seconds
+    while True:
+        boundary = math.floor((now - offset) / args.switch_seconds + 1) * args.switch_seconds + offset
+        now = min(boundary, refresher.due_at if staggered else auto_refresh_at)
+        if now >= end:
+            return events
+        events.append(now)
+        if not staggered:
+            # Superset's timer starts over with every page load and refresh
+            auto_refresh_at = now + args.refresh_seconds
+        elif now != boundary:
+            refresher.mark_refreshed()
+
+
+def login(http, url):
+    """Log in to the stand-in; returns the Cookie header."""
+    response = http.request(
+        "POST", f"{url}/login/", redirect=False, encode_multipart=False,
+        fields={"username": "bench", "password": "bench"},
+    )
+    return response.headers["Set-Cookie"].split(";")[0]
+
+
+def run_scenario(standin, staggered, args):
+    # The power comes back halfway through a rotation slot
+    start = (math.floor(time.time() / args.switch_seconds) + 0.5) * args.switch_seconds
+    events = sorted(
+        (t, index) for index in range(args.kiosks) for t in kiosk_events(index, staggered, args, start)
+    )
+    http = urllib3.PoolManager(maxsize=args.kiosks * args.charts, block=False)
+    cookie = login(http, standin.url)
+    standin.state.reset_stats()
+
+    def fetch(index, chart):
+        form_data = json.dumps({"slice_id": chart, "kiosk": index})
+        http.request("GET", f"{standin.url}/api/v1/chart/data", fields={"form_data": form_data},
+                     headers={"Cookie": cookie})
+
+    real_start, wall_start = time.monotonic(), time.time()
+    with ThreadPoolExecutor(max_workers=min(512, args.kiosks * args.charts)) as pool:
+        for t, index in events:
+            delay = (t - start) / args.speed - (time.monotonic() - real_start)
+            if delay > 0:
+                time.sleep(delay)
+            # The browser fires every chart of the dashboard at once
+            for chart in range(args.charts):
+                pool.submit(fetch, index, chart)
+    elapsed = time.monotonic() - real_start
+
+    # Requests per simulated second, as the stand-in received them
+    per_second = {}
+    for received in standin.state.stats()["chart_data_times"]:
+        second = int((received - wall_start) * args.speed)
+        per_second[second] = per_second.get(second, 0) + 1
+    counts = sorted(per_second.values())
+    seconds = max(1, int(max(elapsed * args.speed, args.duration)))
+    return {
+        "requests": sum(counts),
+        "peak_per_second": counts[-1] if counts else 0,
+        "p99_per_second": counts[int(0.99 * (len(counts) - 1))] if counts else 0,
+        "mean_per_second": sum(counts) / seconds,
+        "busy_seconds": len(counts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a kiosk fleet's load on Superset.")
+    parser.add_argument("--kiosks", type=int, default=50)
+    parser.add_argument("--charts", type=int, default=6, help="charts per dashboard")
+    parser.add_argument("--duration", type=float, default=1800, help="simulated seconds")
+    parser.add_argument("--speed", type=float, default=30, help="simulated seconds per real second")
+    parser.add_argument("--boot-spread", type=float, default=20,
+                        help="the kiosks come back from the power cut within this many seconds")
+    parser.add_argument("--refresh-seconds", type=float, default=300)
+    parser.add_argument("--switch-seconds", type=float, default=900)
+    parser.add_argument("--jitter", type=float, default=15, help="staggered: jitter per refresh")
+    parser.add_argument("--rotation-spread", type=float, default=60, help="staggered: rotation offsets up to")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in chart-data latency in seconds")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with SupersetStandIn(charts=args.charts, latency=args.latency) as standin:
+        for name, staggered in (("fixed", False), ("staggered", True)):
+            print(f"Simulating {args.kiosks} kiosks, {name} ({args.duration / args.speed:.0f}s)...")
+            results[name] = run_scenario(standin, staggered, args)
+
+    print(f"\n{'':<12}{'requests':>10}{'peak/s':>10}{'p99/s':>10}{'mean/s':>10}{'busy s':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<12}{result['requests']:>10}{result['peak_per_second']:>10}{result['p99_per_second']:>10}"
+            f"{result['mean_per_second']:>10.2f}{result['busy_seconds']:>10}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
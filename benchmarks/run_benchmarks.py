@@ -0,0 +1,321 @@
+"""
+Offline benchmarks for the dashboard workflows.
+
+Starts the local Superset stand-in, points open_dashboard_1.py and
+open_dashboard_3.py at it through a temporary credentials file and runs
+their load_dashboard setup flows in headless Chromium. Reports
+time-to-dashboard, time per step, dashboard switch latency and browser
+memory, as a table and optionally as JSON for comparing runs. The
+freshness benchmark needs no browser: it times the REST API poll of
+dashboard_freshness.py and checks that a dataset refresh is detected.
+The page-weight benchmark loads a dashboard in a new browser the way the
+kiosks used to (a fresh profile, nothing blocked) and the way they do now
+(the persistent profile of an earlier browser, dashboard_network.py's
+blocklist) and reports the bytes and time-to-dashboard of each; use
+--link-kbps to play a slow office link.
+
+    python benchmarks/run_benchmarks.py --runs 3 --latency 0.5 --output bench.json
+    python benchmarks/run_benchmarks.py --variant page_weight --link-kbps 8000
+
+The monitoring part of load_dashboard loops forever, so only the steps
+up to "dashboard on screen" are timed.
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import urllib3
+from selenium import webdriver
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from dashboard_freshness import FreshnessPoller, SupersetApi  # noqa: E402
+from dashboard_log import configure_logging  # noqa: E402
+from dashboard_memory import MemoryWatchdog  # noqa: E402
+from dashboard_network import DEFAULT_BLOCKED_URLS, install_request_blocking, page_transfer  # noqa: E402
+from dashboard_readiness import install_request_tracker, wait_for_dashboard_ready  # noqa: E402
+from dashboard_session import cookie_header  # noqa: E402
+from superset_standin import DEFAULT_DASHBOARDS, SupersetStandIn  # noqa: E402
+
+CHROMIUM_BINARIES = ["/usr/bin/chromium-browser", "/usr/bin/chromium"]
+
+
+def start_headless_browser(profile_dir=None, cache_size_mb=None):
+    """Same switches as the kiosk, but headless and at a fixed window size."""
+    options = webdriver.ChromeOptions()
+    for binary in CHROMIUM_BINARIES:
+        if os.path.exists(binary):
+            options.binary_location = binary
+            break
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-background-timer-throttling")
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={profile_dir}")
+    if cache_size_mb:
+        options.add_argument(f"--disk-cache-size={cache_size_mb * 1024 * 1024}")
+    service = None
+    if shutil.which("chromedriver"):
+        service = webdriver.ChromeService(shutil.which("chromedriver"))
+    driver = webdriver.Chrome(options=options, service=service)
+    install_request_tracker(driver)
+    return driver
+
+
+def load_variant(name, credential_lines, workdir):
+    """Import a variant against a temporary credentials file and session store."""
+    credentials = os.path.join(workdir, f"{name}_credentials.txt")
+    with open(credentials, "w") as f:
+        f.write("\n".join(credential_lines) + "\n")
+    os.environ["DASHBOARD_CREDENTIALS_FILE"] = credentials
+    sys.modules.pop(name, None)
+    module = importlib.import_module(name)
+    module.SESSION_FILE = os.path.join(workdir, f"{name}_session.json")
+    return module
+
+
+def timed(timings, step, func, *args):
+    start = time.monotonic()
+    result = func(*args)
+    timings[step] = time.monotonic() - start
+    return result
+
+
+def memory_mb(driver):
+    sample = MemoryWatchdog(budget_mb=0).sample(driver)
+    return sample["pss_mb"] if sample else None
+
+
+def bench_variant_1(standin, workdir, cached_session):
+    dashboard = DEFAULT_DASHBOARDS[0]
+    module = load_variant("open_dashboard_1", [
+        f"{standin.url}/login/",
+        standin.dashboard_url(dashboard["slug"]),
+        standin.state.username,
+        standin.state.password,
+        dashboard["title"],
+    ], workdir)
+    if not cached_session and os.path.exists(module.SESSION_FILE):
+        os.remove(module.SESSION_FILE)
+
+    driver = start_headless_browser()
+    try:
+        steps = {}
+        timed(steps, "login", module.ensure_logged_in, driver)
+
+        # URL-state fast path: one navigation, then the auto-refresh modal
+        timed(steps, "open_dashboard_fast", module.open_dashboard_fast, driver)
+        timed(steps, "set_auto_refresh", module.set_auto_refresh, driver)
+        time_to_dashboard = steps["login"] + steps["open_dashboard_fast"] + steps["set_auto_refresh"]
+
+        # Click-through workflow, for comparison
+        timed(steps, "open_dashboard", module.open_dashboard_page, driver)
+        timed(steps, "enter_fullscreen", module.enter_fullscreen, driver)
+        timed(steps, "apply_week_filter", module.apply_week_filter, driver)
+        timed(steps, "set_auto_refresh_clicks", module.set_auto_refresh, driver)
+        time_to_dashboard_clicks = steps["login"] + sum(
+            steps[k] for k in ("open_dashboard", "enter_fullscreen", "apply_week_filter", "set_auto_refresh_clicks")
+        )
+        return {
+            "time_to_dashboard": time_to_dashboard,
+            "time_to_dashboard_clicks": time_to_dashboard_clicks,
+            "steps": steps,
+            "memory_pss_mb": memory_mb(driver),
+        }
+    finally:
+        driver.quit()
+
+
+def bench_variant_3(standin, workdir, cached_session):
+    lines = [standin.state.username, standin.state.password, f"{standin.url}/login/"]
+    for dashboard in standin.state.dashboards[:4]:
+        lines += [dashboard["title"], standin.dashboard_url(dashboard["slug"])]
+    module = load_variant("open_dashboard_3", lines, workdir)
+    if not cached_session and os.path.exists(module.SESSION_FILE):
+        os.remove(module.SESSION_FILE)
+
+    driver = start_headless_browser()
+    try:
+        steps = {}
+        timed(steps, "login", module.ensure_logged_in, driver)
+        timed(steps, "switch_to_dashboard", module.switch_to_dashboard, driver, module.DASHBOARDS[0])
+        time_to_dashboard = steps["login"] + steps["switch_to_dashboard"]
+
+        # Reload-based rotation: every switch is a full switch_to_dashboard
+        reload_switches = []
+        for dashboard in module.DASHBOARDS[1:]:
+            start = time.monotonic()
+            module.switch_to_dashboard(driver, dashboard)
+            reload_switches.append(time.monotonic() - start)
+
+        # Pre-warmed tabs: open once, then rotate by switching tabs
+        tabs = timed(steps, "open_dashboard_tabs", module.open_dashboard_tabs, driver)
+        tab_switches = []
+        for dashboard in module.DASHBOARDS * 2:
+            start = time.monotonic()
+            module.show_dashboard_tab(driver, tabs, dashboard)
+            tab_switches.append(time.monotonic() - start)
+
+        return {
+            "time_to_dashboard": time_to_dashboard,
+            "steps": steps,
+            "switch_latency_reload": statistics.median(reload_switches),
+            "switch_latency_tab": statistics.median(tab_switches),
+            "memory_pss_mb": memory_mb(driver),
+        }
+    finally:
+        driver.quit()
+
+
+def api_login(standin):
+    """Log in to the stand-in without a browser; returns the session cookies."""
+    response = urllib3.PoolManager().request(
+        "POST", f"{standin.url}/login/", redirect=False, encode_multipart=False,
+        fields={"username": standin.state.username, "password": standin.state.password},
+    )
+    name, _, value = response.headers["Set-Cookie"].split(";")[0].partition("=")
+    return [{"name": name, "value": value}]
+
+
+def load_once(standin, profile_dir, blocked_urls):
+    """One dashboard load in a new browser: (seconds to ready, transfer)."""
+    driver = start_headless_browser(profile_dir, cache_size_mb=100)
+    try:
+        install_request_blocking(driver, blocked_urls)
+        # Log in through the cookie, so only the dashboard load is measured
+        driver.get(f"{standin.url}/health")
+        for cookie in api_login(standin):
+            driver.add_cookie(cookie)
+        start = time.monotonic()
+        driver.get(standin.dashboard_url(standin.state.dashboards[0]["slug"]))
+        wait_for_dashboard_ready(driver, 120)
+        return time.monotonic() - start, page_transfer(driver)
+    finally:
+        driver.quit()
+
+
+def bench_page_weight(standin, workdir, cached_session):
+    result = {}
+    # Before: a throwaway profile every start, nothing blocked
+    with tempfile.TemporaryDirectory(dir=workdir) as profile_dir:
+        seconds, transfer = load_once(standin, profile_dir, [])
+    result.update(time_to_dashboard_before=seconds, transfer_mb_before=transfer["bytes"] / 1e6,
+                  requests_before=transfer["requests"])
+    # After: the profile (and cache) of the last browser, with the blocklist
+    profile_dir = os.path.join(workdir, "persistent-profile")
+    if not os.path.isdir(profile_dir):
+        load_once(standin, profile_dir, DEFAULT_BLOCKED_URLS)
+    seconds, transfer = load_once(standin, profile_dir, DEFAULT_BLOCKED_URLS)
+    result.update(time_to_dashboard_after=seconds, transfer_mb_after=transfer["bytes"] / 1e6,
+                  requests_after=transfer["requests"], cache_hits_after=transfer["cached"])
+    return result
+
+
+def bench_freshness(standin, workdir, cached_session):
+    dashboards = [
+        {"title": d["title"], "url": standin.dashboard_url(d["slug"])} for d in standin.state.dashboards
+    ]
+    cookies = api_login(standin)
+    api = SupersetApi(standin.url, cookies)
+    poller = FreshnessPoller(api, dashboards)
+    try:
+        polls = []
+        for _ in range(5):
+            start = time.monotonic()
+            stale = poller.poll()
+            polls.append(time.monotonic() - start)
+            if stale:
+                raise RuntimeError(f"Unchanged dashboards reported stale: {stale}")
+
+        # An ETL job refreshes the first dashboard's dataset
+        urllib3.PoolManager().request(
+            "PUT", f"{standin.url}/api/v1/dataset/1/refresh",
+            headers={"Cookie": cookie_header(cookies)},
+        )
+        start = time.monotonic()
+        stale = poller.poll()
+        detect = time.monotonic() - start
+        if stale != {dashboards[0]["url"]: "data"}:
+            raise RuntimeError(f"Dataset refresh not detected correctly: {stale}")
+        return {"poll_latency": statistics.median(polls), "detect_latency": detect}
+    finally:
+        api.close()
+
+
+BENCHMARKS = {
+    "open_dashboard_1": bench_variant_1,
+    "open_dashboard_3": bench_variant_3,
+    "freshness": bench_freshness,
+    "page_weight": bench_page_weight,
+}
+
+
+def summarise(runs):
+    """Median of every numeric metric across runs (steps flattened)."""
+    flat = []
+    for run in runs:
+        row = {k: v for k, v in run.items() if k != "steps" and v is not None}
+        row.update({f"step.{k}": v for k, v in run.get("steps", {}).items()})
+        flat.append(row)
+    keys = sorted({k for row in flat for k in row})
+    return {k: statistics.median(row[k] for row in flat if k in row) for k in keys}
+
+
+def print_report(results):
+    for name, result in results.items():
+        print(f"\n{name} ({result['runs']} runs, medians)")
+        for metric, value in result["median"].items():
+            if metric.startswith(("memory", "transfer")):
+                unit = "MB"
+            elif metric.startswith(("requests", "cache_hits")):
+                unit = ""
+            else:
+                unit = "s"
+            print(f"  {metric:<32} {value:10.3f} {unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard workflows offline.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--charts", type=int, default=6, help="charts per dashboard")
+    parser.add_argument("--latency", type=float, default=0.2, help="chart-data latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--bundle-kb", type=int, default=1024, help="size of the stand-in's JS bundle")
+    parser.add_argument("--link-kbps", type=float, default=0,
+                        help="stand-in responses at this rate, like a slow office link (0: unlimited)")
+    parser.add_argument("--variant", choices=sorted(BENCHMARKS), action="append",
+                        help="only run these variants (default: all)")
+    parser.add_argument("--cached-session", action="store_true",
+                        help="reuse the session saved by the first run (measures restarts)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    parser.add_argument("--log-file", help="keep the scripts' log here (default: discarded)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir, \
+            SupersetStandIn(charts=args.charts, latency=args.latency, jitter=args.jitter,
+                            bundle_kb=args.bundle_kb, link_kbps=args.link_kbps) as standin:
+        configure_logging(args.log_file or os.path.join(workdir, "python_log.txt"))
+        for name in args.variant or sorted(BENCHMARKS):
+            runs = []
+            for i in range(args.runs):
+                runs.append(BENCHMARKS[name](standin, workdir, args.cached_session and i > 0))
+            results[name] = {"runs": len(runs), "median": summarise(runs), "all": runs}
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,506 @@
+"""
+Local Superset stand-in for the benchmarks.
+
+Serves just enough of Superset for the dashboard scripts to run their
+whole workflow offline: the login form, /api/v1/me/, dashboards with the
+"Menu actions trigger" menu, "Enter fullscreen", the refresh-interval
+modal, the Week filter combobox, the filter bar buttons and a grid of
+charts (each with a "Force refresh" menu) that fetch /api/v1/chart/data
+with a configurable latency and error rate. The REST API also lists each
+dashboard's charts and datasets with their changed_on, for the freshness
+poller; dataset N belongs to the Nth dashboard and its changed_on moves
+every --data-update-seconds or on PUT /api/v1/dataset/<id>/refresh.
+
+Like Superset, every dashboard page also loads a JS bundle (--bundle-kb,
+cacheable for a year under /static/assets/), a web font, the user's
+avatar and posts UI events to /superset/log/. --link-kbps sends every
+response at that rate, like a slow office link.
+
+Run on its own to poke at it in a browser:
+
+    python benchmarks/superset_standin.py --port 8088 --latency 0.5
+"""
+import argparse
+import html
+from datetime import datetime, timezone
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_DASHBOARDS = [
+    {"slug": "alert-threshold", "title": "Threshold-based Alert Program"},
+    {"slug": "excess-mortality", "title": "Excess Mortality"},
+    {"slug": "nd1-data", "title": "ND1 Data"},
+    {"slug": "nd2-data", "title": "ND2 Data"},
+]
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Superset</title></head>
+<body>
+  <form method="post" action="/login/%(next)s">
+    <input type="text" name="username">
+    <input type="password" name="password">
+    <input type="submit" value="Sign in">
+  </form>
+</body></html>
+"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><title>%(title)s</title>
+<style>
+  #menu, .ant-modal, #interval-options, .chart-menu { display: none; }
+  #menu.open, .ant-modal.open, #interval-options.open, .chart-menu.open { display: block; }
+  body.standalone .app-nav { display: none; }
+  #filter-bar.collapsed { width: 0; overflow: hidden; }
+  .dashboard-component-chart-holder { display: inline-block; width: 30%%; height: 200px; margin: 4px; }
+  @font-face { font-family: Inter; src: url('/static/assets/fonts/inter.woff2') format('woff2'); }
+  body { font-family: Inter, sans-serif; }
+</style>
+<script src="/static/assets/superset-bundle.js"></script></head>
+<body>
+  <header>
+    <div class="app-nav">Superset <img class="avatar" src="/api/v1/user/1/avatar.png" alt=""></div>
+    <h1>%(title)s</h1>
+    <button aria-label="Menu actions trigger" id="menu-trigger">...</button>
+    <ul id="menu" role="menu">
+      <li id="refresh-dashboard">Refresh dashboard</li>
+      <li id="fullscreen">Enter fullscreen</li>
+      <li><span id="auto-refresh">Set auto-refresh interval</span></li>
+    </ul>
+  </header>
+  <aside id="filter-bar">
+    <div aria-label="Week">
+      <h4>Week</h4>
+      <div class="tags"></div>
+      <input role="combobox" id="week-input">
+    </div>
+    <button data-test="filter-bar__apply-button" id="apply" disabled>Apply filters</button>
+    <button data-test="filter-bar__collapse-button" class="superset-button-link" id="collapse">Collapse</button>
+  </aside>
+  <div class="ant-modal" id="refresh-modal">
+    <div aria-label="Refresh interval" id="interval-select">Don't refresh</div>
+    <div id="interval-options">
+      <div class="ant-select-item-option-content">1 minute</div>
+      <div class="ant-select-item-option-content">5 minutes</div>
+      <div class="ant-select-item-option-content">10 minutes</div>
+    </div>
+    <button class="superset-button-primary" id="save-refresh"><span>Save for this session</span></button>
+  </div>
+  <div class="grid-container" data-test="grid-container"></div>
+<script>
+(function () {
+  var charts = %(charts)d;
+  var grid = document.querySelector('.grid-container');
+  var refreshTimer = null;
+  if (location.search.indexOf('standalone') !== -1) { document.body.className = 'standalone'; }
+
+  function loadChart(holder, sliceId) {
+    var body = holder.querySelector('.chart-body');
+    body.innerHTML = '<div class="loading" data-test="loading-indicator"></div>';
+    var formData = encodeURIComponent(JSON.stringify({slice_id: sliceId}));
+    fetch('/api/v1/chart/data?form_data=' + formData, {method: 'POST', credentials: 'same-origin'})
+      .then(function (r) { if (!r.ok) { throw new Error(r.status); } return r.json(); })
+      .then(function (data) {
+        body.innerHTML = '<div class="chart">' + data.result[0].data.length + ' rows</div>';
+      })
+      .catch(function () {
+        body.innerHTML = '<div class="ant-alert-error">Error loading chart</div>';
+      });
+  }
+  function loadCharts() {
+    var holders = document.querySelectorAll('[data-test="chart-grid-component"]');
+    for (var i = 0; i < holders.length; i++) { loadChart(holders[i], i + 1); }
+  }
+  function addChart(sliceId) {
+    var holder = document.createElement('div');
+    holder.setAttribute('data-test', 'chart-grid-component');
+    holder.className = 'dashboard-component-chart-holder';
+    holder.innerHTML =
+      '<div class="chart-slice" data-test-chart-id="' + sliceId + '">' +
+      '<button aria-label="More Options">...</button>' +
+      '<ul class="chart-menu"><li data-test="refresh-chart-menu-item">Force refresh</li></ul>' +
+      '<div class="chart-body"></div></div>';
+    var chartMenu = holder.querySelector('.chart-menu');
+    holder.querySelector('[aria-label="More Options"]').onclick = function () { chartMenu.classList.toggle('open'); };
+    chartMenu.firstChild.onclick = function () { chartMenu.classList.remove('open'); loadChart(holder, sliceId); };
+    grid.appendChild(holder);
+  }
+  for (var i = 0; i < charts; i++) { addChart(i + 1); }
+  // Mount the grid "asynchronously" like the real SPA
+  setTimeout(loadCharts, 100);
+  // UI event logging, like Superset's
+  fetch('/superset/log/?explode=events', {method: 'POST', credentials: 'same-origin',
+    body: JSON.stringify([{event_name: 'mount_dashboard', ts: Date.now()}])}).catch(function () {});
+
+  var menu = document.getElementById('menu');
+  document.getElementById('menu-trigger').onclick = function () { menu.classList.toggle('open'); };
+  document.getElementById('refresh-dashboard').onclick = function () { menu.classList.remove('open'); loadCharts(); };
+  document.getElementById('fullscreen').onclick = function () {
+    var sep = location.search ? '&' : '?';
+    location.replace(location.pathname + location.search + sep + 'standalone=1');
+  };
+  document.getElementById('auto-refresh').onclick = function () {
+    menu.classList.remove('open');
+    document.getElementById('refresh-modal').classList.add('open');
+  };
+  document.getElementById('interval-select').onclick = function () {
+    document.getElementById('interval-options').classList.add('open');
+  };
+  var options = document.querySelectorAll('#interval-options .ant-select-item-option-content');
+  for (var j = 0; j < options.length; j++) {
+    options[j].onclick = function (e) {
+      document.getElementById('interval-select').textContent = e.target.textContent;
+      document.getElementById('interval-options').classList.remove('open');
+    };
+  }
+  document.getElementById('save-refresh').onclick = function () {
+    var minutes = parseInt(document.getElementById('interval-select').textContent, 10);
+    if (refreshTimer) { clearInterval(refreshTimer); }
+    if (minutes) { refreshTimer = setInterval(loadCharts, minutes * 60000); }
+    document.getElementById('refresh-modal').classList.remove('open');
+  };
+
+  var input = document.getElementById('week-input');
+  var tags = document.querySelector('[aria-label="Week"] .tags');
+  var apply = document.getElementById('apply');
+  function setTag(value) {
+    tags.innerHTML = '<span class="tag-content">' + value + '</span><span aria-label="close">x</span>';
+    tags.querySelector('[aria-label="close"]').onclick = function () { tags.innerHTML = ''; apply.disabled = false; };
+  }
+  input.addEventListener('keydown', function (e) {
+    if (e.key !== 'Enter') { return; }
+    setTag(input.value);
+    input.value = '';
+    apply.disabled = false;
+  });
+
+  // URL state, like Superset: expand_filters=0 and rison native_filters
+  var params = new URLSearchParams(location.search);
+  if (params.get('expand_filters') === '0') {
+    document.getElementById('filter-bar').className = 'collapsed';
+  }
+  var nativeFilters = params.get('native_filters') || '';
+  var selected = nativeFilters.match(/filterState:\(value:!\('([^']*)'/);
+  if (selected) { setTag(selected[1]); }
+  apply.onclick = function () { apply.disabled = true; loadCharts(); };
+  document.getElementById('collapse').onclick = function () {
+    document.getElementById('filter-bar').style.display = 'none';
+  };
+})();
+</script>
+</body></html>
+"""
+
+
+class StandInState:
+    """Configuration and request counters shared by all handler threads."""
+
+    def __init__(self, username, password, dashboards, charts, latency, jitter, error_rate=0.0,
+                 data_update_seconds=0, bundle_kb=1024, link_kbps=0):
+        self.username = username
+        self.password = password
+        self.dashboards = dashboards
+        self.charts = charts
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.data_update_seconds = data_update_seconds
+        self.link_kbps = link_kbps  # 0: as fast as the loopback goes
+        self.assets = {
+            "/static/assets/superset-bundle.js": (
+                b"/*" + b"superset" * (bundle_kb * 128) + b"*/ window.__standinBundle = true;\n",
+                "application/javascript",
+            ),
+            "/static/assets/fonts/inter.woff2": (bytes(100 * 1024), "font/woff2"),
+        }
+        self.started_at = time.time()
+        self.dataset_touched = {}  # dataset id -> time of the last PUT .../refresh
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.chart_data_times = []
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            return {"counts": dict(self.counts), "chart_data_times": list(self.chart_data_times)}
+
+    def dataset_changed_on(self, dataset_id):
+        """When the dataset last changed: the last periodic update or explicit refresh."""
+        changed = self.started_at
+        if self.data_update_seconds:
+            periods = (time.time() - self.started_at) // self.data_update_seconds
+            changed += periods * self.data_update_seconds
+        with self.lock:
+            changed = max(changed, self.dataset_touched.get(dataset_id, 0))
+        return datetime.fromtimestamp(changed, timezone.utc).isoformat()
+
+    def touch_dataset(self, dataset_id):
+        with self.lock:
+            self.dataset_touched[dataset_id] = time.time()
+
+    def reset_stats(self):
+        with self.lock:
+            self.counts.clear()
+            self.chart_data_times.clear()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    state = None  # set by SupersetStandIn
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    # ---- helpers ----
+
+    def _logged_in(self):
+        cookie = self.headers.get("Cookie", "")
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "session" and value in self.state.sessions:
+                return True
+        return False
+
+    def _send(self, status, body, content_type="text/html", headers=None):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not self.state.link_kbps:
+            self.wfile.write(data)
+            return
+        chunk = 16 * 1024
+        for start in range(0, len(data), chunk):
+            self.wfile.write(data[start:start + chunk])
+            time.sleep(len(data[start:start + chunk]) * 8 / (self.state.link_kbps * 1000))
+
+    def _redirect(self, location, headers=None):
+        self._send(302, "", headers=dict(headers or {}, Location=location))
+
+    def _json(self, status, payload):
+        self._send(status, json.dumps(payload), "application/json")
+
+    # ---- routes ----
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path
+        self.state.count(path if not path.startswith("/superset/dashboard/") else "dashboard")
+
+        if path == "/health":
+            return self._send(200, "OK", "text/plain")
+        if path == "/standin/stats":
+            return self._json(200, self.state.stats())
+        if path in self.state.assets:
+            # Hashed file names in Superset: cacheable for good
+            body, content_type = self.state.assets[path]
+            return self._send(200, body, content_type, {"Cache-Control": "public, max-age=31536000, immutable"})
+        if path.rstrip("/") == "/login":
+            if self._logged_in():
+                return self._redirect("/superset/welcome/")
+            query = f"?{url.query}" if url.query else ""
+            return self._send(200, LOGIN_PAGE % {"next": html.escape(query)})
+        if path == "/api/v1/me/":
+            if self._logged_in():
+                return self._json(200, {"result": {"username": self.state.username}})
+            return self._json(401, {"msg": "Not authorized"})
+        if not self._logged_in():
+            return self._redirect(f"/login/?next={path}")
+        if path.rstrip("/") == "/superset/welcome":
+            # The landing page is the first dashboard (like variant 2 expects)
+            return self._redirect(f"/superset/dashboard/{self.state.dashboards[0]['slug']}/")
+        if path.startswith("/api/v1/dashboard/"):
+            slug, _, sub = path[len("/api/v1/dashboard/"):].strip("/").partition("/")
+            if sub == "charts":
+                return self._dashboard_charts(slug)
+            return self._dashboard_api(slug)
+        if path.startswith("/api/v1/dataset/"):
+            return self._dataset(path[len("/api/v1/dataset/"):].strip("/"))
+        if path.startswith("/superset/dashboard/"):
+            slug = path[len("/superset/dashboard/"):].strip("/")
+            for dashboard in self.state.dashboards:
+                if dashboard["slug"] == slug:
+                    return self._send(200, DASHBOARD_PAGE % {
+                        "title": html.escape(dashboard["title"]),
+                        "charts": self.state.charts,
+                    })
+            return self._send(404, "Not found")
+        if path.startswith("/api/v1/chart/data"):
+            return self._chart_data()
+        if path.startswith("/api/v1/user/") and path.endswith("/avatar.png"):
+            return self._send(200, bytes(20 * 1024), "image/png", {"Cache-Control": "no-store"})
+        return self._send(404, "Not found")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        path = url.path
+        self.state.count(path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+
+        if path.rstrip("/") == "/login":
+            form = parse_qs(body)
+            if (form.get("username", [""])[0] == self.state.username
+                    and form.get("password", [""])[0] == self.state.password):
+                token = secrets.token_hex(16)
+                self.state.sessions.add(token)
+                next_url = parse_qs(url.query).get("next", ["/superset/welcome/"])[0]
+                return self._redirect(next_url, {
+                    "Set-Cookie": f"session={token}; Path=/; HttpOnly; SameSite=Lax",
+                })
+            return self._send(200, LOGIN_PAGE % {"next": ""})
+        if path.startswith("/api/v1/chart/data"):
+            if not self._logged_in():
+                return self._json(401, {"msg": "Not authorized"})
+            return self._chart_data()
+        if path.rstrip("/") == "/superset/log":
+            return self._json(200, {})
+        return self._send(404, "Not found")
+
+    def do_PUT(self):
+        path = urlparse(self.path).path
+        self.state.count(path)
+        if not self._logged_in():
+            return self._json(401, {"msg": "Not authorized"})
+        parts = path.strip("/").split("/")
+        # PUT /api/v1/dataset/<id>/refresh, like an ETL job would call
+        if parts[:3] == ["api", "v1", "dataset"] and len(parts) == 5 and parts[4] == "refresh":
+            if parts[3].isdigit() and 0 < int(parts[3]) <= len(self.state.dashboards):
+                self.state.touch_dataset(int(parts[3]))
+                return self._json(200, {"message": "OK"})
+        return self._json(404, {"message": "Not found"})
+
+    def _dashboard_charts(self, slug):
+        for index, dashboard in enumerate(self.state.dashboards):
+            if dashboard["slug"] == slug:
+                changed_on = datetime.fromtimestamp(self.state.started_at, timezone.utc).isoformat()
+                return self._json(200, {"result": [
+                    {
+                        "id": slice_id,
+                        "slice_name": f"Chart {slice_id}",
+                        "changed_on": changed_on,
+                        "form_data": {"slice_id": slice_id, "datasource": f"{index + 1}__table"},
+                    }
+                    for slice_id in range(1, self.state.charts + 1)
+                ]})
+        return self._json(404, {"message": "Not found"})
+
+    def _dataset(self, dataset_id):
+        if dataset_id.isdigit() and 0 < int(dataset_id) <= len(self.state.dashboards):
+            return self._json(200, {"result": {
+                "id": int(dataset_id),
+                "table_name": f"table_{dataset_id}",
+                "changed_on": self.state.dataset_changed_on(int(dataset_id)),
+            }})
+        return self._json(404, {"message": "Not found"})
+
+    def _dashboard_api(self, slug):
+        for dashboard in self.state.dashboards:
+            if dashboard["slug"] == slug:
+                metadata = {"native_filter_configuration": [{
+                    "id": "NATIVE_FILTER-week",
+                    "name": "Week",
+                    "filterType": "filter_select",
+                    "targets": [{"datasetId": 1, "column": {"name": "week"}}],
+                }]}
+                return self._json(200, {"result": {
+                    "slug": slug,
+                    "dashboard_title": dashboard["title"],
+                    "json_metadata": json.dumps(metadata),
+                }})
+        return self._json(404, {"message": "Not found"})
+
+    def _chart_data(self):
+        with self.state.lock:
+            self.state.chart_data_times.append(time.time())
+        delay = self.state.latency + random.uniform(0, self.state.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.state.error_rate:
+            return self._json(500, {"message": "Stand-in chart error"})
+        rows = [{"value": random.random()} for _ in range(10)]
+        return self._json(200, {"result": [{"data": rows}]})
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # A whole simulated fleet connects in the same instant (load_simulator.py)
+    request_queue_size = 512
+
+
+class SupersetStandIn:
+    """A stand-in Superset server on a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, username="bench", password="bench",
+                 dashboards=None, charts=6, latency=0.2, jitter=0.0, error_rate=0.0,
+                 data_update_seconds=0, bundle_kb=1024, link_kbps=0):
+        self.state = StandInState(
+            username, password, dashboards or DEFAULT_DASHBOARDS, charts, latency, jitter, error_rate,
+            data_update_seconds, bundle_kb, link_kbps,
+        )
+        handler = type("BoundStandInHandler", (StandInHandler,), {"state": self.state})
+        self.server = StandInServer((host, port), handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def dashboard_url(self, slug):
+        return f"{self.url}/superset/dashboard/{slug}/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local Superset stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--charts", type=int, default=6, help="charts per dashboard")
+    parser.add_argument("--latency", type=float, default=0.2, help="chart-data latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of chart-data requests that fail with a 500")
+    parser.add_argument("--data-update-seconds", type=float, default=0,
+                        help="move every dataset's changed_on this often (0: only on PUT .../refresh)")
+    parser.add_argument("--bundle-kb", type=int, default=1024, help="size of the JS bundle every dashboard loads")
+    parser.add_argument("--link-kbps", type=float, default=0, help="send responses at this rate (0: unlimited)")
+    args = parser.parse_args()
+
+    standin = SupersetStandIn(args.host, args.port, charts=args.charts,
+                              latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              data_update_seconds=args.data_update_seconds,
+                              bundle_kb=args.bundle_kb, link_kbps=args.link_kbps)
+    print(f"Superset stand-in on {standin.url} (login bench/bench). Ctrl+C to stop.")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Cold-boot fast path: splash page, parallel start-up and the boot timeline.
+
+After a power cut the TVs stayed blank while every step ran one after
+the other: Chromium's cold start, the wait for Superset, the session
+check, the login and (variant 3) every dashboard tab. Now:
+
+- the connectivity probe starts before the browser, so Superset is
+  probed while Chromium starts;
+- Chromium starts on a local splash page (a data: URL, no network
+  needed) that says what the kiosk is doing;
+- the cached session is checked in a background thread the moment
+  Superset answers, so ensure_logged_in() usually has its answer before
+  the browser is ready;
+- variant 3 opens the dashboard of the current slot first and loads the
+  other tabs behind it.
+
+BootPipeline records when each phase was reached, counted from the start
+of the process, and logs the timeline once the first dashboard is on
+screen:
+
+    Boot timeline: browser +2.1s, superset_reachable +3.0s, logged_in +3.4s, first_dashboard +9.8s
+    Time to first dashboard: 9.8s (54.3s after power-on)
+"""
+import base64
+import html
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from selenium.common.exceptions import WebDriverException
+
+from dashboard_log import log_message
+from dashboard_metrics import observe, set_gauge, set_info
+from dashboard_session import SESSION_CHECK_TIMEOUT_SECONDS, session_is_valid
+
+# A process that starts this soon after the kernel booted is a cold boot,
+# and its timeline is also reported from power-on
+COLD_BOOT_SECONDS = 600
+
+SPLASH_TITLE = "Dashboard kiosk"
+SPLASH_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s</title>
+<style>
+  html, body { margin: 0; height: 100%%; background: #101820; color: #e8eef2;
+               font-family: sans-serif; overflow: hidden; }
+  .splash { height: 100%%; display: flex; flex-direction: column; align-items: center; justify-content: center; }
+  .spinner { width: 48px; height: 48px; border: 5px solid #2c3e50; border-top-color: #20a7c9;
+             border-radius: 50%%; animation: spin 1s linear infinite; }
+  @keyframes spin { to { transform: rotate(360deg); } }
+  h1 { font-weight: 300; margin: 32px 0 8px; }
+  p { color: #9fb3c8; margin: 0; }
+</style></head>
+<body><div class="splash"><div class="spinner"></div><h1>%(heading)s</h1><p id="status">%(status)s</p></div></body></html>
+"""
+
+SET_SPLASH_STATUS_JS = """
+if (document.title === arguments[0]) { document.getElementById('status').textContent = arguments[1]; }
+"""
+
+
+def splash_url(status, heading="Starting dashboards"):
+    """The splash page as a data: URL Chromium can show without any network."""
+    page = SPLASH_PAGE % {
+        "title": SPLASH_TITLE, "heading": html.escape(heading), "status": html.escape(status),
+    }
+    return "data:text/html;base64," + base64.b64encode(page.encode()).decode()
+
+
+def set_splash_status(driver, status):
+    """Change the line under the splash heading; does nothing once a dashboard is open."""
+    try:
+        driver.execute_script(SET_SPLASH_STATUS_JS, SPLASH_TITLE, status)
+    except WebDriverException:
+        pass
+
+
+def _boot_clock():
+    """Seconds since the kernel booted (the clock /proc/<pid>/stat counts in)."""
+    return time.clock_gettime(time.CLOCK_BOOTTIME)
+
+
+def process_started_at():
+    """When this process started, in seconds since the kernel booted, or None."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            stat = f.read()
+        # starttime is field 22; the fields after the command name start at field 3
+        return int(stat[stat.rfind(")") + 2:].split()[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class BootPipeline:
+    """Phases of the start-up until the first dashboard is on screen; see the module docstring."""
+
+    def __init__(self, cold_boot_seconds=COLD_BOOT_SECONDS):
+        started_at = process_started_at()
+        self.started_at = started_at if started_at is not None else _boot_clock()
+        self.cold_boot = self.started_at <= cold_boot_seconds
+        self.phases = {}
+        self.done = False
+        self._session_check = None  # (cookies, Future) of the early session check
+
+    def elapsed(self):
+        return _boot_clock() - self.started_at
+
+    def mark(self, phase, at=None):
+        """Record that phase was reached (now, or at a time.monotonic() value); only the first time counts."""
+        if self.done or phase in self.phases:
+            return
+        elapsed = self.elapsed()
+        if at is not None:
+            elapsed -= time.monotonic() - at
+        self.phases[phase] = max(0.0, elapsed)
+
+    def finish(self):
+        """The first dashboard is on screen: log and export the timeline (once)."""
+        if self.done:
+            return
+        self.mark("first_dashboard")
+        self.done = True
+        self._session_check = None
+        total = self.phases["first_dashboard"]
+        log_message("Boot timeline: " + ", ".join(
+            f"{phase} +{seconds:.1f}s" for phase, seconds in sorted(self.phases.items(), key=lambda p: p[1])
+        ))
+        since_power_on = f" ({self.started_at + total:.1f}s after power-on)" if self.cold_boot else ""
+        log_message(f"Time to first dashboard: {total:.1f}s{since_power_on}")
+        for phase, seconds in self.phases.items():
+            set_gauge("boot_phase_seconds", round(seconds, 3), phase=phase)
+        set_gauge("time_to_first_dashboard_seconds", round(total, 3))
+        observe("time_to_first_dashboard", total)
+        set_info(
+            time_to_first_dashboard=round(total, 1),
+            power_on_to_first_dashboard=round(self.started_at + total, 1) if self.cold_boot else None,
+        )
+
+    def check_session(self, base_url, cookies, wait_until_online):
+        """Ask Superset about the cached session in the background, as soon as it answers."""
+        if not cookies or self.done:
+            return
+        future = Future()
+
+        def run():
+            wait_until_online()
+            future.set_result(session_is_valid(base_url, cookies))
+
+        threading.Thread(target=run, name="boot-session-check", daemon=True).start()
+        self._session_check = (cookies, future)
+
+    def session_valid(self, base_url, cookies):
+        """session_is_valid(), answered by the early check while booting."""
+        check, self._session_check = self._session_check, None
+        if check is not None and not self.done and check[0] == cookies:
+            try:
+                # Still waiting for Superset to answer: no worse than asking now
+                return check[1].result(timeout=SESSION_CHECK_TIMEOUT_SECONDS)
+            except FutureTimeout:
+                pass
+        return session_is_valid(base_url, cookies)
@@ -0,0 +1,297 @@
+"""
+Chromium as a long-lived process that the controller attaches to.
+
+Chromium used to be a child of chromedriver: when the Python process died
+the browser went with it (or was orphaned while open_dashboard.sh started
+a second one), and every restart of the script meant a new browser, a
+login and a blank screen while the dashboards loaded again.
+
+Now Chromium is started on its own, in its own session, with
+--remote-debugging-port, and chromedriver attaches to it over the
+DevTools endpoint (debuggerAddress). Quitting that driver leaves the
+browser running, so after a crash or an upgrade of the script the next
+run finds the browser (by its command line in /proc), attaches again and
+takes over the tabs as they are. Only a deliberate restart (recovery or
+memory recycling) terminates it.
+
+With a profile_dir the profile outlives the browser too, and with it the
+disk cache (at most cache_size_mb) of Superset's static assets, so a new
+browser does not download the JS bundles again. Without one every
+browser gets a throwaway profile.
+
+The DevTools endpoint only listens on 127.0.0.1.
+"""
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import time
+import urllib.request
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from dashboard_log import log_message
+from dashboard_metrics import increment
+
+PROC_DIR = "/proc"
+DEVTOOLS_PORT = 9222
+DEVTOOLS_PORT_ENV = "DASHBOARD_DEVTOOLS_PORT"
+# Each user on a host with several kiosk accounts (Screen_1, Screen_2, ...)
+# gets a block of ports of its own: 9222 up to uid 1000, 9232 for 1001, ...
+DEVTOOLS_PORT_STEP = 10
+# Throwaway profiles of the browsers we start, removed when they are terminated
+# (a persistent profile_dir is kept)
+PROFILE_PREFIX = "dashboard-chromium-"
+BROWSER_START_TIMEOUT_SECONDS = 30
+BROWSER_STOP_TIMEOUT_SECONDS = 10
+
+# location, title and visibility of the tab WebDriver is switched to
+TAB_STATE_JS = "return [location.href, document.title, document.visibilityState];"
+
+
+def devtools_version(port, timeout=2):
+    """The browser's /json/version answer, or None if nothing answers on port."""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/version", timeout=timeout) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return None
+
+
+def default_devtools_port():
+    """$DASHBOARD_DEVTOOLS_PORT, else the first port of this user's block."""
+    if os.environ.get(DEVTOOLS_PORT_ENV):
+        return int(os.environ[DEVTOOLS_PORT_ENV])
+    return DEVTOOLS_PORT + DEVTOOLS_PORT_STEP * max(0, os.getuid() - 1000)
+
+
+def find_browser(port):
+    """(pid, profile dir) of our Chromium browser process with DevTools on port, or None."""
+    flag = f"--remote-debugging-port={port}"
+    uid = os.getuid()
+    for entry in os.listdir(PROC_DIR):
+        if not entry.isdigit():
+            continue
+        try:
+            if os.stat(f"{PROC_DIR}/{entry}").st_uid != uid:
+                continue  # another user's browser, e.g. another kiosk account's
+            with open(f"{PROC_DIR}/{entry}/cmdline", "rb") as f:
+                args = f.read().decode(errors="replace").split("\0")
+        except OSError:
+            continue
+        # Renderers and other helpers inherit the flags but carry a --type
+        if flag not in args or any(arg.startswith("--type=") for arg in args):
+            continue
+        profile = next((arg.split("=", 1)[1] for arg in args if arg.startswith("--user-data-dir=")), None)
+        return int(entry), profile
+    return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _signal_browser(pid, sig):
+    """Signal the browser's whole process group (it leads one when we started it)."""
+    try:
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        log_message(f"Not allowed to signal browser {pid}; it belongs to another user.")
+        return False
+    return True
+
+
+def write_preferences(profile_dir, prefs):
+    """
+    Set preferences in a profile before the browser starts (what
+    ChromeOptions "prefs" did; dotted keys nest). A persistent profile
+    keeps the rest of its preferences.
+    """
+    path = os.path.join(profile_dir, "Default", "Preferences")
+    try:
+        with open(path, "r") as f:
+            nested = json.load(f)
+    except (OSError, ValueError):
+        nested = {}
+    if not isinstance(nested, dict):
+        nested = {}
+    for key, value in prefs.items():
+        *parents, name = key.split(".")
+        node = nested
+        for parent in parents:
+            if not isinstance(node.get(parent), dict):
+                node[parent] = {}
+            node = node[parent]
+        node[name] = value
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(nested, f)
+
+
+def _throwaway(profile_dir):
+    return bool(profile_dir) and os.path.basename(profile_dir).startswith(PROFILE_PREFIX)
+
+
+def describe_tabs(driver):
+    """
+    Location, title and visibility of every tab, for taking them over after
+    an attach. A tab that does not answer is left out.
+    """
+    tabs = []
+    for handle in driver.window_handles:
+        try:
+            driver.switch_to.window(handle)
+            url, title, visibility = driver.execute_script(TAB_STATE_JS)
+        except WebDriverException as e:
+            log_message(f"Tab {handle} does not answer: {e}")
+            continue
+        tabs.append({"handle": handle, "url": url, "title": title, "visible": visibility == "visible"})
+    return tabs
+
+
+class KioskBrowser:
+    """
+    The kiosk's Chromium: connect() attaches to the one that is already
+    running or starts a new one; terminate() ends it for good.
+    """
+
+    def __init__(self, binaries, arguments=(), prefs=None, port=DEVTOOLS_PORT, driver_path=None,
+                 start_url="about:blank", display=None, profile_dir=None, cache_size_mb=None):
+        self.binaries = list(binaries)
+        self.arguments = list(arguments)
+        self.prefs = prefs or {}
+        self.port = port
+        self.driver_path = driver_path
+        self.profile_dir = profile_dir  # kept across browsers (None: a throwaway one each)
+        self.cache_size_mb = cache_size_mb  # disk cache limit (None or 0: Chromium's own)
+        self.start_url = start_url  # what the first tab shows until the dashboards load
+        self.display = display  # X display to start on (default: $DISPLAY)
+        self.attached = False  # whether the last connect() found a running browser
+        self._process = None  # the Popen of a browser started by this process
+
+    def connect(self):
+        """A driver for the running browser, starting one first if there is none."""
+        found = find_browser(self.port)
+        if found is not None and devtools_version(self.port) is None:
+            log_message(f"Browser {found[0]} does not answer on DevTools port {self.port}. Terminating it.")
+            self._stop(*found)
+            found = None
+        self.attached = found is not None
+        if found is None:
+            found = self._launch()
+        driver = self._attach()
+        # The memory watchdog measures the browser's process tree, not chromedriver's
+        driver.browser_pid = found[0]
+        if self.attached:
+            log_message(f"Attached to the running browser (pid {found[0]}, DevTools port {self.port}).")
+            increment("browser_attaches")
+        return driver
+
+    def terminate(self, driver=None):
+        """Quit the driver and end the browser itself, e.g. before a restart."""
+        if driver is not None:
+            try:
+                driver.quit()  # ends chromedriver only; the browser is not its child
+            except Exception:
+                pass
+        found = find_browser(self.port)
+        if found is not None:
+            self._stop(*found)
+
+    def _attach(self):
+        options = Options()
+        options.debugger_address = f"127.0.0.1:{self.port}"
+        service = Service(self.driver_path) if self.driver_path else Service()
+        return webdriver.Chrome(service=service, options=options)
+
+    def _launch(self):
+        """Start Chromium detached from us; returns (pid, profile dir)."""
+        if devtools_version(self.port) is not None:
+            raise RuntimeError(f"DevTools port {self.port} is taken by another process.")
+        if self.profile_dir:
+            profile_dir = os.path.abspath(self.profile_dir)
+            # It holds the Superset session cookie
+            os.makedirs(profile_dir, mode=0o700, exist_ok=True)
+        else:
+            profile_dir = tempfile.mkdtemp(prefix=PROFILE_PREFIX)
+        # A terminated browser did not exit cleanly; no "Restore pages?" bubble for that
+        write_preferences(profile_dir, dict(self.prefs, **{"profile.exit_type": "Normal",
+                                                            "profile.exited_cleanly": True}))
+        command = [
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={profile_dir}",
+            "--no-first-run",
+            "--no-default-browser-check",
+        ]
+        if self.cache_size_mb:
+            command.append(f"--disk-cache-size={int(self.cache_size_mb * 1024 * 1024)}")
+        command += [*self.arguments, self.start_url]
+        env = dict(os.environ, DISPLAY=self.display) if self.display else None
+        last_error = None
+        for binary in self.binaries:
+            try:
+                # A session of its own: the browser outlives this process and its signals
+                process = subprocess.Popen(
+                    [binary, *command],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    env=env,
+                    start_new_session=True,
+                )
+            except OSError as e:
+                log_message(f"Failed to start with {binary}: {e}")
+                last_error = e
+                continue
+            deadline = time.monotonic() + BROWSER_START_TIMEOUT_SECONDS
+            # Wrapper scripts may exit 0 once they have handed over to the real browser
+            while time.monotonic() < deadline and process.poll() in (None, 0):
+                if devtools_version(self.port, timeout=1) is not None:
+                    self._process = process
+                    pid = (find_browser(self.port) or (process.pid,))[0]
+                    log_message(f"Started browser with binary: {binary} (pid {pid}, DevTools port {self.port})")
+                    return pid, profile_dir
+                time.sleep(0.2)
+            code = process.poll()
+            last_error = f"exit code {code}" if code not in (None, 0) else "DevTools did not answer"
+            log_message(f"Failed to start with {binary}: {last_error}")
+            self._stop(process.pid, None)
+        if _throwaway(profile_dir):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        raise RuntimeError(f"Could not start Chromium with any known binary: {self.binaries}. Last error: {last_error}")
+
+    def _stop(self, pid, profile_dir):
+        """SIGTERM the browser, SIGKILL it if it lingers, then drop its profile if it was a throwaway."""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            if not _signal_browser(pid, sig) or self._wait_for_exit(pid, BROWSER_STOP_TIMEOUT_SECONDS):
+                break
+        if self._process is not None and self._process.pid == pid:
+            self._process = None
+        if _throwaway(profile_dir):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+    def _wait_for_exit(self, pid, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process is not None and self._process.pid == pid:
+                self._process.poll()  # reap our own child
+            if not _pid_alive(pid):
+                return True
+            time.sleep(0.1)
+        return False
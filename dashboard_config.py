@@ -0,0 +1,380 @@
+"""
+Structured configuration (config.toml) with hot reload.
+
+config.toml replaces the line-by-line credentials.txt: the Superset login,
+the dashboards with their schedule settings, rotation and timeout
+settings, memory budget and the CSS selectors, all validated up front so
+a typo is reported by name instead of breaking the kiosk later.
+See config.example.toml. credentials.txt is still read when there is no
+config.toml.
+
+ConfigWatcher tells the running kiosk when the file changed (inotify, or
+polling the file's mtime where inotify is unavailable), so variant 3 can
+re-apply it without restarting Chromium.
+"""
+import ctypes
+import ctypes.util
+import hashlib
+import importlib
+import json
+import os
+import select
+import stat
+import struct
+import time
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 (Ubuntu 22.04): pip install tomli
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from dashboard_log import log_message
+
+NUMBER = (int, float)
+
+# section -> key -> accepted type(s); every section is optional except superset
+SCHEMA = {
+    "superset": {"login_url": str, "username": str, "password": str, "password_env": str, "password_file": str},
+    "rotation": {
+        "switch_interval_minutes": NUMBER,
+        "check_interval_seconds": NUMBER,
+        "refresh_interval_minutes": int,
+        "prewarm_tabs": bool,
+        "prefetch_seconds": NUMBER,
+        "use_url_fast_path": bool,
+        "refresh_saved_on_dashboard": bool,
+        "freshness_poll_seconds": NUMBER,
+        "freshness_max_age_minutes": NUMBER,
+        "week_filter_name": str,
+    },
+    "timeouts": {"login_seconds": NUMBER, "dashboard_ready_seconds": NUMBER, "ui_step_seconds": NUMBER},
+    "memory": {"budget_mb": NUMBER, "sample_interval_seconds": NUMBER},
+    "snapshots": {"interval_minutes": NUMBER, "quality": int},
+    "connectivity": {"check_interval_seconds": NUMBER, "max_backoff_seconds": NUMBER},
+    "screen": {"enabled": bool, "frozen_refresh_intervals": NUMBER},
+    "stagger": {"device_id": str, "refresh": bool, "jitter_seconds": NUMBER, "rotation_spread_seconds": NUMBER},
+    "browser": {"profile_dir": str, "cache_size_mb": NUMBER, "blocked_urls": list},
+    "selectors": {
+        "dashboard_grid": str,
+        "chart_container": str,
+        "chart_spinner": str,
+        "chart_error": str,
+        "chart_id": str,
+    },
+}
+DASHBOARD_SCHEMA = {
+    "title": str,
+    "url": str,
+    "weight": NUMBER,
+    "dwell_minutes": NUMBER,
+    "windows": list,
+    "cron": list,
+    "tiles": list,
+    "columns": int,
+}
+# What the lists of a [[dashboards]] entry hold (tiles are checked as tables)
+DASHBOARD_LIST_ITEMS = {"windows": str, "cron": str}
+# A mosaic's tiles (variant 3): embedded standalone dashboards, each on its own refresh schedule
+TILE_SCHEMA = {"title": str, "url": str, "refresh_minutes": NUMBER}
+# The screens one fleet controller drives (variant 4); dashboards are titles from [[dashboards]]
+SCREEN_SCHEMA = {
+    "name": str,
+    "display": str,
+    "position": list,
+    "size": list,
+    "dashboards": list,
+    "switch_interval_minutes": NUMBER,
+}
+SCREEN_LIST_ITEMS = {"dashboards": str, "position": int, "size": int}
+
+# [selectors] key -> (module, attribute) pairs that use it
+SELECTOR_TARGETS = {
+    "dashboard_grid": [("dashboard_readiness", "DASHBOARD_GRID_SELECTOR")],
+    "chart_container": [
+        ("dashboard_readiness", "CHART_CONTAINER_SELECTOR"),
+        ("dashboard_health", "CHART_CONTAINER_SELECTOR"),
+    ],
+    "chart_spinner": [
+        ("dashboard_readiness", "CHART_SPINNER_SELECTOR"),
+        ("dashboard_health", "CHART_SPINNER_SELECTOR"),
+    ],
+    "chart_error": [("dashboard_health", "CHART_ERROR_SELECTOR")],
+    "chart_id": [("dashboard_health", "CHART_ID_SELECTOR")],
+}
+
+
+class ConfigError(ValueError):
+    """config.toml is missing, unreadable or invalid."""
+
+
+def _check_table(table, schema, where, list_items=None):
+    unknown = set(table) - set(schema)
+    if unknown:
+        raise ConfigError(f"{where}: unknown key(s) {', '.join(sorted(unknown))}")
+    for key, value in table.items():
+        expected = schema[key]
+        # bool is an int subclass; only accept it where a bool is expected
+        if not isinstance(value, expected) or (isinstance(value, bool) and expected is not bool):
+            raise ConfigError(f"{where}.{key}: wrong type {type(value).__name__}")
+        item_type = (list_items or {}).get(key)
+        for i, item in enumerate(value if item_type else ()):
+            if not isinstance(item, item_type):
+                raise ConfigError(
+                    f"{where}.{key}[{i}]: wrong type {type(item).__name__}, expected {item_type.__name__}"
+                )
+
+
+def _resolve_password(superset):
+    if "password" in superset:
+        return superset["password"]
+    if "password_env" in superset:
+        try:
+            return os.environ[superset["password_env"]]
+        except KeyError:
+            raise ConfigError(f"superset.password_env: ${superset['password_env']} is not set") from None
+    if "password_file" in superset:
+        try:
+            with open(superset["password_file"], "r") as f:
+                return f.read().strip()
+        except OSError as e:
+            raise ConfigError(f"superset.password_file: {e}") from None
+    raise ConfigError("superset: one of password, password_env or password_file is required")
+
+
+def _parse_mosaic(mosaic, where):
+    """
+    Validate a mosaic's tiles. A mosaic has no URL of its own; it is known
+    by a "mosaic:" key that changes when its layout does.
+    """
+    if "url" in mosaic:
+        raise ConfigError(f"{where}: a mosaic has tiles instead of a url")
+    tiles = mosaic["tiles"]
+    if not tiles:
+        raise ConfigError(f"{where}.tiles must list at least one tile")
+    for j, tile in enumerate(tiles):
+        if not isinstance(tile, dict):
+            raise ConfigError(f"{where}.tiles[{j}] must be a table")
+        _check_table(tile, TILE_SCHEMA, f"{where}.tiles[{j}]")
+        if not tile.get("url"):
+            raise ConfigError(f"{where}.tiles[{j}].url is required")
+    if mosaic.get("columns", 1) < 1:
+        raise ConfigError(f"{where}.columns must be at least 1")
+    layout = json.dumps([tiles, mosaic.get("columns")], sort_keys=True).encode()
+    return dict(mosaic, url=f"mosaic:{mosaic.get('title', '')}#{hashlib.sha1(layout).hexdigest()[:8]}")
+
+
+def _parse_screens(screens, dashboards):
+    """Validate the [[screens]] and put the dashboard entries in place of their titles."""
+    if not isinstance(screens, list):
+        raise ConfigError("screens must be an array of tables ([[screens]])")
+    by_title = {d["title"]: d for d in dashboards}
+    names, parsed = set(), []
+    for i, screen in enumerate(screens):
+        where = f"screens[{i}]"
+        if not isinstance(screen, dict):
+            raise ConfigError(f"{where} must be a table")
+        _check_table(screen, SCREEN_SCHEMA, where, SCREEN_LIST_ITEMS)
+        if not screen.get("name"):
+            raise ConfigError(f"{where}.name is required")
+        if screen["name"] in names:
+            raise ConfigError(f"{where}.name is listed twice: {screen['name']}")
+        names.add(screen["name"])
+        for key in ("position", "size"):
+            if key in screen and len(screen[key]) != 2:
+                raise ConfigError(f"{where}.{key} must be two integers, e.g. [1920, 0]")
+        titles = screen.get("dashboards", list(by_title))
+        unknown = [t for t in titles if t not in by_title]
+        if unknown or not titles:
+            raise ConfigError(f"{where}.dashboards: unknown or no dashboard title(s) {', '.join(map(str, unknown))}")
+        parsed.append(dict(screen, dashboards=[by_title[t] for t in titles]))
+    return parsed
+
+
+def parse_config(data):
+    """Validate a parsed TOML document and return the normalised config."""
+    unknown = set(data) - set(SCHEMA) - {"dashboards", "screens"}
+    if unknown:
+        raise ConfigError(f"Unknown section(s) {', '.join(sorted(unknown))}")
+    config = {}
+    for section, schema in SCHEMA.items():
+        table = data.get(section, {})
+        if not isinstance(table, dict):
+            raise ConfigError(f"[{section}] must be a table")
+        _check_table(table, schema, section)
+        config[section] = dict(table)
+
+    superset = config["superset"]
+    for key in ("login_url", "username"):
+        if not superset.get(key):
+            raise ConfigError(f"superset.{key} is required")
+    superset["password"] = _resolve_password(superset)
+    if not all(isinstance(url, str) for url in config["browser"].get("blocked_urls", [])):
+        raise ConfigError("browser.blocked_urls must list URL patterns as strings")
+
+    dashboards = data.get("dashboards", [])
+    if not isinstance(dashboards, list) or not dashboards:
+        raise ConfigError("At least one [[dashboards]] entry is required")
+    seen, parsed = set(), []
+    for i, dashboard in enumerate(dashboards):
+        where = f"dashboards[{i}]"
+        if not isinstance(dashboard, dict):
+            raise ConfigError(f"{where} must be a table")
+        _check_table(dashboard, DASHBOARD_SCHEMA, where, DASHBOARD_LIST_ITEMS)
+        if "tiles" in dashboard:
+            dashboard = _parse_mosaic(dashboard, where)
+        for key in ("title", "url"):
+            if not dashboard.get(key):
+                raise ConfigError(f"{where}.{key} is required")
+        if dashboard["url"] in seen:
+            raise ConfigError(f"{where}.url is listed twice: {dashboard['url']}")
+        seen.add(dashboard["url"])
+        parsed.append(dict(dashboard))
+    config["dashboards"] = parsed
+    config["screens"] = _parse_screens(data.get("screens", []), parsed)
+    return config
+
+
+def load_config(path):
+    """Read and validate config.toml."""
+    if tomllib is None:
+        raise ConfigError("Reading config.toml needs Python 3.11+ or the tomli package (pip install tomli)")
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    except OSError as e:
+        raise ConfigError(f"Cannot read {path}: {e}") from None
+    except tomllib.TOMLDecodeError as e:
+        raise ConfigError(f"{path}: {e}") from None
+    config = parse_config(data)
+    if "password" in data.get("superset", {}) and os.stat(path).st_mode & (stat.S_IRGRP | stat.S_IROTH):
+        log_message(f"WARNING: {path} contains a password and is readable by others. Run: chmod 600 {path}")
+    return config
+
+
+_selector_defaults = {}
+
+
+def apply_selectors(selectors):
+    """Point the shared modules at the configured CSS selectors (built-in ones for missing keys)."""
+    for key, targets in SELECTOR_TARGETS.items():
+        for module_name, attribute in targets:
+            module = importlib.import_module(module_name)
+            default = _selector_defaults.setdefault((module_name, attribute), getattr(module, attribute))
+            setattr(module, attribute, selectors.get(key, default))
+
+
+def changed_sections(old, new):
+    """Names of the top-level sections that differ between two configs."""
+    return {section for section in set(old) | set(new) if old.get(section) != new.get(section)}
+
+
+# ---- watching ----
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _inotify():
+    """libc with inotify, or None (not Linux, or no libc)."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    except OSError:
+        return None
+    return libc if hasattr(libc, "inotify_init1") else None
+
+
+class ConfigWatcher:
+    """
+    Waits for changes to one file. Watches its directory, so editors that
+    save by writing a new file and renaming it over the old one are seen.
+    """
+
+    def __init__(self, path, poll_interval_seconds=5, settle_seconds=0.5):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path).encode()
+        self.poll_interval_seconds = poll_interval_seconds
+        self.settle_seconds = settle_seconds
+        self._signature = self._file_signature()
+        self._fd = None
+        libc = _inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+            if fd >= 0 and libc.inotify_add_watch(fd, os.path.dirname(self.path).encode(), mask) >= 0:
+                self._fd = fd
+            elif fd >= 0:
+                os.close(fd)
+        if self._fd is None:
+            log_message(f"inotify unavailable; polling {self.path} every {poll_interval_seconds}s.")
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _drain_events(self):
+        """True if any pending inotify event is about our file."""
+        ours = False
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return ours
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                start = offset + _EVENT_HEADER.size
+                if buffer[start:start + length].rstrip(b"\0") == self.name:
+                    ours = True
+                offset = start + length
+
+    def _changed(self):
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._signature = signature
+            return True
+        return False
+
+    def wait(self, timeout, wake=()):
+        """
+        Sleep up to timeout seconds; True as soon as the file has changed.
+        Returns False early if one of the wake objects (anything with a
+        fileno(), e.g. the connectivity probe) becomes readable.
+        """
+        wake = list(wake)
+        deadline = time.monotonic() + max(0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if self._fd is not None:
+                ready, _, _ = select.select([self._fd] + wake, [], [], max(0, remaining))
+                if any(w in ready for w in wake):
+                    return False
+                if ready and self._drain_events():
+                    # Let the editor finish writing, then report a real change only
+                    time.sleep(self.settle_seconds)
+                    if self._fd is not None:
+                        self._drain_events()
+                    if self._changed():
+                        return True
+            else:
+                ready, _, _ = select.select(wake, [], [], max(0, min(remaining, self.poll_interval_seconds)))
+                if ready:
+                    return False
+                if self._changed():
+                    return True
+            if time.monotonic() >= deadline:
+                return False
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,219 @@
+"""
+In-process connectivity probe for the Superset host.
+
+Replaces the `ping google.com` loop in open_dashboard.sh, which tested the
+wrong host (and ICMP is blocked on some networks). A background thread
+runs an asyncio probe against the host of SUPERSET_LOGIN_URL: a TCP
+connect, then GET <prefix>/health (Superset answers it without a login).
+Any answer below HTTP 500 counts: behind a proxy or a path prefix /health
+is often a redirect, and the host answered all the same.
+
+While Superset answers, it is probed every check_interval_seconds. When it
+stops answering, probes back off from min_backoff_seconds to
+max_backoff_seconds, so an outage is noticed within a check interval and
+the end of one within max_backoff_seconds. State changes are pushed:
+wait_online() and wait_for_change() return the moment the state flips,
+and the probe's fileno() becomes readable for select().
+"""
+import asyncio
+import os
+import random
+import select
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+from dashboard_log import log_message
+from dashboard_metrics import increment, set_gauge
+from dashboard_session import superset_base_url
+
+
+class SupersetUnreachable(Exception):
+    """Superset does not answer; wait (or show snapshots) until it does."""
+
+
+def probe_target(url):
+    """(host, port, tls, health path) for the Superset behind a login URL."""
+    parsed = urlparse(superset_base_url(url))
+    tls = parsed.scheme == "https"
+    port = parsed.port or (443 if tls else 80)
+    return parsed.hostname, port, tls, f"{parsed.path}/health"
+
+
+async def probe_superset(host, port, tls, path, timeout):
+    """One TCP connect plus GET path. Returns (ok, detail)."""
+    start = time.monotonic()
+    context = ssl.create_default_context() if tls else None
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context, server_hostname=host if tls else None),
+            timeout,
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        return False, f"TCP connect to {host}:{port} failed: {e or type(e).__name__}"
+    try:
+        default_port = 443 if tls else 80
+        host_header = host if port == default_port else f"{host}:{port}"
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host_header}\r\n"
+            "User-Agent: dashboard-kiosk\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        return False, f"GET {path} failed: {e or type(e).__name__}"
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, asyncio.TimeoutError):
+            pass
+    parts = status_line.decode(errors="replace").split()
+    status = parts[1] if len(parts) > 1 else "no response"
+    # A redirect or 4xx from a proxy or path prefix still means the host answered
+    if not status.isdigit() or int(status) >= 500:
+        return False, f"GET {path} answered HTTP {status}"
+    return True, f"HTTP {status} in {(time.monotonic() - start) * 1000:.0f} ms"
+
+
+class ConnectivityProbe:
+    """Background probe of the Superset host; see the module docstring."""
+
+    def __init__(self, url, check_interval_seconds=30, min_backoff_seconds=1,
+                 max_backoff_seconds=15, timeout_seconds=5):
+        self.check_interval_seconds = check_interval_seconds
+        self.min_backoff_seconds = min_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.online = None  # unknown until the first probe
+        self.detail = ""
+        self.online_since = None  # time.monotonic() of the last change to online
+        self.probes = 0
+        self._condition = threading.Condition()
+        self._pipe_r, self._pipe_w = os.pipe()
+        os.set_blocking(self._pipe_r, False)
+        os.set_blocking(self._pipe_w, False)
+        self._loop = None
+        self._wake = None
+        self._thread = None
+        self._stopping = False
+        self.set_target(url)
+
+    @property
+    def target(self):
+        return f"{self._target[0]}:{self._target[1]}"
+
+    def set_target(self, url):
+        """Probe another Superset (e.g. after a config reload)."""
+        self._target = probe_target(url)
+        self.probe_now()
+
+    def start(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopping = True
+        self.probe_now()
+
+    def fileno(self):
+        """Readable after a state change, for select()."""
+        return self._pipe_r
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        backoff = self.min_backoff_seconds
+        while not self._stopping:
+            ok, detail = await probe_superset(*self._target, self.timeout_seconds)
+            self._record(ok, detail)
+            if ok:
+                backoff = self.min_backoff_seconds
+                delay = self.check_interval_seconds
+            else:
+                delay = backoff * random.uniform(0.8, 1.0)
+                backoff = min(self.max_backoff_seconds, backoff * 2)
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _record(self, ok, detail):
+        with self._condition:
+            changed = ok != self.online
+            self.online, self.detail = ok, detail
+            if changed and ok:
+                self.online_since = time.monotonic()
+            self.probes += 1
+            self._condition.notify_all()
+        set_gauge("superset_reachable", int(ok))
+        if not changed:
+            return
+        state = "online" if ok else "offline"
+        increment("connectivity_changes", state=state)
+        if ok:
+            log_message(f"Superset at {self.target} is reachable ({detail}).")
+        else:
+            log_message(f"Superset at {self.target} is unreachable: {detail}")
+        try:
+            os.write(self._pipe_w, b"x")
+        except BlockingIOError:
+            pass  # a wake-up is already pending
+
+    def probe_now(self):
+        """Probe again right away instead of waiting for the next interval."""
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def check(self, timeout=None):
+        """Probe now and wait for the answer; returns whether Superset is reachable."""
+        timeout = self.timeout_seconds + 1 if timeout is None else timeout
+        with self._condition:
+            seen = self.probes
+            self.probe_now()
+            self._condition.wait_for(lambda: self.probes > seen, timeout)
+            return bool(self.online)
+
+    def wait_online(self, timeout=None):
+        """Block until Superset is reachable (True) or timeout passes (False)."""
+        with self._condition:
+            return bool(self._condition.wait_for(lambda: self.online, timeout))
+
+    def wait_for_change(self, timeout):
+        """Sleep up to timeout seconds; True as soon as the state has changed."""
+        ready, _, _ = select.select([self._pipe_r], [], [], max(0, timeout))
+        if not ready:
+            return False
+        try:
+            while os.read(self._pipe_r, 64):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def wait_until_online(self):
+        """Block until Superset is reachable, saying so in the log if that takes a while."""
+        if self.wait_online(self.timeout_seconds + 1):
+            return
+        log_message(f"Waiting for Superset at {self.target} to become reachable...")
+        while not self.wait_online(60):
+            pass
+
+
+def when_online(probe, action, while_offline=None):
+    """
+    Wrap a recovery action so it only runs against a reachable Superset.
+    While Superset is unreachable, while_offline(driver) runs instead (it
+    returns once Superset is back) or we simply wait.
+    """
+    def run(driver):
+        if not probe.check():
+            if while_offline is not None:
+                while_offline(driver)
+            else:
+                probe.wait_until_online()
+        return action(driver)
+    return run
@@ -0,0 +1,416 @@
+"""
+Several screens driven by one process (variant 4).
+
+Each TV used to run the whole stack under a user of its own: its own
+Python, its own Chromium, its own login and its own polling loop. A Fleet
+drives any number of screens from one asyncio loop instead:
+
+- screens on the same X display share one Chromium, each in a window of
+  its own placed on its monitor; a screen on another X display gets a
+  browser of its own (BrowserHost);
+- one ConnectivityProbe and one Superset session serve every screen: the
+  first browser that needs a session logs in, the others get its cookies
+  (SharedSession);
+- every screen rotates on its own schedule, but one timer drives them
+  all: at a slot boundary every screen whose dashboard changes switches
+  at the same moment, and a failing screen recovers on its own while the
+  others carry on;
+- a screen with a RefreshScheduler (dashboard_stagger.py) has its
+  dashboard refreshed at its own staggered times by the same timer.
+
+Selenium is blocking, so driver calls run in worker threads
+(asyncio.to_thread); a lock per browser keeps the commands for one
+window from interleaving with another's. The screen-specific work (open,
+reload and check a dashboard) is supplied by the variant.
+"""
+import asyncio
+import signal
+import threading
+from datetime import datetime, timedelta
+
+from selenium.common.exceptions import WebDriverException
+
+from dashboard_connectivity import when_online
+from dashboard_log import log_message
+from dashboard_memory import MemoryWatchdog
+from dashboard_metrics import export_metrics, increment, set_gauge, set_info
+from dashboard_recovery import RecoveryLadder
+from dashboard_session import (
+    clear_browser_session,
+    clear_session,
+    inject_session,
+    load_session,
+    save_session,
+    session_is_valid,
+)
+
+
+class FleetStopping(BaseException):
+    """Raised in worker threads once the fleet is shutting down; ends a recovery for good."""
+
+
+class BrowserHost:
+    """One Chromium (one X display) and the screens that have a window in it."""
+
+    def __init__(self, name, browser, memory_budget_mb, memory_sample_interval_seconds, on_connect=None):
+        self.name = name
+        self.browser = browser  # KioskBrowser
+        self.on_connect = on_connect  # fn(driver) in each window after every connect, e.g. the request tracker
+        self.screens = []
+        self.driver = None
+        self.lock = threading.RLock()
+        self.generation = 0  # bumps with every (re)connect; older window handles are gone
+        self.session_version = None  # SharedSession version of the cookies in this browser
+        self.recycle_pending = False
+        self.watchdog = MemoryWatchdog(memory_budget_mb, memory_sample_interval_seconds)
+
+    def connect(self):
+        with self.lock:
+            self.driver = self.browser.connect()
+            self.generation += 1
+            self.session_version = None
+            self.recycle_pending = False
+            self.watchdog.reset()
+            return self.driver
+
+    def restart(self, reason):
+        """A new Chromium for every screen of this host."""
+        with self.lock:
+            log_message(f"Restarting the browser of {self.name} ({', '.join(s.name for s in self.screens)}).")
+            increment("browser_restarts", reason=reason)
+            self.browser.terminate(self.driver)
+            return self.connect()
+
+    def terminate(self):
+        if self.driver is not None:
+            self.browser.terminate(self.driver)
+            self.driver = None
+
+
+class Screen:
+    """One display: a window of a BrowserHost with a rotation of its own."""
+
+    def __init__(self, name, schedule, position=None, size=None):
+        self.name = name
+        self.schedule = schedule
+        self.position = position  # (x, y) of its monitor on the X display
+        self.size = size          # (width, height)
+        self.host = None
+        self.window = None
+        self.generation = None   # host generation the window handle belongs to
+        self.dashboard = None    # the dashboard on screen (None: nothing set up yet)
+        self.ladder = None
+        self.recovery = None     # asyncio task while the screen is recovering
+        self.refresher = None    # RefreshScheduler, when the fleet refreshes the dashboards itself
+
+    def log(self, message):
+        log_message(f"[{self.name}] {message}")
+
+
+class SharedSession:
+    """
+    One Superset login for every browser of the fleet. Superset is asked
+    once whether the saved cookies are still good; the browser that finds
+    them rejected logs in and the others get the new cookies injected.
+    """
+
+    def __init__(self, base_url, path, login, is_valid=session_is_valid):
+        self.base_url = base_url
+        self.path = path
+        self.login = login        # fn(driver): type the credentials
+        self.is_valid = is_valid  # fn(base_url, cookies)
+        self.version = 0          # bumps whenever the saved cookies change
+        self._valid = False
+        self._lock = threading.Lock()
+
+    def ensure(self, host):
+        """Give host's browser a valid session; logs in only if nobody has one."""
+        with self._lock:
+            if not self._valid:
+                cookies = load_session(self.path)
+                if not self.is_valid(self.base_url, cookies):
+                    if cookies:
+                        log_message("Cached Superset session was rejected. Logging in again.")
+                    self.login(host.driver)
+                    saved = save_session(host.driver, self.path)
+                    log_message(f"Saved Superset session ({saved} cookies) to {self.path}. Shared with every screen.")
+                    self._valid = True
+                    self.version += 1
+                    host.session_version = self.version
+                    return
+                log_message(f"Reused cached Superset session ({len(cookies)} cookies). Skipped login.")
+                self._valid = True
+                self.version += 1
+            if host.session_version != self.version:
+                inject_session(host.driver, load_session(self.path), self.base_url)
+                host.session_version = self.version
+
+    def invalidate(self, host):
+        """Superset rejected host's session: the next ensure() logs in again (once for all)."""
+        with self._lock:
+            if host.session_version == self.version and self._valid:
+                clear_session(self.path)
+                self._valid = False
+            clear_browser_session(host.driver)
+            host.session_version = None
+
+
+class Fleet:
+    """Runs the screens; see the module docstring."""
+
+    def __init__(self, screens, hosts, connectivity, session, show, reload, check, refresh=None,
+                 check_interval_seconds=60, recovery_options=None, boot=None):
+        self.screens = list(screens)
+        self.hosts = list(hosts)
+        self.connectivity = connectivity
+        self.session = session
+        self.show = show        # fn(driver, screen, dashboard): open and configure it, raise if it is not right
+        self.reload = reload    # fn(driver, screen): reload the visible dashboard, raise if it is not right
+        self.check = check      # fn(driver, screen): health check (and repair), raise if it needs recovery
+        self.refresh = refresh  # fn(driver, screen): refresh the visible dashboard (screens with a refresher)
+        self.check_interval_seconds = check_interval_seconds
+        self.boot = boot
+        self._stopping = threading.Event()
+        self._stopped_by = None
+        self._wake = None
+        for screen in self.screens:
+            screen.ladder = RecoveryLadder(self._recovery_actions(), sleep=self._sleep_unless_stopping,
+                                           **(recovery_options or {}))
+
+    # -- in worker threads --
+
+    def _sleep_unless_stopping(self, seconds):
+        if self._stopping.wait(seconds):
+            raise FleetStopping()
+
+    def _place_windows(self, host):
+        """Give every screen of a (re)connected browser its window, on its monitor."""
+        driver = host.driver
+        handles = driver.window_handles
+        for i, screen in enumerate(host.screens):
+            if i < len(handles):
+                driver.switch_to.window(handles[i])
+            else:
+                driver.switch_to.new_window("window")
+            screen.window = driver.current_window_handle
+            screen.generation = host.generation
+            screen.dashboard = None
+            if host.on_connect is not None:
+                # DevTools settings are per window (target)
+                host.on_connect(driver)
+            try:
+                if screen.position or screen.size:
+                    driver.set_window_rect(*(screen.position or (None, None)), *(screen.size or (None, None)))
+                driver.fullscreen_window()
+            except WebDriverException as e:
+                screen.log(f"WARNING: Could not place the window: {e}")
+        # Windows left over from a run with more screens
+        for handle in handles[len(host.screens):]:
+            driver.switch_to.window(handle)
+            driver.close()
+
+    def _in_window(self, screen, fn, *args):
+        """Run fn(driver, screen, *args) with the browser switched to screen's window."""
+        if self._stopping.is_set():
+            raise FleetStopping()
+        host = screen.host
+        with host.lock:
+            if screen.generation != host.generation:
+                self._place_windows(host)
+            host.driver.switch_to.window(screen.window)
+            return fn(host.driver, screen, *args)
+
+    def _show_current(self, driver, screen):
+        dashboard = screen.schedule.slot_at(datetime.now())["dashboard"]
+        self.session.ensure(screen.host)
+        if self.boot is not None:
+            self.boot.mark("logged_in")
+        self.show(driver, screen, dashboard)
+        if screen.dashboard is not dashboard:
+            increment("dashboard_switches", screen=screen.name)
+        screen.dashboard = dashboard
+        set_info(screens={s.name: s.dashboard["title"] if s.dashboard else None for s in self.screens})
+
+    def _refresh(self, driver, screen):
+        screen.refresher.mark_refreshed()
+        self.refresh(driver, screen)
+
+    def _reauthenticate(self, driver, screen):
+        self.session.invalidate(screen.host)
+        self._show_current(driver, screen)
+
+    def _restart(self, screen):
+        screen.host.restart("error")
+        self._in_window(screen, self._show_current)  # the host's other screens follow from the loop
+        return screen
+
+    def _recovery_actions(self):
+        def in_window(fn):
+            def action(s):
+                self._in_window(s, fn)
+                return s
+            return when_online(self.connectivity, action, self._wait_online_sync)
+
+        return {
+            "reload": in_window(self.reload),
+            "renavigate": in_window(self._show_current),
+            "reauth": in_window(self._reauthenticate),
+            "restart": when_online(self.connectivity, self._restart, self._wait_online_sync),
+        }
+
+    def _wait_online_sync(self, screen):
+        while not self.connectivity.wait_online(1):
+            if self._stopping.is_set():
+                raise FleetStopping()
+
+    def _sample_memory(self, host):
+        with host.lock:
+            sample = host.watchdog.sample(host.driver)
+        if sample is None:
+            return
+        set_gauge("browser_pss_bytes", int(sample["pss_mb"] * 1024 * 1024), display=host.name)
+        set_gauge("browser_processes", sample["processes"], display=host.name)
+        if host.watchdog.over_budget and not host.recycle_pending:
+            log_message(
+                f"Browser memory of {host.name} over budget ({sample['pss_mb']:.0f} of "
+                f"{host.watchdog.budget_mb} MB). Recycling it at the next dashboard switch."
+            )
+            host.recycle_pending = True
+
+    def _recycle(self, host):
+        log_message(f"Recycling browser to release Chromium memory ({host.name}).")
+        with host.lock:
+            host.browser.terminate(host.driver)
+            increment("browser_restarts", reason="memory")
+            host.connect()
+
+    # -- on the event loop --
+
+    async def _guard(self, screen, fn):
+        """Run fn in screen's window; a failure starts that screen's recovery in the background."""
+        try:
+            await asyncio.to_thread(self._in_window, screen, fn)
+        except FleetStopping:
+            pass
+        except Exception as e:
+            if self._stopping.is_set():
+                return
+            if not isinstance(e, WebDriverException):
+                screen.log(f"Unexpected error: {type(e).__name__}: {e}")
+            increment("retries", screen=screen.name)
+            screen.recovery = asyncio.create_task(self._recover(screen, e))
+
+    async def _recover(self, screen, error):
+        screen.log(f"Recovering ({type(error).__name__}).")
+        try:
+            await asyncio.to_thread(screen.ladder.recover, screen, error)
+        except FleetStopping:
+            pass
+        finally:
+            screen.recovery = None
+            self._wake.set()  # screens that lost their window with a restarted browser are due now
+
+    async def _wait_online(self):
+        """Wait for Superset (one probe for every screen); the screens keep what they show meanwhile."""
+        if self.connectivity.online:
+            return
+        log_message(f"Waiting for Superset at {self.connectivity.target} to become reachable...")
+        while not self.connectivity.online and not self._stopping.is_set():
+            await self._sleep(60)
+
+    def _connectivity_changed(self):
+        self.connectivity.wait_for_change(0)  # consume the wake-up
+        self._wake.set()
+
+    async def _sleep(self, seconds):
+        """Sleep up to seconds; returns early when connectivity changes or the fleet stops."""
+        try:
+            await asyncio.wait_for(self._wake.wait(), max(0, seconds))
+        except asyncio.TimeoutError:
+            pass
+        self._wake.clear()
+
+    def stop(self, by="user"):
+        """
+        Ctrl+C: end the loop; the browsers are terminated on the way out.
+        SIGTERM (the supervisor or systemd) leaves them for the next run.
+        """
+        self._stopped_by = by
+        self._stopping.set()
+        self._wake.set()
+
+    async def switch(self, due):
+        """Bring the dashboards of a new slot on several screens at once."""
+        for host in {s.host for s in due if s.host.recycle_pending}:
+            await asyncio.to_thread(self._recycle, host)
+            # Screens still recovering are due again once their ladder is done
+            due = due + [s for s in host.screens if s not in due and s.recovery is None]
+        log_message("Switching " + ", ".join(
+            f"{s.name} to '{s.schedule.slot_at(datetime.now())['dashboard']['title']}'" for s in due
+        ) + ".")
+        await asyncio.gather(*(self._guard(s, self._show_current) for s in due))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        loop.add_reader(self.connectivity.fileno(), self._connectivity_changed)
+        loop.add_signal_handler(signal.SIGINT, self.stop)
+        loop.add_signal_handler(signal.SIGTERM, self.stop, "SIGTERM")
+        try:
+            await self._run()
+        finally:
+            loop.remove_reader(self.connectivity.fileno())
+            loop.remove_signal_handler(signal.SIGINT)
+            loop.remove_signal_handler(signal.SIGTERM)
+            self._stopping.set()  # ends the worker threads' recoveries
+        if self._stopped_by is not None:
+            log_message(f"Dashboard fleet shutdown by {self._stopped_by}.")
+            self.connectivity.stop()
+            # Any other exit leaves the browsers for the next run
+            if self._stopped_by == "user":
+                await asyncio.gather(*(asyncio.to_thread(host.terminate) for host in self.hosts))
+
+    async def _run(self):
+        # Every browser starts at once; they only need the X server, not Superset
+        await asyncio.gather(*(asyncio.to_thread(host.connect) for host in self.hosts))
+        if self.boot is not None:
+            self.boot.mark("browser")
+        await self._wait_online()
+        if self.boot is not None:
+            self.boot.mark("superset_reachable", self.connectivity.online_since)
+        log_message(f"Setting up {len(self.screens)} screens on {len(self.hosts)} browsers.")
+        await asyncio.gather(*(self._guard(s, self._show_current) for s in self.screens))
+        if self.boot is not None:
+            self.boot.finish()
+
+        next_check = datetime.now() + timedelta(seconds=self.check_interval_seconds)
+        while not self._stopping.is_set():
+            if self.connectivity.online is False:
+                await self._wait_online()
+                next_check = datetime.now()  # Superset is back: look at every screen now
+                continue
+            now = datetime.now()
+            idle = [s for s in self.screens if s.recovery is None]
+            due = [s for s in idle if s.dashboard is not s.schedule.slot_at(now)["dashboard"]]
+            if due:
+                await self.switch(due)
+            elif now >= next_check:
+                await asyncio.gather(*(self._guard(s, self.check) for s in idle))
+                for host in self.hosts:
+                    if host.watchdog.due():
+                        await asyncio.to_thread(self._sample_memory, host)
+                next_check = datetime.now() + timedelta(seconds=self.check_interval_seconds)
+            # Every screen refreshes at its own staggered time
+            refreshing = [s for s in idle if s.refresher is not None and s.dashboard is not None
+                          and s not in due and s.refresher.due()]
+            if refreshing and self.refresh is not None:
+                await asyncio.gather(*(self._guard(s, self._refresh) for s in refreshing))
+            set_gauge("screens_recovering", sum(s.recovery is not None for s in self.screens))
+            export_metrics()
+            # Sleep until the next slot boundary or refresh on any screen, or the next check
+            now = datetime.now()
+            wake_at = min([next_check] + [s.schedule.next_transition(now) for s in self.screens] + [
+                now + timedelta(seconds=s.refresher.seconds_until_due()) for s in self.screens if s.refresher
+            ])
+            # A moment after the event, so the new slot is already current
+            await self._sleep((wake_at - now).total_seconds() + 0.05)
@@ -0,0 +1,154 @@
+"""
+Data-freshness-aware refresh.
+
+Auto-refresh re-runs every chart on every screen every few minutes, even
+when the data behind them only changes hourly. The FreshnessPoller asks
+the Superset REST API instead: for each dashboard it fingerprints the
+charts (/api/v1/dashboard/<id>/charts, changed_on) and the datasets they
+query (/api/v1/dataset/<id>, changed_on, which ETL jobs bump when they
+refresh a dataset through the API). Only a dashboard whose fingerprint
+changed is refreshed. Because Superset cannot see every upstream data
+change, a dashboard older than max_age_seconds is refreshed anyway.
+
+The API calls go through one pooled keep-alive connection (urllib3,
+installed with Selenium) that carries the browser's session cookies.
+"""
+import hashlib
+import json
+import time
+
+import urllib3
+
+from dashboard_log import log_message
+from dashboard_metrics import increment, set_gauge
+from dashboard_session import cookie_header
+from dashboard_url_state import dashboard_id_from_url
+
+FRESHNESS_TIMEOUT_SECONDS = 10
+
+
+class FreshnessError(Exception):
+    """The Superset API did not answer a freshness query."""
+
+
+class SupersetApi:
+    """Pooled HTTP session to the Superset REST API, authenticated with browser cookies."""
+
+    def __init__(self, base_url, cookies=(), timeout=FRESHNESS_TIMEOUT_SECONDS):
+        self.base_url = base_url
+        self.http = urllib3.PoolManager(
+            maxsize=2, retries=False, timeout=urllib3.Timeout(total=timeout)
+        )
+        self.set_cookies(cookies)
+
+    def set_cookies(self, cookies):
+        self._cookie = cookie_header(cookies)
+
+    def get(self, path):
+        try:
+            response = self.http.request(
+                "GET",
+                f"{self.base_url}{path}",
+                headers={"Cookie": self._cookie, "Accept": "application/json"},
+            )
+        except urllib3.exceptions.HTTPError as e:
+            raise FreshnessError(f"GET {path}: {e}") from None
+        if response.status != 200:
+            raise FreshnessError(f"GET {path}: HTTP {response.status}")
+        try:
+            return json.loads(response.data.decode())
+        except ValueError as e:
+            raise FreshnessError(f"GET {path}: {e}") from None
+
+    def close(self):
+        self.http.clear()
+
+
+def dataset_id(form_data):
+    """12 from a chart's form_data datasource "12__table" (None if absent)."""
+    datasource = str((form_data or {}).get("datasource", ""))
+    head = datasource.split("__")[0]
+    return int(head) if head.isdigit() else None
+
+
+class FreshnessPoller:
+    """Tells which dashboards' data changed since they were last refreshed."""
+
+    def __init__(self, api, dashboards, poll_interval_seconds=60, max_age_seconds=3600,
+                 clock=time.monotonic):
+        self.api = api
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self._fingerprints = {}  # dashboard URL -> fingerprint at its last refresh
+        self._latest = {}        # dashboard URL -> fingerprint at the last poll
+        self._refreshed_at = {}  # dashboard URL -> clock() at its last refresh
+        self._next_poll = clock()
+        self.set_dashboards(dashboards)
+
+    def set_dashboards(self, dashboards):
+        """Follow a new dashboard list (e.g. after a config reload)."""
+        self.dashboards = list(dashboards)
+        urls = {d["url"] for d in self.dashboards}
+        self._fingerprints = {u: f for u, f in self._fingerprints.items() if u in urls}
+        self._refreshed_at = {u: t for u, t in self._refreshed_at.items() if u in urls}
+        self._latest = {u: f for u, f in self._latest.items() if u in urls}
+
+    def seconds_until_due(self):
+        return max(0, self._next_poll - self.clock())
+
+    def due(self):
+        return self.clock() >= self._next_poll
+
+    def fingerprint(self, dashboard, dataset_cache):
+        """Hash of the chart and dataset change times behind one dashboard."""
+        ref = dashboard_id_from_url(dashboard["url"])
+        if ref is None:
+            raise FreshnessError(f"No dashboard id in {dashboard['url']}")
+        parts = []
+        dataset_ids = set()
+        for chart in self.api.get(f"/api/v1/dashboard/{ref}/charts")["result"]:
+            parts.append(f"chart:{chart['id']}:{chart.get('changed_on')}")
+            dataset_ids.add(dataset_id(chart.get("form_data")))
+        dataset_ids.discard(None)
+        for ds in sorted(dataset_ids):
+            if ds not in dataset_cache:
+                result = self.api.get(f"/api/v1/dataset/{ds}")["result"]
+                dataset_cache[ds] = result.get("changed_on")
+            parts.append(f"dataset:{ds}:{dataset_cache[ds]}")
+        return hashlib.sha1("\n".join(sorted(parts)).encode()).hexdigest()
+
+    def poll(self):
+        """
+        Fingerprint every dashboard and return the URLs that need a refresh,
+        as {url: "data" | "max_age"}. A dashboard seen for the first time is
+        taken as fresh. Dashboards the API cannot answer for are skipped.
+        """
+        now = self.clock()
+        self._next_poll = now + self.poll_interval_seconds
+        dataset_cache = {}  # datasets shared by several dashboards are fetched once
+        stale = {}
+        for dashboard in self.dashboards:
+            url = dashboard["url"]
+            try:
+                fingerprint = self.fingerprint(dashboard, dataset_cache)
+            except (FreshnessError, KeyError, TypeError) as e:
+                log_message(f"WARNING: Freshness check for '{dashboard['title']}' failed: {e}")
+                increment("freshness_polls", outcome="error")
+                continue
+            increment("freshness_polls", outcome="ok")
+            self._latest[url] = fingerprint
+            previous = self._fingerprints.setdefault(url, fingerprint)
+            self._refreshed_at.setdefault(url, now)
+            if previous != fingerprint:
+                stale[url] = "data"
+            elif now - self._refreshed_at[url] >= self.max_age_seconds:
+                stale[url] = "max_age"
+        set_gauge("dashboards_data_changed", sum(1 for r in stale.values() if r == "data"))
+        return stale
+
+    def mark_refreshed(self, url):
+        """The dashboard at url now shows the data of the last poll."""
+        if url in self._latest:
+            self._fingerprints[url] = self._latest[url]
+        self._refreshed_at[url] = self.clock()
@@ -0,0 +1,202 @@
+"""
+Refresh-health monitoring for a dashboard that is on screen.
+
+Instead of trusting that auto-refresh happened, look at what the page
+actually did: when the last /api/v1/chart/data request completed (from
+the request tracker in dashboard_readiness) and which chart containers
+are stuck on a spinner or showing an error. Broken charts are refreshed
+one by one through their own menu; a dashboard that has stopped
+refreshing gets a "Refresh dashboard", and only if that does not help is
+the page reloaded (DashboardStalled).
+"""
+import json
+import time
+from urllib.parse import parse_qs, urlparse
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from dashboard_log import log_message
+from dashboard_metrics import increment, set_gauge
+from dashboard_readiness import CHART_CONTAINER_SELECTOR, CHART_SPINNER_SELECTOR
+
+# Selectors for Superset 4.x
+CHART_ID_SELECTOR = "[data-test-chart-id]"
+CHART_ERROR_SELECTOR = ".ant-alert-error, [data-test='chart-error'], .alert-danger"
+CHART_MENU_TRIGGER_SELECTOR = "[aria-label='More Options'], [data-test='slice-header-controls-trigger']"
+CHART_REFRESH_ITEM_XPATH = "//*[@data-test='refresh-chart-menu-item' or normalize-space(text())='Force refresh']"
+MENU_TRIGGER_XPATH = "//button[@aria-label='Menu actions trigger']"
+REFRESH_DASHBOARD_XPATH = "//*[@data-test='refresh-dashboard-menu-item' or normalize-space(text())='Refresh dashboard']"
+
+CHART_STATE_JS = """
+var holders = document.querySelectorAll(arguments[0]);
+var charts = [];
+for (var i = 0; i < holders.length; i++) {
+  var idNode = holders[i].querySelector(arguments[1]);
+  charts.push({
+    key: idNode ? idNode.getAttribute('data-test-chart-id') : '#' + i,
+    index: i,
+    loading: !!holders[i].querySelector(arguments[2]),
+    error: !!holders[i].querySelector(arguments[3])
+  });
+}
+var tracker = window.__dashboardTracker;
+return {
+  now: Date.now(),
+  charts: charts,
+  completed: tracker ? tracker.completed.filter(function (c) { return c.ok; }) : null
+};
+"""
+
+
+class DashboardStalled(WebDriverException):
+    """The dashboard stopped refreshing and a dashboard refresh did not help."""
+
+
+def slice_id_from_url(url):
+    """slice_id from a /api/v1/chart/data?form_data={...} URL, if present."""
+    try:
+        form_data = parse_qs(urlparse(url).query).get("form_data", ["{}"])[0]
+        slice_id = json.loads(form_data).get("slice_id")
+    except (ValueError, AttributeError):
+        return None
+    return str(slice_id) if slice_id is not None else None
+
+
+def refresh_chart(driver, index, timeout=5):
+    """Force-refresh one chart through its own header menu."""
+    holders = driver.find_elements(By.CSS_SELECTOR, CHART_CONTAINER_SELECTOR)
+    if index >= len(holders):
+        return False
+    try:
+        holder = holders[index]
+        # The chart controls only appear on hover
+        ActionChains(driver).move_to_element(holder).perform()
+        holder.find_element(By.CSS_SELECTOR, CHART_MENU_TRIGGER_SELECTOR).click()
+        WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.XPATH, CHART_REFRESH_ITEM_XPATH))
+        ).click()
+        return True
+    except (TimeoutException, WebDriverException):
+        return False
+
+
+def refresh_dashboard(driver, timeout=5):
+    """Re-query every chart with the dashboard's "Refresh dashboard" menu item."""
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.XPATH, MENU_TRIGGER_XPATH))
+        ).click()
+        WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.XPATH, REFRESH_DASHBOARD_XPATH))
+        ).click()
+        return True
+    except (TimeoutException, WebDriverException):
+        return False
+
+
+class RefreshHealthMonitor:
+    """Tracks chart refreshes for one dashboard page between checks."""
+
+    def __init__(self, refresh_interval_seconds, grace_seconds=60, stuck_seconds=120):
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.grace_seconds = grace_seconds
+        self.stuck_seconds = stuck_seconds
+        self.reset()
+
+    def reset(self):
+        """Forget what we knew, e.g. after the page was (re)loaded."""
+        self._started = time.monotonic()
+        self._loading_since = {}
+        self._dashboard_refresh_attempted = False
+
+    def check(self, driver):
+        """Look at the page once and describe its refresh health."""
+        state = driver.execute_script(
+            CHART_STATE_JS,
+            CHART_CONTAINER_SELECTOR,
+            CHART_ID_SELECTOR,
+            CHART_SPINNER_SELECTOR,
+            CHART_ERROR_SELECTOR,
+        )
+        now = time.monotonic()
+
+        stuck, errored, loading_keys = [], [], set()
+        for chart in state["charts"]:
+            if chart["error"]:
+                errored.append(chart)
+            if chart["loading"]:
+                loading_keys.add(chart["key"])
+                since = self._loading_since.setdefault(chart["key"], now)
+                if now - since >= self.stuck_seconds:
+                    stuck.append(chart)
+        self._loading_since = {k: v for k, v in self._loading_since.items() if k in loading_keys}
+
+        # Completion times come from the page's clock, so compare them with it
+        completed = state["completed"] or []
+        if completed:
+            since_refresh = (state["now"] - max(c["at"] for c in completed)) / 1000
+        else:
+            since_refresh = now - self._started
+        last_by_chart = {}
+        for c in completed:
+            slice_id = slice_id_from_url(c["url"])
+            if slice_id is not None:
+                last_by_chart[slice_id] = max(last_by_chart.get(slice_id, 0), c["at"])
+
+        # A dashboard without charts sends no chart queries: nothing to go stale
+        stale = bool(state["charts"]) and since_refresh > self.refresh_interval_seconds + self.grace_seconds
+        set_gauge("seconds_since_chart_refresh", round(since_refresh, 1))
+        set_gauge("charts_stuck", len(stuck))
+        set_gauge("charts_errored", len(errored))
+        return {
+            "charts": len(state["charts"]),
+            "stuck": stuck,
+            "errored": errored,
+            "seconds_since_refresh": since_refresh,
+            "last_refresh_by_chart": last_by_chart,
+            "stale": stale,
+        }
+
+    def check_and_repair(self, driver):
+        """
+        Check the page and fix what we can with the smallest action:
+        re-query broken charts, then the whole dashboard. Raises
+        DashboardStalled when only a reload will do.
+        """
+        health = self.check(driver)
+
+        # A chart can be both loading and errored; refresh it once
+        broken = list({c["key"]: c for c in health["stuck"] + health["errored"]}.values())
+        if broken:
+            keys = ", ".join(sorted(c["key"] for c in broken))
+            log_message(f"WARNING: Charts stuck or errored: {keys}. Re-querying them.")
+            refreshed = sum(refresh_chart(driver, c["index"]) for c in broken)
+            increment("chart_refreshes", refreshed)
+            if refreshed < len(broken) and not health["stale"]:
+                log_message("Could not refresh every broken chart. Refreshing the dashboard.")
+                refresh_dashboard(driver)
+                increment("dashboard_refreshes")
+            for chart in broken:
+                self._loading_since.pop(chart["key"], None)
+
+        if not health["stale"]:
+            self._dashboard_refresh_attempted = False
+            return health
+
+        if self._dashboard_refresh_attempted:
+            raise DashboardStalled(
+                f"Dashboard did not refresh for {health['seconds_since_refresh']:.0f}s. Reloading..."
+            )
+        log_message(
+            f"WARNING: No chart refresh for {health['seconds_since_refresh']:.0f}s. "
+            "Refreshing the dashboard."
+        )
+        self._dashboard_refresh_attempted = refresh_dashboard(driver)
+        if not self._dashboard_refresh_attempted:
+            raise DashboardStalled("Dashboard did not refresh and could not be refreshed. Reloading...")
+        increment("dashboard_refreshes")
+        return health
@@ -0,0 +1,190 @@
+"""
+Buffered, rotating log writer behind log_message().
+
+log_message() only puts the line on a queue. A background thread batches
+the lines and appends them to the log file every LOG_FLUSH_INTERVAL_SECONDS,
+or straight away for warnings and errors, so the SD card sees a handful of
+writes instead of one per message. The file is rotated by size and age
+and old files are gzipped next to it.
+
+The line format is unchanged: "<timestamp>: <message>".
+"""
+import atexit
+import glob
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+LOG_FILE = os.environ.get("DASHBOARD_LOG_FILE", os.path.join(script_dir, "python_log.txt"))
+LOG_FLUSH_INTERVAL_SECONDS = 30
+LOG_MAX_BUFFERED_LINES = 500
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_MAX_AGE_DAYS = 7
+LOG_BACKUP_COUNT = 20
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LOG_FLUSH_LEVEL = WARNING  # lines at or above this level are written immediately
+
+
+def guess_level(message):
+    """Infer a severity from the wording the scripts already use."""
+    lowered = message.lower()
+    if lowered.startswith("warning"):
+        return WARNING
+    if "error" in lowered or "failed" in lowered or "exiting" in lowered:
+        return ERROR
+    return INFO
+
+
+class LogWriter:
+    """Background thread that batches log lines and owns the log file."""
+
+    def __init__(self, path, flush_interval=LOG_FLUSH_INTERVAL_SECONDS,
+                 max_bytes=LOG_MAX_BYTES, max_age_days=LOG_MAX_AGE_DAYS,
+                 backup_count=LOG_BACKUP_COUNT):
+        self.path = os.path.abspath(path)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.backup_count = backup_count
+        self._queue = queue.Queue()
+        self._started_at = self._read_start_time()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, line, level=INFO):
+        self._queue.put((line, level))
+
+    def flush(self, timeout=5):
+        """Ask the writer to flush now and wait until it has."""
+        done = threading.Event()
+        self._queue.put((done, None))
+        done.wait(timeout)
+
+    def close(self, timeout=5):
+        self._queue.put((None, None))
+        self._thread.join(timeout)
+
+    def _run(self):
+        buffer = []
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item, level = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                item, level = None, INFO
+                flush_now = True
+            else:
+                flush_now = False
+                if item is None:  # close()
+                    self._flush(buffer)
+                    return
+                if isinstance(item, threading.Event):  # flush()
+                    self._flush(buffer)
+                    item.set()
+                    continue
+                buffer.append(item)
+                flush_now = level >= LOG_FLUSH_LEVEL or len(buffer) >= LOG_MAX_BUFFERED_LINES
+
+            if flush_now or time.monotonic() >= next_flush:
+                self._flush(buffer)
+                next_flush = time.monotonic() + self.flush_interval
+
+    def _flush(self, buffer):
+        if not buffer:
+            return
+        try:
+            self._rotate_if_needed()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as log_file:
+                log_file.write("".join(buffer))
+        except OSError:
+            # Never let logging take the kiosk down; keep the lines for next time
+            return
+        buffer.clear()
+
+    def _read_start_time(self):
+        """Timestamp of the first line in the current file (for age rotation)."""
+        try:
+            with open(self.path, "r") as f:
+                first = f.readline()
+            return datetime.fromisoformat(first.split(": ", 1)[0]).timestamp()
+        except (OSError, ValueError):
+            return time.time()
+
+    def _rotate_if_needed(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        too_big = size >= self.max_bytes
+        too_old = time.time() - self._started_at >= self.max_age_seconds
+        if size and (too_big or too_old):
+            self._rotate()
+
+    def _rotate(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{stamp}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(rotated, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        self._started_at = time.time()
+
+        # Timestamped names sort chronologically; drop the oldest
+        backups = sorted(glob.glob(f"{base}.*{ext}.gz"))
+        for old in backups[:-self.backup_count]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def configure_logging(path=None, **settings):
+    """
+    (Re)start the writer with a different file or settings, e.g.
+    configure_logging("/var/log/dashboard/python_log.txt", flush_interval=10).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = LogWriter(path or LOG_FILE, **settings)
+    return _writer
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = LogWriter(LOG_FILE)
+    return _writer
+
+
+def log_message(message, level=None):
+    """Queue a line for the log file. Never blocks on disk I/O."""
+    if level is None:
+        level = guess_level(message)
+    _get_writer().write(f"{datetime.now()}: {message}\n", level)
+
+
+def flush_logs():
+    if _writer is not None:
+        _writer.flush()
+
+
+@atexit.register
+def _close_on_exit():
+    if _writer is not None:
+        _writer.close()
@@ -0,0 +1,590 @@
+"""
+Reports from the kiosk logs: availability, restarts, MTTR, step latencies.
+
+Streams python_log.txt, bashscript_log.txt and their rotated, gzipped
+copies line by line in constant memory (durations go into fixed
+log-spaced histograms, not lists), so months of logs take seconds:
+
+    python dashboard_log_analytics.py                    # the logs next to the scripts
+    python dashboard_log_analytics.py logs/pi-1 logs/pi-2 # one directory per kiosk
+    python dashboard_log_analytics.py logs/pi-* --json
+
+Each directory (or the directory of each file given) is one kiosk. The
+events come from the lines log_message() already writes:
+
+- incidents: "Error encountered: ..." until "Recovered with '<tier>' ...";
+- outages: "Superset at ... is unreachable" until "... is reachable";
+- restarts: "Started controller" (the supervisor, in bashscript_log.txt;
+  "Starting dashboard script..." before it), "Started browser with
+  binary" and "Recycling browser";
+- step latencies: "Span <step> finished in 1.234s" / "failed after";
+- boot times: "Time to first dashboard: 9.8s (54.3s after power-on)";
+- dashboard loads: "Dashboard '<title>' ready in 3.2s (...); 1.42 MB over
+  the network, 42 requests, 38 from cache" (older logs only have the time);
+- failing XPath steps: "Skipped '<step>' (<xpath>): ...".
+
+Availability is the share of the logged period outside incidents and
+outages. A kiosk that was switched off logs nothing, so that time is not
+counted as down.
+"""
+import argparse
+import glob
+import gzip
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+PYTHON_LOG_NAMES = ("python_log*.txt", "python_log*.txt.gz")
+BASH_LOG_NAMES = ("bashscript_log*.txt", "bashscript_log*.txt.gz")
+
+# Latency histogram: 1 ms to ~3 h in 5 % steps
+HISTOGRAM_MIN_SECONDS = 0.001
+HISTOGRAM_GROWTH = 1.05
+HISTOGRAM_BUCKETS = 330
+PERCENTILES = (50, 90, 99)
+
+# Logs are read in large blocks; the regex engine skips the uninteresting lines
+CHUNK_BYTES = 8 * 1024 * 1024
+EVENT_PATTERN = re.compile(
+    rb": ((?:Span |Error encountered: |Recovered with '|Skipped '|Started browser|Recycling browser"
+    rb"|Superset |Time to first dashboard: |Dashboard (?:rotation s|fleet s|S)hutdown"
+    rb"|Dashboard (?:'[^\n]*' )?ready in )[^\n]*)"
+)
+TIMESTAMP_PATTERN = re.compile(rb"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d+)?): ", re.M)
+
+
+class Histogram:
+    """Fixed log-spaced buckets: constant memory, percentiles within 5 %."""
+
+    __slots__ = ("counts", "count", "total", "low", "high")
+
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = 0.0
+
+    def add(self, seconds):
+        if seconds <= HISTOGRAM_MIN_SECONDS:
+            index = 0
+        else:
+            index = min(HISTOGRAM_BUCKETS - 1,
+                        int(math.log(seconds / HISTOGRAM_MIN_SECONDS, HISTOGRAM_GROWTH)) + 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.low = min(self.low, seconds)
+        self.high = max(self.high, seconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+
+    def percentile(self, q):
+        """The q-th percentile (upper bound of its bucket, never above the maximum)."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                upper = HISTOGRAM_MIN_SECONDS * HISTOGRAM_GROWTH ** index
+                return max(self.low, min(upper, self.high))
+        return self.high
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self):
+        result = {"count": self.count, "mean": self.mean(), "max": self.high if self.count else None}
+        for q in PERCENTILES:
+            result[f"p{q}"] = self.percentile(q)
+        return result
+
+
+def parse_python_timestamp(raw):
+    """datetime from the "2025-02-10 08:00:01.123456" prefix of a python_log.txt line."""
+    try:
+        return datetime.fromisoformat(raw.decode())
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def parse_bash_timestamp(raw):
+    """datetime from `date` output, e.g. "Mon Feb 10 08:00:01 CAT 2025" (time zone ignored)."""
+    parts = raw.decode(errors="replace").split()
+    if len(parts) < 5:
+        return None
+    try:
+        return datetime.strptime(f"{parts[1]} {parts[2]} {parts[-1]} {parts[3]}", "%b %d %Y %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def open_log(path):
+    """Binary line iterator over a plain or gzipped log."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb", buffering=1024 * 1024)
+
+
+def read_blocks(path):
+    """The log in CHUNK_BYTES blocks that end at a line break."""
+    with open_log(path) as f:
+        rest = b""
+        while True:
+            block = f.read(CHUNK_BYTES)
+            if not block:
+                if rest:
+                    yield rest
+                return
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+            rest = block[cut:]
+            if cut:
+                yield block[:cut]
+
+
+def first_timestamp(path):
+    """When a python_log.txt (or a rotated copy) starts."""
+    try:
+        for block in read_blocks(path):
+            match = TIMESTAMP_PATTERN.search(block)
+            if match:
+                return parse_python_timestamp(match.group(1))
+    except (OSError, EOFError):
+        pass
+    return None
+
+
+class KioskStats:
+    """Everything the report needs from one kiosk's logs, accumulated line by line."""
+
+    def __init__(self, name):
+        self.name = name
+        self.first = None
+        self.last = None
+        self.lines = 0
+        self.down_seconds = 0.0
+        self.recovery = Histogram()     # incident durations (MTTR)
+        self.outage = Histogram()       # outage durations
+        self.first_dashboard = Histogram()        # process start -> first dashboard
+        self.power_on_to_dashboard = Histogram()  # the same after a cold boot, from power-on
+        self.dashboard_ready = Histogram()        # every dashboard load, to ready
+        self.transfer_mb = Histogram()            # what a load transferred (MB, where logged)
+        self.transfer_requests = 0
+        self.transfer_cached = 0
+        self.steps = defaultdict(Histogram)
+        self.step_failures = Counter()
+        self.skipped = Counter()        # (step, xpath) -> count
+        self.tiers = Counter()          # recovery tier that worked -> count
+        self.per_day = defaultdict(Counter)
+        self._incident_since = None
+        self._outage_since = None
+        self._down_since = None
+
+    # -- intervals --
+
+    def _update_down(self, at):
+        down = self._incident_since is not None or self._outage_since is not None
+        if down and self._down_since is None:
+            self._down_since = at
+        elif not down and self._down_since is not None:
+            self.down_seconds += max(0.0, (at - self._down_since).total_seconds())
+            self._down_since = None
+
+    def _start_incident(self, at):
+        if self._incident_since is None:
+            self._incident_since = at
+            self._update_down(at)
+
+    def _end_incident(self, at):
+        if self._incident_since is not None:
+            self.recovery.add(max(0.0, (at - self._incident_since).total_seconds()))
+            self._incident_since = None
+            self._update_down(at)
+
+    def _start_outage(self, at):
+        if self._outage_since is None:
+            self._outage_since = at
+            self._update_down(at)
+
+    def _end_outage(self, at):
+        if self._outage_since is not None:
+            self.outage.add(max(0.0, (at - self._outage_since).total_seconds()))
+            self._outage_since = None
+            self._update_down(at)
+
+    # -- python_log.txt --
+
+    def read_python_log(self, path):
+        for block in read_blocks(path):
+            self.lines += block.count(b"\n")
+            if self.first is None:
+                match = TIMESTAMP_PATTERN.search(block)
+                self.first = parse_python_timestamp(match.group(1)) if match else None
+            for match in EVENT_PATTERN.finditer(block):
+                start = match.start()
+                raw = block[block.rfind(b"\n", 0, start) + 1:start]
+                if raw[4:5] != b"-" or raw[10:11] != b" ":
+                    continue  # the text turned up inside another message
+                self._python_event(raw, match.group(1).rstrip(b"\r"))
+            tail = TIMESTAMP_PATTERN.findall(block, max(0, len(block) - 64 * 1024))
+            if tail:
+                stamp = parse_python_timestamp(tail[-1])
+                if stamp is not None:
+                    self.last = stamp if self.last is None else max(self.last, stamp)
+
+    def _python_event(self, raw, message):
+        day = raw[:10].decode(errors="replace")
+        if message.startswith(b"Span "):
+            parts = message.split(b" ")
+            if len(parts) >= 5 and parts[-1].endswith(b"s"):
+                try:
+                    seconds = float(parts[-1][:-1])
+                except ValueError:
+                    return
+                step = parts[1].decode(errors="replace")
+                self.steps[step].add(seconds)
+                if parts[2] == b"failed":
+                    self.step_failures[step] += 1
+        elif message.startswith(b"Skipped '"):
+            end = message.find(b"' (", 9)
+            close = message.find(b"): ", end)
+            if end > 0 and close > 0:
+                step = message[9:end].decode(errors="replace")
+                xpath = message[end + 3:close].decode(errors="replace")
+                self.skipped[(step, xpath)] += 1
+        elif message.startswith(b"Error encountered: "):
+            at = parse_python_timestamp(raw)
+            if at is not None:
+                if self._incident_since is None:
+                    self.per_day[day]["incidents"] += 1
+                self._start_incident(at)
+        elif message.startswith(b"Recovered with '"):
+            tier = message[16:message.find(b"'", 16)].decode(errors="replace")
+            self.tiers[tier] += 1
+            at = parse_python_timestamp(raw)
+            if at is not None:
+                self._end_incident(at)
+        elif message.startswith(b"Time to first dashboard: "):
+            # "Time to first dashboard: 9.8s" + " (54.3s after power-on)" after a cold boot
+            parts = message[25:].split()
+            try:
+                self.first_dashboard.add(float(parts[0].rstrip(b"s")))
+                if len(parts) > 1:
+                    self.power_on_to_dashboard.add(float(parts[1].lstrip(b"(").rstrip(b"s")))
+            except (IndexError, ValueError):
+                pass
+        elif message.startswith(b"Dashboard ") and b" ready in " in message:
+            self._dashboard_ready(day, message)
+        elif message.startswith(b"Started browser with binary"):
+            self.per_day[day]["browser_starts"] += 1
+        elif message.startswith(b"Recycling browser"):
+            self.per_day[day]["browser_recycles"] += 1
+        elif message.startswith(b"Superset"):
+            # "Superset at host:port is unreachable: ..." / "... is reachable (...)",
+            # and the older "Superset is unreachable." / "Superset is reachable again"
+            head = message.partition(b": ")[0]
+            if b" is unreachable" in head:
+                at = parse_python_timestamp(raw)
+                if at is not None:
+                    if self._outage_since is None:
+                        self.per_day[day]["outages"] += 1
+                    self._start_outage(at)
+            elif b" is reachable" in head:
+                at = parse_python_timestamp(raw)
+                if at is not None:
+                    self._end_outage(at)
+        elif message.startswith((b"Dashboard Shutdown by ", b"Dashboard rotation shutdown",
+                                 b"Dashboard fleet shutdown")):
+            at = parse_python_timestamp(raw)
+            if at is not None:
+                self._end_incident(at)
+                self._end_outage(at)
+
+    def _dashboard_ready(self, day, message):
+        # "... ready in 3.2s (grid ...); 1.42 MB over the network, 42 requests, 38 from cache."
+        head, _, transfer = message.rpartition(b"; ")
+        try:
+            seconds = float(message.split(b" ready in ", 1)[1].split(b"s", 1)[0])
+        except (IndexError, ValueError):
+            return
+        self.dashboard_ready.add(seconds)
+        self.per_day[day]["loads"] += 1
+        parts = transfer.split()
+        if not head or len(parts) < 8 or parts[1] != b"MB":
+            return
+        try:
+            mb, requests, cached = float(parts[0]), int(parts[5]), int(parts[7])
+        except ValueError:
+            return
+        self.transfer_mb.add(mb)
+        self.transfer_requests += requests
+        self.transfer_cached += cached
+        self.per_day[day]["measured_loads"] += 1
+        self.per_day[day]["transfer_mb"] += mb
+
+    def finish(self):
+        """Close intervals still open at the end of the logs."""
+        if self.last is not None:
+            self._end_incident(self.last)
+            self._end_outage(self.last)
+
+    # -- bashscript_log.txt --
+
+    def read_bash_log(self, path):
+        with open_log(path) as f:
+            for line in f:
+                self.lines += 1
+                if b": Started controller" in line:
+                    # dashboard_supervisor.py writes log_message()'s timestamp format
+                    at = parse_python_timestamp(line.partition(b": ")[0])
+                elif b"Starting dashboard script" in line:
+                    at = parse_bash_timestamp(line.partition(b": ")[0])
+                else:
+                    continue
+                if at is not None:
+                    self.per_day[at.strftime("%Y-%m-%d")]["process_starts"] += 1
+
+    # -- results --
+
+    @property
+    def observed_seconds(self):
+        if self.first is None or self.last is None:
+            return 0.0
+        return max(0.0, (self.last - self.first).total_seconds())
+
+    def availability(self):
+        observed = self.observed_seconds
+        return None if not observed else max(0.0, 1 - self.down_seconds / observed)
+
+    def merge(self, other):
+        """Fold another kiosk into a fleet total."""
+        self.lines += other.lines
+        self.down_seconds += other.down_seconds
+        self.recovery.merge(other.recovery)
+        self.outage.merge(other.outage)
+        self.first_dashboard.merge(other.first_dashboard)
+        self.power_on_to_dashboard.merge(other.power_on_to_dashboard)
+        self.dashboard_ready.merge(other.dashboard_ready)
+        self.transfer_mb.merge(other.transfer_mb)
+        self.transfer_requests += other.transfer_requests
+        self.transfer_cached += other.transfer_cached
+        for step, histogram in other.steps.items():
+            self.steps[step].merge(histogram)
+        self.step_failures.update(other.step_failures)
+        self.skipped.update(other.skipped)
+        self.tiers.update(other.tiers)
+        for day, counts in other.per_day.items():
+            self.per_day[day].update(counts)
+
+
+def find_logs(directory, patterns):
+    """Log files in a directory, oldest first (rotated copies carry a timestamp)."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(directory, pattern)))
+    return sorted(paths)
+
+
+def kiosk_inputs(paths):
+    """{kiosk directory: (python logs, bash logs)} for the given files and directories."""
+    kiosks = defaultdict(lambda: ([], []))
+    for path in paths:
+        if os.path.isdir(path):
+            directory = os.path.abspath(path)
+            kiosks[directory][0].extend(find_logs(directory, PYTHON_LOG_NAMES))
+            kiosks[directory][1].extend(find_logs(directory, BASH_LOG_NAMES))
+        elif os.path.exists(path):
+            directory = os.path.dirname(os.path.abspath(path))
+            is_bash = os.path.basename(path).startswith("bashscript_log")
+            kiosks[directory][1 if is_bash else 0].append(path)
+        else:
+            raise FileNotFoundError(path)
+    return kiosks
+
+
+def analyse_kiosk(name, python_logs, bash_logs):
+    stats = KioskStats(name)
+    # Incidents can span a rotation, so read the files in time order
+    ordered = sorted(python_logs, key=lambda p: first_timestamp(p) or datetime.min)
+    for path in ordered:
+        stats.read_python_log(path)
+    stats.finish()
+    for path in bash_logs:
+        stats.read_bash_log(path)
+    return stats
+
+
+def build_report(kiosks, days=30, top=10):
+    """The report as a JSON-serialisable dict."""
+    fleet = KioskStats("fleet")
+    per_kiosk = []
+    for stats in kiosks:
+        fleet.merge(stats)
+        per_kiosk.append({
+            "kiosk": stats.name,
+            "from": stats.first.isoformat() if stats.first else None,
+            "to": stats.last.isoformat() if stats.last else None,
+            "lines": stats.lines,
+            "availability": stats.availability(),
+            "down_seconds": stats.down_seconds,
+            "incidents": stats.recovery.count,
+            "mttr_seconds": stats.recovery.mean(),
+            "outages": stats.outage.count,
+            "outage_seconds": stats.outage.total,
+        })
+    observed = sum(s.observed_seconds for s in kiosks)
+    recent_days = sorted(fleet.per_day)[-days:] if days else sorted(fleet.per_day)
+    return {
+        "kiosks": per_kiosk,
+        "availability": None if not observed else max(0.0, 1 - fleet.down_seconds / observed),
+        "recovery": fleet.recovery.summary(),
+        "recovery_tiers": dict(fleet.tiers.most_common()),
+        "outages": fleet.outage.summary(),
+        "first_dashboard": fleet.first_dashboard.summary(),
+        "power_on_to_dashboard": fleet.power_on_to_dashboard.summary(),
+        "dashboard_loads": {
+            "ready_seconds": fleet.dashboard_ready.summary(),
+            "transfer_mb": fleet.transfer_mb.summary(),
+            "cache_hit_share": (fleet.transfer_cached / fleet.transfer_requests
+                                if fleet.transfer_requests else None),
+        },
+        "per_day": {day: dict(fleet.per_day[day]) for day in recent_days},
+        "steps": {
+            step: dict(histogram.summary(), failures=fleet.step_failures[step])
+            for step, histogram in sorted(fleet.steps.items())
+        },
+        "failing_steps": [
+            {"step": step, "xpath": xpath, "count": count}
+            for (step, xpath), count in fleet.skipped.most_common(top)
+        ],
+    }
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m {seconds}s"
+
+
+def format_percent(value):
+    return "-" if value is None else f"{value * 100:.2f} %"
+
+
+def format_boot_times(label, summary):
+    return (
+        f"{label}: {summary['count']} starts, p50 {format_duration(summary['p50'])}, "
+        f"p90 {format_duration(summary['p90'])}, max {format_duration(summary['max'])}"
+    )
+
+
+def format_dashboard_loads(loads):
+    ready, transfer = loads["ready_seconds"], loads["transfer_mb"]
+    line = (
+        f"Dashboard loads: {ready['count']}, ready p50 {format_duration(ready['p50'])}, "
+        f"p90 {format_duration(ready['p90'])}"
+    )
+    if transfer["count"]:
+        line += (
+            f"; per load p50 {transfer['p50']:.2f} MB, p90 {transfer['p90']:.2f} MB over the network, "
+            f"{format_percent(loads['cache_hit_share'])} of requests from cache"
+        )
+    return line
+
+
+def format_report(report):
+    lines = []
+    for kiosk in report["kiosks"]:
+        lines.append(
+            f"{kiosk['kiosk']}: {kiosk['from'] or '?'} -> {kiosk['to'] or '?'}, {kiosk['lines']:,} lines"
+        )
+        lines.append(
+            f"  availability {format_percent(kiosk['availability'])} "
+            f"(down {format_duration(kiosk['down_seconds'])}), "
+            f"{kiosk['incidents']} incidents (MTTR {format_duration(kiosk['mttr_seconds'])}), "
+            f"{kiosk['outages']} outages ({format_duration(kiosk['outage_seconds'])})"
+        )
+    recovery = report["recovery"]
+    lines += [
+        "",
+        f"Availability: {format_percent(report['availability'])}",
+        f"Incidents: {recovery['count']}, MTTR {format_duration(recovery['mean'])} "
+        f"(p50 {format_duration(recovery['p50'])}, p90 {format_duration(recovery['p90'])}, "
+        f"max {format_duration(recovery['max'])})",
+        "Recovered by: " + (", ".join(f"{t} {n}" for t, n in report["recovery_tiers"].items()) or "-"),
+        f"Outages: {report['outages']['count']}, mean {format_duration(report['outages']['mean'])}",
+        format_boot_times("Time to first dashboard", report["first_dashboard"]),
+        format_boot_times("  after power-on", report["power_on_to_dashboard"]),
+        format_dashboard_loads(report["dashboard_loads"]),
+        "",
+        f"{'Day':<12}{'process':>9}{'browser':>9}{'recycle':>9}{'incident':>10}{'outage':>8}"
+        f"{'loads':>7}{'MB/load':>9}",
+    ]
+    for day, counts in report["per_day"].items():
+        measured = counts.get("measured_loads", 0)
+        per_load = f"{counts['transfer_mb'] / measured:.2f}" if measured else "-"
+        lines.append(
+            f"{day:<12}{counts.get('process_starts', 0):>9}{counts.get('browser_starts', 0):>9}"
+            f"{counts.get('browser_recycles', 0):>9}{counts.get('incidents', 0):>10}{counts.get('outages', 0):>8}"
+            f"{counts.get('loads', 0):>7}{per_load:>9}"
+        )
+    lines += ["", f"{'Step (seconds)':<28}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'failed':>8}"]
+    for step, s in report["steps"].items():
+        lines.append(
+            f"{step:<28}{s['count']:>8}{s['p50']:>9.3f}{s['p90']:>9.3f}{s['p99']:>9.3f}"
+            f"{s['max']:>9.3f}{s['failures']:>8}"
+        )
+    if report["failing_steps"]:
+        lines += ["", "Most common failing steps:"]
+        for f in report["failing_steps"]:
+            lines.append(f"{f['count']:>7}  {f['step']}  {f['xpath']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Availability, restart and latency report from the kiosk logs.")
+    parser.add_argument("paths", nargs="*", default=[script_dir],
+                        help="log files or directories, one directory per kiosk (default: this directory)")
+    parser.add_argument("--days", type=int, default=30, help="days in the per-day table (0: all)")
+    parser.add_argument("--top", type=int, default=10, help="failing steps to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        inputs = kiosk_inputs(args.paths)
+    except FileNotFoundError as e:
+        parser.error(f"No such file or directory: {e}")
+    kiosks = [analyse_kiosk(name, python_logs, bash_logs)
+              for name, (python_logs, bash_logs) in sorted(inputs.items())]
+    report = build_report(kiosks, args.days, args.top)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
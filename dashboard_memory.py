@@ -0,0 +1,139 @@
+"""
+Memory watchdog for the Chromium process tree.
+
+gc.collect() only frees memory in our own Python process; what actually
+grows over days of auto-refresh is Chromium's renderers. The watchdog
+walks the driver's process tree in /proc, sums RSS and PSS, keeps a
+rolling history and says when the configured budget has been crossed so
+the caller can recycle the browser at a convenient moment.
+"""
+import os
+import time
+from collections import deque
+
+PROC_DIR = "/proc"
+
+
+def browser_root_pid(driver):
+    """
+    PID of the browser an attached driver talks to (see dashboard_browser.py),
+    else of the chromedriver process that owns the browser, or None.
+    """
+    if getattr(driver, "browser_pid", None) is not None:
+        return driver.browser_pid
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def _parent_pids():
+    """Map of pid -> parent pid for every process we can see."""
+    parents = {}
+    for entry in os.listdir(PROC_DIR):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{PROC_DIR}/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in brackets and may contain spaces
+        fields = stat[stat.rfind(")") + 2:].split()
+        parents[int(entry)] = int(fields[1])
+    return parents
+
+
+def process_tree(root_pid):
+    """The root pid plus all of its descendants."""
+    children = {}
+    for pid, ppid in _parent_pids().items():
+        children.setdefault(ppid, []).append(pid)
+    tree = []
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def _read_kb(path, key):
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith(key):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def process_memory_kb(pid):
+    """(RSS, PSS) of one process in kB. PSS falls back to RSS if unavailable."""
+    rss = _read_kb(f"{PROC_DIR}/{pid}/status", "VmRSS:") or 0
+    pss = _read_kb(f"{PROC_DIR}/{pid}/smaps_rollup", "Pss:")
+    return rss, pss if pss is not None else rss
+
+
+class MemoryWatchdog:
+    """Samples the browser's memory on a schedule and tracks a budget."""
+
+    def __init__(self, budget_mb, sample_interval_seconds=60, history_size=1440):
+        self.budget_mb = budget_mb
+        self.sample_interval_seconds = sample_interval_seconds
+        self.history = deque(maxlen=history_size)
+        self._last_sample = None
+
+    def due(self):
+        return (
+            self._last_sample is None
+            or time.monotonic() - self._last_sample >= self.sample_interval_seconds
+        )
+
+    def sample(self, driver):
+        """Take one sample of the driver's process tree and return it."""
+        self._last_sample = time.monotonic()
+        root = browser_root_pid(driver)
+        if root is None:
+            return None
+        rss_kb = pss_kb = 0
+        pids = process_tree(root)
+        for pid in pids:
+            rss, pss = process_memory_kb(pid)
+            rss_kb += rss
+            pss_kb += pss
+        sample = {
+            "time": time.time(),
+            "processes": len(pids),
+            "rss_mb": rss_kb / 1024,
+            "pss_mb": pss_kb / 1024,
+        }
+        self.history.append(sample)
+        return sample
+
+    @property
+    def latest(self):
+        return self.history[-1] if self.history else None
+
+    @property
+    def over_budget(self):
+        """True once the latest sample's PSS is above the budget."""
+        return self.latest is not None and self.latest["pss_mb"] > self.budget_mb
+
+    def near_budget(self, fraction):
+        """True if the latest PSS is above this fraction of the budget."""
+        return self.latest is not None and self.latest["pss_mb"] > self.budget_mb * fraction
+
+    def growth_mb_per_hour(self):
+        """PSS growth rate across the rolling history."""
+        if len(self.history) < 2:
+            return 0.0
+        first, last = self.history[0], self.history[-1]
+        hours = (last["time"] - first["time"]) / 3600
+        return (last["pss_mb"] - first["pss_mb"]) / hours if hours > 0 else 0.0
+
+    def reset(self):
+        """Forget the history, e.g. after the browser has been recycled."""
+        self.history.clear()
+        self._last_sample = None
@@ -0,0 +1,186 @@
+"""
+Timing spans, counters and gauges for the dashboard workflow.
+
+Wrap a workflow step with @timed_step("name") (or `with span("name"):`)
+to record how long it took in a histogram; failures are counted per step.
+export_metrics() writes everything as a Prometheus textfile (for the node
+exporter's textfile collector) and as a JSON status file.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dashboard_log import log_message
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+METRICS_TEXTFILE = os.environ.get(
+    "DASHBOARD_METRICS_TEXTFILE", os.path.join(script_dir, "dashboard.prom")
+)
+STATUS_FILE = os.environ.get(
+    "DASHBOARD_STATUS_FILE", os.path.join(script_dir, "dashboard_status.json")
+)
+METRIC_PREFIX = "superset_dashboard"
+
+# Histogram buckets in seconds, from a quick tab switch to a slow Pi login
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_started_at = time.time()
+_histograms = {}   # step -> {"buckets": [...], "sum": float, "count": int, "last": float}
+_counters = {}     # (name, labels) -> float
+_gauges = {}       # (name, labels) -> float
+_info = {}         # free-form values for the status file
+
+
+def _labels_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def observe(step, seconds):
+    """Record one duration for a step."""
+    with _lock:
+        hist = _histograms.setdefault(
+            step, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0, "last": 0.0}
+        )
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+        hist["last"] = seconds
+
+
+def increment(name, amount=1, **labels):
+    """Add to a counter, e.g. increment("browser_restarts")."""
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[(name, _labels_key(labels))] = value
+
+
+def set_info(**values):
+    """Free-form values for the JSON status file (current dashboard etc.)."""
+    with _lock:
+        _info.update(values)
+
+
+@contextmanager
+def span(step):
+    """Time a block of work as one step; failures are counted and re-raised."""
+    start = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        elapsed = time.monotonic() - start
+        increment("step_failures", step=step)
+        log_message(f"Span {step} failed after {elapsed:.3f}s")
+        raise
+    elapsed = time.monotonic() - start
+    observe(step, elapsed)
+    log_message(f"Span {step} finished in {elapsed:.3f}s")
+
+
+def timed_step(step):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(step):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        name = f"{METRIC_PREFIX}_step_duration_seconds"
+        lines.append(f"# HELP {name} Duration of dashboard workflow steps.")
+        lines.append(f"# TYPE {name} histogram")
+        for step, hist in sorted(_histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, hist["buckets"]):
+                lines.append(f'{name}_bucket{{step="{_escape(step)}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{step="{_escape(step)}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{name}_sum{{step="{_escape(step)}"}} {hist["sum"]:.6f}')
+            lines.append(f'{name}_count{{step="{_escape(step)}"}} {hist["count"]}')
+
+        for counter in sorted({n for n, _ in _counters}):
+            full = f"{METRIC_PREFIX}_{counter}_total"
+            lines.append(f"# TYPE {full} counter")
+            for (n, labels), value in sorted(_counters.items()):
+                if n == counter:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for gauge in sorted({n for n, _ in _gauges}):
+            full = f"{METRIC_PREFIX}_{gauge}"
+            lines.append(f"# TYPE {full} gauge")
+            for (n, labels), value in sorted(_gauges.items()):
+                if n == gauge:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_start_time_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_start_time_seconds {_started_at:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def status():
+    """A JSON-friendly snapshot of all metrics."""
+    with _lock:
+        steps = {
+            step: {
+                "count": hist["count"],
+                "last_seconds": round(hist["last"], 3),
+                "mean_seconds": round(hist["sum"] / hist["count"], 3) if hist["count"] else None,
+            }
+            for step, hist in _histograms.items()
+        }
+        counters = {
+            name + _format_labels(labels): value for (name, labels), value in _counters.items()
+        }
+        gauges = {
+            name + _format_labels(labels): value for (name, labels), value in _gauges.items()
+        }
+        return {
+            "updated_at": time.time(),
+            "uptime_seconds": round(time.time() - _started_at),
+            "pid": os.getpid(),
+            "steps": steps,
+            "counters": counters,
+            "gauges": gauges,
+            "info": dict(_info),
+        }
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def export_metrics(textfile=None, status_file=None):
+    """Write the Prometheus textfile and the JSON status file."""
+    try:
+        _write_atomic(textfile or METRICS_TEXTFILE, prometheus_text())
+        _write_atomic(status_file or STATUS_FILE, json.dumps(status(), indent=2))
+    except OSError as e:
+        log_message(f"WARNING: Could not export metrics: {e}")
@@ -0,0 +1,215 @@
+"""
+Mosaic mode: several dashboards tiled in one Chromium window.
+
+A [[dashboards]] entry with `tiles` is a mosaic: a grid page with one
+iframe per tile, each an embedded standalone dashboard. One browser can
+then drive a wall that used to need a box (and a Chromium) per screen.
+
+The grid page is written into a page of Superset's own origin (its
+/health endpoint), so the tiles are same-origin: Superset's
+X-Frame-Options SAMEORIGIN lets them load, the session cookies apply, the
+request tracker runs in every tile and the health checks can look inside
+them. Each tile is refreshed on its own schedule (refresh_minutes) and
+has its own refresh-health monitor; a stalled tile is reloaded on its
+own, without touching the others.
+"""
+import html
+import math
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+
+import dashboard_readiness
+from dashboard_health import DashboardStalled, RefreshHealthMonitor, refresh_dashboard
+from dashboard_log import log_message
+from dashboard_metrics import increment
+from dashboard_readiness import wait_for_dashboard_ready
+from dashboard_url_state import build_dashboard_url
+
+TILE_SELECTOR = "iframe[data-tile]"
+
+MOSAIC_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s</title>
+<style>
+  html, body { margin: 0; height: 100%%; background: #000; overflow: hidden; }
+  .mosaic { display: grid; height: 100%%; gap: %(gap)dpx;
+            grid-template-columns: repeat(%(columns)d, 1fr); grid-template-rows: repeat(%(rows)d, 1fr); }
+  iframe { width: 100%%; height: 100%%; border: 0; background: #fff; }
+</style></head>
+<body><div class="mosaic">
+%(tiles)s
+</div></body></html>
+"""
+
+# True for each tile whose document has mounted the dashboard grid
+TILES_MOUNTED_JS = """
+var frames = document.querySelectorAll(arguments[0]);
+var mounted = [];
+for (var i = 0; i < frames.length; i++) {
+  var doc = null;
+  try { doc = frames[i].contentDocument; } catch (e) {}
+  mounted.push(!!(doc && doc.readyState === 'complete' && doc.querySelector(arguments[1])));
+}
+return mounted;
+"""
+
+
+def is_mosaic(dashboard):
+    return "tiles" in dashboard
+
+
+def mosaic_html(mosaic, gap=4):
+    """The grid page for a mosaic."""
+    tiles = mosaic["tiles"]
+    columns = mosaic.get("columns") or math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    frames = "\n".join(
+        f'<iframe data-tile="{i}" title="{html.escape(tile.get("title", tile["url"]))}" '
+        f'src="{html.escape(build_dashboard_url(tile["url"], standalone=True, expand_filters=False))}"></iframe>'
+        for i, tile in enumerate(tiles)
+    )
+    return MOSAIC_PAGE % {
+        "title": html.escape(mosaic["title"]), "gap": gap, "columns": columns, "rows": rows, "tiles": frames,
+    }
+
+
+def mosaic_host_url(base_url):
+    """The same-origin page the grid is written into."""
+    return f"{base_url}/health"
+
+
+@contextmanager
+def in_tile(driver, index):
+    """Run WebDriver commands inside one tile's document."""
+    frames = driver.find_elements(By.CSS_SELECTOR, TILE_SELECTOR)
+    if index >= len(frames):
+        raise WebDriverException(f"Mosaic tile {index} is missing.")
+    driver.switch_to.frame(frames[index])
+    try:
+        yield
+    finally:
+        driver.switch_to.default_content()
+
+
+def write_mosaic(driver, mosaic):
+    """Replace the current (Superset-origin) page with the mosaic's grid."""
+    driver.execute_script(
+        "document.open(); document.write(arguments[0]); document.close();", mosaic_html(mosaic)
+    )
+
+
+def open_mosaic(driver, base_url, mosaic, timeout, navigate=True):
+    """Show a mosaic in the current tab and wait for its tiles."""
+    if navigate:
+        driver.get(mosaic_host_url(base_url))
+    write_mosaic(driver, mosaic)
+    deadline = time.monotonic() + timeout
+    for index, tile in enumerate(mosaic["tiles"]):
+        title = tile.get("title", tile["url"])
+        try:
+            with in_tile(driver, index):
+                timings = wait_for_dashboard_ready(driver, max(1, deadline - time.monotonic()))
+            log_message(f"Mosaic tile '{title}' ready in {timings['total']:.1f}s.")
+        except TimeoutException as e:
+            log_message(f"WARNING: Mosaic tile '{title}' not fully ready: {e}")
+
+
+def mosaic_mounted(driver, mosaic):
+    """True if every tile of the mosaic has mounted its dashboard."""
+    mounted = driver.execute_script(
+        TILES_MOUNTED_JS, TILE_SELECTOR, dashboard_readiness.DASHBOARD_GRID_SELECTOR
+    )
+    return len(mounted) == len(mosaic["tiles"]) and all(mounted)
+
+
+def reload_tile(driver, index):
+    driver.execute_script(
+        "document.querySelectorAll(arguments[0])[arguments[1]].contentWindow.location.reload();",
+        TILE_SELECTOR,
+        index,
+    )
+
+
+class MosaicMonitor:
+    """
+    Refresh schedule and refresh health of every tile of a mosaic. Has the
+    interface of RefreshHealthMonitor, so the main loop treats a mosaic
+    like any dashboard.
+    """
+
+    def __init__(self, mosaic, refresh_interval_seconds, grace_seconds=60, stuck_seconds=120):
+        self.mosaic = mosaic
+        self.tiles = [
+            {
+                "tile": tile,
+                "own_interval": "refresh_minutes" in tile,
+                "monitor": RefreshHealthMonitor(
+                    tile.get("refresh_minutes", 0) * 60 or refresh_interval_seconds, grace_seconds, stuck_seconds
+                ),
+            }
+            for tile in mosaic["tiles"]
+        ]
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.reset()
+
+    @property
+    def refresh_interval_seconds(self):
+        return self._refresh_interval_seconds
+
+    @refresh_interval_seconds.setter
+    def refresh_interval_seconds(self, seconds):
+        """The interval of the tiles without refresh_minutes of their own."""
+        self._refresh_interval_seconds = seconds
+        for tile in self.tiles:
+            if not tile["own_interval"]:
+                tile["monitor"].refresh_interval_seconds = seconds
+
+    def reset(self):
+        now = time.monotonic()
+        for tile in self.tiles:
+            tile["monitor"].reset()
+            tile["next_refresh"] = now + tile["monitor"].refresh_interval_seconds
+
+    def _refresh_tile(self, driver, index, title):
+        with in_tile(driver, index):
+            refreshed = refresh_dashboard(driver)
+        if not refreshed:
+            log_message(f"Could not refresh mosaic tile '{title}' through its menu. Reloading it.")
+            reload_tile(driver, index)
+        increment("tile_refreshes")
+
+    def check_and_repair(self, driver):
+        """
+        Refresh the tiles that are due, then check each one and repair it:
+        charts first, then the tile's dashboard, then a reload of the tile.
+        Returns the combined health of the tiles.
+        """
+        combined = {"charts": 0, "stuck": [], "errored": [], "stale": False, "tiles": {}}
+        now = time.monotonic()
+        for index, tile in enumerate(self.tiles):
+            title = tile["tile"].get("title", tile["tile"]["url"])
+            monitor = tile["monitor"]
+            if now >= tile["next_refresh"]:
+                # A tile whose dashboard has no charts has nothing to refresh
+                if tile.get("charts") != 0:
+                    self._refresh_tile(driver, index, title)
+                tile["next_refresh"] = now + monitor.refresh_interval_seconds
+            try:
+                with in_tile(driver, index):
+                    health = monitor.check_and_repair(driver)
+            except DashboardStalled as e:
+                log_message(f"Mosaic tile '{title}' stalled: {e} Reloading the tile.")
+                increment("tile_reloads")
+                reload_tile(driver, index)
+                monitor.reset()
+                combined["stale"] = True
+                continue
+            tile["charts"] = health["charts"]
+            combined["charts"] += health["charts"]
+            combined["stuck"] += health["stuck"]
+            combined["errored"] += health["errored"]
+            combined["stale"] = combined["stale"] or health["stale"]
+            combined["tiles"][title] = health["seconds_since_refresh"]
+        return combined
@@ -0,0 +1,97 @@
+"""
+What the kiosk downloads per dashboard load, and what it never asks for.
+
+On a slow office link most of a reload used to be Superset's JS bundles,
+downloaded again on every start because Chromium began with a fresh
+profile. The browser now keeps a persistent profile with a bounded disk
+cache (KioskBrowser(profile_dir=..., cache_size_mb=...)), and each tab
+blocks the requests a kiosk never needs through the DevTools Network
+domain (Network.setBlockedURLs): Superset's event log, web fonts and
+avatar images by default.
+
+Bytes come from the page's Resource Timing entries (transferSize: what
+went over the network, 0 for a cache hit), counted since the last report
+in the same page, so every wait_for_dashboard logs what that load cost
+next to how long it took. Cross-origin resources without
+Timing-Allow-Origin report 0 bytes and are not counted as cache hits.
+"""
+from selenium.common.exceptions import WebDriverException
+
+from dashboard_log import log_message
+from dashboard_metrics import increment, observe, set_gauge
+
+# Network.setBlockedURLs patterns ("*" matches anything)
+DEFAULT_BLOCKED_URLS = [
+    "*/superset/log/*",          # Superset's UI event logging
+    "*://fonts.googleapis.com/*",
+    "*://fonts.gstatic.com/*",
+    "*.woff*",                   # .woff and .woff2, with or without a query
+    "*.ttf*",
+    "*gravatar.com/*",
+    "*/avatar*",
+]
+
+# Superset loads a few hundred resources; keep the browser from dropping entries
+RESOURCE_TIMING_JS = "performance.setResourceTimingBufferSize(2000);"
+
+# [bytes, requests, cache hits] since the last call in this page
+PAGE_TRANSFER_JS = """
+var entries = performance.getEntriesByType('resource');
+if (!window.__dashboardTransferCounted) {
+  entries = performance.getEntriesByType('navigation').concat(entries);
+  window.__dashboardTransferCounted = true;
+}
+performance.clearResourceTimings();
+var bytes = 0, cached = 0;
+for (var i = 0; i < entries.length; i++) {
+  bytes += entries[i].transferSize || 0;
+  if (!entries[i].transferSize && entries[i].decodedBodySize) { cached += 1; }
+}
+return [bytes, entries.length, cached];
+"""
+
+
+def install_request_blocking(driver, blocked_urls=DEFAULT_BLOCKED_URLS):
+    """
+    Block blocked_urls in the current tab (replacing its last list) and
+    keep its resource timings for page_transfer(); like the request
+    tracker, once per tab and DevTools session.
+    """
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": RESOURCE_TIMING_JS})
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(blocked_urls or [])})
+    except (AttributeError, WebDriverException) as e:
+        # Not a Chromium driver, or the tab went away
+        log_message(f"Could not install the request blocklist: {e}")
+
+
+def page_transfer(driver):
+    """{"bytes", "requests", "cached"} of the current page since the last call, or None."""
+    try:
+        transferred, requests, cached = driver.execute_script(PAGE_TRANSFER_JS)
+    except (TypeError, ValueError, WebDriverException):
+        return None
+    return {"bytes": int(transferred), "requests": int(requests), "cached": int(cached)}
+
+
+def record_page_load(driver, ready_seconds):
+    """Record a dashboard load: its time to ready and what it transferred (returned, or None)."""
+    observe("dashboard_ready", ready_seconds)
+    transfer = page_transfer(driver)
+    if transfer is not None:
+        increment("transfer_bytes", transfer["bytes"])
+        increment("transfer_requests", transfer["requests"])
+        increment("transfer_cache_hits", transfer["cached"])
+        set_gauge("last_load_transfer_bytes", transfer["bytes"])
+    return transfer
+
+
+def describe_transfer(transfer):
+    """For the "Dashboard ready" log line."""
+    if transfer is None:
+        return "transfer not measured"
+    return (
+        f"{transfer['bytes'] / 1e6:.2f} MB over the network, "
+        f"{transfer['requests']} requests, {transfer['cached']} from cache"
+    )
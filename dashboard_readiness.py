@@ -0,0 +1,241 @@
+"""
+Readiness waits for the Superset dashboard workflow.
+
+Instead of sleeping a fixed number of seconds after every step, each wait
+here polls a real signal in the page (login redirect, dashboard grid,
+chart spinners, chart-data requests in flight), gives up at a deadline
+with a TimeoutException and returns how long it actually took.
+"""
+import time
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+POLL_INTERVAL_SECONDS = 0.25
+NETWORK_QUIET_SECONDS = 1.0
+# A dashboard without charts (markdown only, an empty tab) is rendered once
+# it has been mounted without any for this long
+EMPTY_DASHBOARD_SETTLE_SECONDS = 2.0
+
+# Selectors for Superset 4.x; adjust here if the theme/markup changes.
+DASHBOARD_GRID_SELECTOR = "[data-test='grid-container'], .grid-container"
+CHART_CONTAINER_SELECTOR = "[data-test='chart-grid-component'], .dashboard-component-chart-holder"
+CHART_SPINNER_SELECTOR = ".loading, [data-test='loading-indicator'], [aria-label='Loading']"
+CHART_DATA_PATH = "/api/v1/chart/data"
+
+# Counts chart-data requests in flight (fetch and XHR) and keeps the most
+# recent completions, so we can wait for the network to go quiet.
+REQUEST_TRACKER_JS = """
+(function () {
+  if (window.__dashboardTracker) { return; }
+  var tracker = window.__dashboardTracker = {inFlight: 0, completed: []};
+  function matches(url) { return String(url).indexOf('%(path)s') !== -1; }
+  function done(url, ok) {
+    tracker.inFlight = Math.max(0, tracker.inFlight - 1);
+    tracker.completed.push({url: String(url), ok: ok, at: Date.now()});
+    if (tracker.completed.length > 500) { tracker.completed.shift(); }
+  }
+  if (window.fetch) {
+    var origFetch = window.fetch;
+    window.fetch = function (input, init) {
+      var url = (input && input.url) || input;
+      if (!matches(url)) { return origFetch.apply(this, arguments); }
+      tracker.inFlight += 1;
+      return origFetch.apply(this, arguments).then(
+        function (response) { done(url, response.ok); return response; },
+        function (error) { done(url, false); throw error; }
+      );
+    };
+  }
+  var origOpen = XMLHttpRequest.prototype.open;
+  var origSend = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.open = function (method, url) {
+    this.__dashboardUrl = url;
+    return origOpen.apply(this, arguments);
+  };
+  XMLHttpRequest.prototype.send = function () {
+    var xhr = this;
+    var url = xhr.__dashboardUrl;
+    if (matches(url)) {
+      tracker.inFlight += 1;
+      xhr.addEventListener('loadend', function () {
+        done(url, xhr.status >= 200 && xhr.status < 400);
+      });
+    }
+    return origSend.apply(this, arguments);
+  };
+})();
+""" % {"path": CHART_DATA_PATH}
+
+
+def install_request_tracker(driver):
+    """
+    Install the chart-data request tracker for every future page load
+    (through DevTools) and for the page that is already open.
+    """
+    try:
+        driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": REQUEST_TRACKER_JS}
+        )
+    except (AttributeError, WebDriverException):
+        # Not a Chromium driver; fall back to installing after each load.
+        pass
+    try:
+        driver.execute_script(REQUEST_TRACKER_JS)
+    except WebDriverException:
+        pass
+
+
+def _wait(driver, condition, timeout, message):
+    """Wait until condition(driver) is truthy and return the elapsed seconds."""
+    start = time.monotonic()
+    WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL_SECONDS).until(
+        condition, message
+    )
+    return time.monotonic() - start
+
+
+def _page_loaded(driver):
+    return driver.execute_script("return document.readyState") == "complete"
+
+
+def wait_for_login_form(driver, timeout=30):
+    """Wait until the Superset login form is ready for input."""
+    def form_ready(d):
+        return (
+            _page_loaded(d)
+            and d.find_elements(By.NAME, "username")
+            and d.find_elements(By.NAME, "password")
+        )
+
+    return _wait(driver, form_ready, timeout, "Login form did not appear")
+
+
+def wait_for_login_redirect(driver, login_url, timeout=30):
+    """Wait until Superset has redirected away from the login page."""
+    login_path = urlparse(login_url).path.rstrip("/")
+
+    def redirected(d):
+        return (
+            urlparse(d.current_url).path.rstrip("/") != login_path
+            and _page_loaded(d)
+        )
+
+    return _wait(driver, redirected, timeout, "Still on the login page after submitting")
+
+
+def wait_for_url_contains(driver, text, timeout=30):
+    """Wait until the current URL contains text and the page has loaded."""
+    return _wait(
+        driver,
+        lambda d: text in d.current_url and _page_loaded(d),
+        timeout,
+        f"URL never contained '{text}'",
+    )
+
+
+def wait_for_invisible(driver, css_selector, timeout=10):
+    """Wait until no visible element matches css_selector (e.g. a closing modal)."""
+    def gone(d):
+        return not any(e.is_displayed() for e in d.find_elements(By.CSS_SELECTOR, css_selector))
+
+    return _wait(driver, gone, timeout, f"'{css_selector}' is still visible")
+
+
+def is_dashboard_mounted(driver):
+    """True if the page has loaded and the dashboard grid is in the DOM."""
+    return bool(
+        _page_loaded(driver) and driver.find_elements(By.CSS_SELECTOR, DASHBOARD_GRID_SELECTOR)
+    )
+
+
+def wait_for_dashboard_grid(driver, timeout=60):
+    """Wait until Superset has mounted the dashboard grid."""
+    return _wait(driver, is_dashboard_mounted, timeout, "Dashboard grid was not mounted")
+
+
+def count_loading_charts(driver):
+    """Return (chart containers, containers still showing a spinner)."""
+    return driver.execute_script(
+        """
+        var charts = document.querySelectorAll(arguments[0]);
+        var loading = 0;
+        for (var i = 0; i < charts.length; i++) {
+          if (charts[i].querySelector(arguments[1])) { loading += 1; }
+        }
+        return [charts.length, loading];
+        """,
+        CHART_CONTAINER_SELECTOR,
+        CHART_SPINNER_SELECTOR,
+    )
+
+
+def wait_for_charts_rendered(driver, timeout=60, settle_seconds=EMPTY_DASHBOARD_SETTLE_SECONDS):
+    """
+    Wait until every chart container on the page has finished its spinner,
+    or the mounted dashboard has had no charts for settle_seconds.
+    """
+    empty_since = [None]
+
+    def rendered(d):
+        total, loading = count_loading_charts(d)
+        if total:
+            empty_since[0] = None
+            return loading == 0
+        if not is_dashboard_mounted(d):
+            empty_since[0] = None
+            return False
+        if empty_since[0] is None:
+            empty_since[0] = time.monotonic()
+        return time.monotonic() - empty_since[0] >= settle_seconds
+
+    return _wait(driver, rendered, timeout, "Charts are still loading")
+
+
+def chart_requests_in_flight(driver):
+    """Number of /api/v1/chart/data requests currently in flight."""
+    in_flight = driver.execute_script(
+        "return window.__dashboardTracker ? window.__dashboardTracker.inFlight : null"
+    )
+    if in_flight is None:
+        # Page was loaded before the tracker could be registered.
+        driver.execute_script(REQUEST_TRACKER_JS)
+        return 0
+    return in_flight
+
+
+def wait_for_network_idle(driver, timeout=60, quiet_seconds=NETWORK_QUIET_SECONDS):
+    """Wait until no chart-data requests have been in flight for quiet_seconds."""
+    quiet_since = [None]
+
+    def idle(d):
+        if chart_requests_in_flight(d) > 0:
+            quiet_since[0] = None
+            return False
+        if quiet_since[0] is None:
+            quiet_since[0] = time.monotonic()
+        return time.monotonic() - quiet_since[0] >= quiet_seconds
+
+    return _wait(driver, idle, timeout, "Chart data requests are still in flight")
+
+
+def wait_for_dashboard_ready(driver, timeout=90):
+    """
+    Wait for the grid, the charts and the chart-data requests in turn,
+    sharing a single deadline. Returns a dict of signal -> seconds taken.
+    """
+    deadline = time.monotonic() + timeout
+    timings = {}
+    for name, wait in (
+        ("grid", wait_for_dashboard_grid),
+        ("charts", wait_for_charts_rendered),
+        ("network", wait_for_network_idle),
+    ):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutException(f"Dashboard not ready after {timeout}s (waiting for {name})")
+        timings[name] = wait(driver, remaining)
+    timings["total"] = sum(timings.values())
+    return timings
@@ -0,0 +1,171 @@
+"""
+Tiered recovery for the kiosk loop.
+
+Instead of restarting Chromium on every exception, a failure climbs a
+ladder of increasingly expensive recoveries and stops at the first one
+that works:
+
+    retry_step -> reload -> renavigate -> reauth -> restart
+
+Each tier is a callable the variant supplies: it takes the driver, must
+leave the dashboard verified on screen (or raise) and returns the driver
+(a new one for "restart"). Attempts are spaced with exponential backoff
+and jitter. A tier that keeps failing trips its circuit breaker and is
+skipped for a cool-down, so a broken cheap tier does not delay the one
+that works. If a recovery did not hold, the next one starts a tier
+higher. The ladder never gives up: when every tier has failed it starts
+again from the bottom, with the backoff capped at max_delay_seconds.
+"""
+import random
+import time
+
+from dashboard_log import log_message
+from dashboard_metrics import increment, set_gauge, set_info, span
+
+TIERS = ("retry_step", "reload", "renavigate", "reauth", "restart")
+
+# Errors after which only a new browser helps, so the cheap tiers are skipped
+BROWSER_GONE_MARKERS = (
+    "invalid session id",
+    "chrome not reachable",
+    "disconnected: not connected to devtools",
+    "no such window",
+    "target window already closed",
+)
+
+
+def browser_gone(error):
+    """True if error says the browser (or its window) is no longer there."""
+    message = str(error).lower()
+    return any(marker in message for marker in BROWSER_GONE_MARKERS)
+
+
+class Workflow:
+    """Setup steps run in order; resume() picks up again at the step that failed."""
+
+    def __init__(self, steps, verify):
+        self.steps = list(steps)  # [(name, fn(driver)), ...]
+        self.verify = verify      # fn(driver), raises if the dashboard is not right
+        self.position = 0
+
+    def run(self, driver, start=0):
+        for i in range(start, len(self.steps)):
+            self.position = i
+            self.steps[i][1](driver)
+        # A failure from here on (monitoring included) retries the verification
+        self.position = len(self.steps)
+        self.verify(driver)
+        return driver
+
+    def resume(self, driver):
+        if self.position < len(self.steps):
+            log_message(f"Resuming setup at step '{self.steps[self.position][0]}'.")
+        return self.run(driver, self.position)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures, half-opens after `cooldown_seconds`."""
+
+    def __init__(self, threshold, cooldown_seconds):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self):
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at >= self.cooldown_seconds:
+            return False  # half-open: allow one trial
+        return True
+
+    def record(self, ok):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class RecoveryLadder:
+    """Runs the cheapest recovery tier that works; see the module docstring."""
+
+    def __init__(self, actions, base_delay_seconds=2, max_delay_seconds=300,
+                 breaker_threshold=3, breaker_cooldown_seconds=900, hold_seconds=300,
+                 sleep=time.sleep):
+        unknown = set(actions) - set(TIERS)
+        if unknown:
+            raise ValueError(f"Unknown recovery tiers: {', '.join(sorted(unknown))}")
+        self.tiers = [t for t in TIERS if t in actions]
+        self.actions = actions
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.hold_seconds = hold_seconds
+        self.sleep = sleep
+        self.breakers = {t: CircuitBreaker(breaker_threshold, breaker_cooldown_seconds) for t in self.tiers}
+        self.outcomes = {t: {"success": 0, "failure": 0} for t in self.tiers}
+        self._attempts = 0
+        self._last_success = None  # (tier index, monotonic time)
+
+    def backoff_seconds(self):
+        """Exponential backoff with jitter for the next attempt."""
+        if self._attempts == 0:
+            return 0
+        delay = min(self.max_delay_seconds, self.base_delay_seconds * 2 ** (self._attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _start_index(self, first_tier):
+        start = self.tiers.index(first_tier) if first_tier in self.tiers else 0
+        if self._last_success is not None:
+            index, at = self._last_success
+            if time.monotonic() - at < self.hold_seconds:
+                # The last recovery did not hold; do not repeat it
+                start = max(start, min(index + 1, len(self.tiers) - 1))
+            else:
+                self._attempts = 0
+        return start
+
+    def _candidates(self, start):
+        tiers = [t for t in self.tiers[start:] if not self.breakers[t].is_open]
+        # The most expensive tier is the last resort and is never skipped
+        if not tiers or tiers[-1] != self.tiers[-1]:
+            tiers.append(self.tiers[-1])
+        return tiers
+
+    def _record(self, tier, ok):
+        outcome = "success" if ok else "failure"
+        self.outcomes[tier][outcome] += 1
+        self.breakers[tier].record(ok)
+        increment("recovery_attempts", tier=tier, outcome=outcome)
+        set_gauge("recovery_breaker_open", int(self.breakers[tier].is_open), tier=tier)
+
+    def recover(self, driver, error, first_tier=None):
+        """Recover from error and return the (possibly new) driver. Never gives up."""
+        log_message(f"Error encountered: {error}. Recovering...")
+        if browser_gone(error):
+            first_tier = self.tiers[-1]
+        start = self._start_index(first_tier)
+        while True:
+            for tier in self._candidates(start):
+                delay = self.backoff_seconds()
+                if delay:
+                    log_message(f"Recovery: waiting {delay:.1f}s before '{tier}'.")
+                    self.sleep(delay)
+                self._attempts += 1
+                try:
+                    with span(f"recovery_{tier}"):
+                        driver = self.actions[tier](driver)
+                except Exception as e:
+                    self._record(tier, False)
+                    log_message(f"Recovery '{tier}' failed: {e}")
+                    continue
+                self._record(tier, True)
+                self._last_success = (self.tiers.index(tier), time.monotonic())
+                set_info(last_recovery=tier, last_recovery_at=time.time())
+                log_message(f"Recovered with '{tier}' after {self._attempts} attempt(s).")
+                return driver
+            log_message("Every recovery tier failed. Starting again from the bottom.")
+            start = 0
@@ -0,0 +1,242 @@
+"""
+Rotation schedule as a precomputed timeline.
+
+Each dashboard entry (a dict with at least "title" and "url") can carry:
+
+    weight         share of the rotation; dwell = weight x the default dwell
+                   (0: never in the rotation, only shown by its cron rules)
+    dwell_minutes  explicit time on screen per turn (overrides weight)
+    windows        time-of-day windows it rotates in, e.g. ["07:00-18:00"]
+                   (a window may wrap midnight, "22:00-06:00")
+    cron           cron rules ("minute hour day-of-month month day-of-week")
+                   that put it on screen for its dwell at matching times,
+                   interrupting the rotation, e.g. ["0 8 * * 1-5"]
+
+The timeline is built per day from midnight, so it only depends on the
+clock: every kiosk with the same schedule (and offset) shows the same
+dashboard. offset_seconds shifts the whole timeline later, so a fleet
+does not switch (and load) in the same second (dashboard_stagger.py). With
+no extra settings it is the classic fixed rotation (slot = minutes since
+midnight // dwell, dashboard = slot % count). When no dashboard's window
+is open, all of them rotate.
+"""
+from datetime import datetime, timedelta
+
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+def _parse_cron_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        expr, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if expr == "*":
+            start, end = low, high
+        elif "-" in expr:
+            start, end = (int(v) for v in expr.split("-", 1))
+        else:
+            start = int(expr)
+            end = high if step > 1 else start
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f"Cron field '{field}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(rule):
+    """Parse a five-field cron rule into sets of allowed values."""
+    fields = rule.split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron rule '{rule}' needs 5 fields")
+    minutes, hours, days, months, weekdays = (
+        _parse_cron_field(f, low, high) for f, (low, high) in zip(fields, _CRON_RANGES)
+    )
+    weekdays = {d % 7 for d in weekdays}  # 7 is Sunday too
+    return {
+        "minutes": minutes, "hours": hours, "days": days, "months": months, "weekdays": weekdays,
+        # Like cron: if both day fields are restricted, either may match
+        "days_restricted": fields[2] != "*", "weekdays_restricted": fields[4] != "*",
+    }
+
+
+def cron_matches(cron, when):
+    if when.minute not in cron["minutes"] or when.hour not in cron["hours"]:
+        return False
+    if when.month not in cron["months"]:
+        return False
+    day_ok = when.day in cron["days"]
+    weekday_ok = (when.isoweekday() % 7) in cron["weekdays"]
+    if cron["days_restricted"] and cron["weekdays_restricted"]:
+        return day_ok or weekday_ok
+    return day_ok and weekday_ok
+
+
+def parse_window(window):
+    """'07:00-18:00' -> (420, 1080) in minutes since midnight."""
+    try:
+        start, end = window.split("-")
+        to_minutes = [int(h) * 60 + int(m) for h, m in (t.strip().split(":") for t in (start, end))]
+    except ValueError:
+        raise ValueError(f"Window '{window}' must look like 'HH:MM-HH:MM'") from None
+    if not all(0 <= m <= 24 * 60 for m in to_minutes):
+        raise ValueError(f"Window '{window}' is out of range")
+    return tuple(to_minutes)
+
+
+def _in_window(windows, minute):
+    if not windows:
+        return True
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+
+def _window_end(windows, minute):
+    """Minutes since midnight at which the window containing minute closes (max 1440)."""
+    if not windows:
+        return 24 * 60
+    ends = []
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            ends.append(end)
+        elif start > end and minute >= start:
+            ends.append(24 * 60)
+        elif start > end and minute < end:
+            ends.append(end)
+    return max(ends) if ends else minute
+
+
+class Schedule:
+    """Dashboards plus their schedule settings; answers "what is on screen when"."""
+
+    def __init__(self, dashboards, default_dwell_minutes, offset_seconds=0):
+        if not dashboards:
+            raise ValueError("The schedule needs at least one dashboard")
+        self.default_dwell_minutes = default_dwell_minutes
+        self.offset = timedelta(seconds=offset_seconds)
+        self.entries = []
+        for dashboard in dashboards:
+            weight = dashboard.get("weight", 1)
+            dwell = dashboard.get("dwell_minutes") or weight * default_dwell_minutes
+            if dwell <= 0 or weight < 0:
+                raise ValueError(f"Dashboard '{dashboard['title']}' needs a positive dwell time")
+            self.entries.append({
+                "dashboard": dashboard,
+                "rotates": weight > 0,
+                "dwell": timedelta(minutes=dwell),
+                "windows": [parse_window(w) for w in dashboard.get("windows", [])],
+                "cron": [parse_cron(rule) for rule in dashboard.get("cron", [])],
+            })
+        self.rotation = [e for e in self.entries if e["rotates"]] or self.entries
+        self._days = {}
+
+    def _overrides(self, midnight):
+        """Cron-triggered slots for the day, sorted by start."""
+        overrides = []
+        if not any(e["cron"] for e in self.entries):
+            return overrides
+        for minute in range(24 * 60):
+            when = midnight + timedelta(minutes=minute)
+            for entry in self.entries:
+                if any(cron_matches(c, when) for c in entry["cron"]):
+                    overrides.append((when, entry))
+        return overrides
+
+    def _build_day(self, midnight):
+        day_end = midnight + timedelta(days=1)
+        overrides = self._overrides(midnight)
+        slots = []
+        t = midnight
+        turn = 0  # rotation position, restarts every midnight
+        while t < day_end:
+            # A cron override that is due (or running) takes the screen
+            active = [(s, e) for s, e in overrides if s <= t < s + e["dwell"]]
+            if active:
+                start, entry = active[-1]
+                later = [s for s, _ in overrides if t < s < start + entry["dwell"]]
+                end = min([start + entry["dwell"], day_end] + later)
+                t = self._append(slots, t, end, entry, "cron")
+                continue
+
+            minute = (t - midnight).seconds // 60
+            eligible = [e for e in self.rotation if _in_window(e["windows"], minute)] or self.rotation
+            entry = eligible[turn % len(eligible)]
+            turn += 1
+            end = min(t + entry["dwell"], day_end)
+            if entry["windows"] and _in_window(entry["windows"], minute):
+                end = min(end, midnight + timedelta(minutes=_window_end(entry["windows"], minute)))
+            upcoming = [s for s, _ in overrides if t < s < end]
+            if upcoming:
+                end = upcoming[0]
+            t = self._append(slots, t, end, entry, "rotation")
+        return slots
+
+    @staticmethod
+    def _append(slots, start, end, entry, reason):
+        """Add a slot, merging it into the previous one if nothing changes on screen."""
+        last = slots[-1] if slots else None
+        if last and last["dashboard"] is entry["dashboard"] and last["reason"] == reason:
+            last["end"] = end
+        else:
+            slots.append({"start": start, "end": end, "dashboard": entry["dashboard"], "reason": reason})
+        return end
+
+    def _day(self, midnight):
+        if midnight not in self._days:
+            # Only today and tomorrow are ever needed
+            if len(self._days) > 4:
+                self._days.clear()
+            self._days[midnight] = self._build_day(midnight)
+        return self._days[midnight]
+
+    def _shifted(self, slot):
+        """A slot of the unshifted day timeline, moved by the offset."""
+        if not self.offset:
+            return slot
+        return dict(slot, start=slot["start"] + self.offset, end=slot["end"] + self.offset)
+
+    def slot_at(self, now: datetime):
+        """The slot that contains now."""
+        now -= self.offset
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        for slot in self._day(midnight):
+            if slot["start"] <= now < slot["end"]:
+                return self._shifted(slot)
+        raise RuntimeError(f"No slot covers {now}")  # the day is always fully covered
+
+    def next_slot(self, now: datetime):
+        """The slot after the one containing now."""
+        return self.slot_at(self.slot_at(now)["end"])
+
+    def next_transition(self, now: datetime):
+        """When the slot containing now ends."""
+        return self.slot_at(now)["end"]
+
+    def timeline(self, start: datetime, hours=24):
+        """Slots from the one containing start until start + hours."""
+        start -= self.offset
+        end = start + timedelta(hours=hours)
+        midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        slots = []
+        while midnight < end:
+            slots.extend(
+                self._shifted(s) for s in self._day(midnight) if s["end"] > start and s["start"] < end
+            )
+            midnight += timedelta(days=1)
+        return slots
+
+
+def describe_timeline(slots):
+    """JSON-friendly version of a timeline (for the status file or printing)."""
+    return [
+        {
+            "start": s["start"].isoformat(timespec="seconds"),
+            "end": s["end"].isoformat(timespec="seconds"),
+            "title": s["dashboard"]["title"],
+            "reason": s["reason"],
+        }
+        for s in slots
+    ]
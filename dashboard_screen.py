@@ -0,0 +1,296 @@
+"""
+Frozen / blank screen detection from what is actually on screen.
+
+driver.title and the DOM can look fine while the TV shows a white page,
+a frame that stopped updating, or one big loading spinner. Each check
+takes a tiny PNG screenshot through DevTools (the viewport scaled down to
+SCREEN_WIDTH pixels wide, so Chromium does the downscaling) and looks at
+it with NumPy:
+
+- blank: next to no contrast (all white, all black, one flat colour);
+- spinner: the little detail there is sits in a small area of an
+  otherwise flat screen, e.g. the page-level loading spinner;
+- frozen: the perceptual hash (dHash) and the pixels have not changed for
+  frozen_seconds. A static dashboard legitimately looks the same after a
+  refresh, so this is confirmed by asking the page for an animation
+  frame, which a hung renderer does not deliver.
+
+A condition that persists raises ScreenStalled, which the recovery ladder
+handles like any stalled dashboard (starting at a reload). Decoding and
+analysis take a millisecond or two; Pillow decodes the PNG when it is
+installed, otherwise a small built-in decoder does.
+"""
+import base64
+import io
+import struct
+import time
+import zlib
+
+import numpy as np
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+try:
+    from PIL import Image
+except ImportError:  # optional: the built-in PNG decoder handles Chromium's screenshots
+    Image = None
+
+from dashboard_health import DashboardStalled
+from dashboard_log import log_message
+from dashboard_metrics import increment, observe, set_gauge
+
+# Width of the analysed screenshot; 64x36 for a 16:9 screen
+SCREEN_WIDTH = 64
+# Frame statistics (grey levels 0-255)
+BLANK_MAX_STD = 3.0          # below this the frame is one flat colour
+EDGE_MIN_STEP = 24           # neighbour difference that counts as an edge
+SPINNER_MAX_EDGES = 0.02     # a spinner frame has few edges...
+SPINNER_MAX_AREA = 0.10      # ...all inside a small part of the screen
+FROZEN_MAX_DIFF = 0.5        # mean grey-level change below which two frames are the same
+
+ANIMATION_FRAME_JS = """
+var done = arguments[arguments.length - 1];
+var start = performance.now();
+var timer = setTimeout(function () { done(-1); }, arguments[0]);
+requestAnimationFrame(function () { clearTimeout(timer); done(performance.now() - start); });
+"""
+
+_GREY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class ScreenStalled(DashboardStalled):
+    """The screen is blank, frozen or stuck on a spinner."""
+
+
+# ---- PNG decoding ----
+
+def _unfilter(raw, width, height, bpp):
+    """Undo the per-row PNG filters of 8-bit image data."""
+    stride = width * bpp
+    data = np.frombuffer(raw, dtype=np.uint8).reshape(height, stride + 1)
+    out = np.zeros((height, stride), dtype=np.uint8)
+    previous = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        kind, line = data[y, 0], data[y, 1:]
+        if kind == 0:  # None
+            row = line
+        elif kind == 1:  # Sub: a running sum per channel, wrapping at 256
+            row = np.cumsum(line.reshape(width, bpp), axis=0, dtype=np.uint8).reshape(stride)
+        elif kind == 2:  # Up
+            row = line + previous
+        else:  # Average and Paeth depend on the byte just decoded
+            row = bytearray(line.tobytes())
+            up = previous.tolist()
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                if kind == 3:
+                    row[i] = (row[i] + ((left + up[i]) >> 1)) & 0xFF
+                else:
+                    upper_left = up[i - bpp] if i >= bpp else 0
+                    p = left + up[i] - upper_left
+                    pa, pb, pc = abs(p - left), abs(p - up[i]), abs(p - upper_left)
+                    if pa <= pb and pa <= pc:
+                        predictor = left
+                    elif pb <= pc:
+                        predictor = up[i]
+                    else:
+                        predictor = upper_left
+                    row[i] = (row[i] + predictor) & 0xFF
+            row = np.frombuffer(bytes(row), dtype=np.uint8)
+        out[y] = row
+        previous = out[y]
+    return out
+
+
+def decode_png(data):
+    """An 8-bit, non-interlaced PNG (what Chromium produces) as an HxWxC uint8 array."""
+    if Image is not None:
+        return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+    if data[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError("Not a PNG image")
+    offset, idat, header = 8, [], None
+    while offset < len(data):
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        chunk = data[offset + 8:offset + 8 + length]
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif kind == b"IDAT":
+            idat.append(chunk)
+        elif kind == b"IEND":
+            break
+        offset += length + 12
+    if header is None:
+        raise ValueError("PNG without IHDR")
+    width, height, depth, colour, _, _, interlace = header
+    channels = {0: 1, 2: 3, 4: 2, 6: 4}.get(colour)
+    if depth != 8 or channels is None or interlace:
+        raise ValueError(f"Unsupported PNG (depth {depth}, colour type {colour}, interlace {interlace})")
+    pixels = _unfilter(zlib.decompress(b"".join(idat)), width, height, channels)
+    return pixels.reshape(height, width, channels)
+
+
+# ---- analysis ----
+
+def to_grey(pixels):
+    """Grey levels (float32) of an HxWxC image."""
+    if pixels.ndim == 2 or pixels.shape[2] < 3:
+        return pixels.reshape(pixels.shape[0], pixels.shape[1], -1)[..., 0].astype(np.float32)
+    return pixels[..., :3].astype(np.float32) @ _GREY_WEIGHTS
+
+
+def _block_means(grey, rows, columns):
+    """Shrink grey to rows x columns by averaging the pixels of each block."""
+    height, width = grey.shape
+    row_edges = np.linspace(0, height, rows + 1).astype(int)[:-1]
+    column_edges = np.linspace(0, width, columns + 1).astype(int)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(grey, row_edges, axis=0), column_edges, axis=1)
+    counts = np.outer(np.diff(np.append(row_edges, height)), np.diff(np.append(column_edges, width)))
+    return sums / counts
+
+
+def dhash(grey):
+    """64-bit difference hash: is each of 8x8 blocks brighter than its right-hand neighbour."""
+    blocks = _block_means(grey, 8, 9)
+    bits = (blocks[:, 1:] > blocks[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def frame_stats(grey):
+    """Contrast, edge density and the share of the screen the edges span."""
+    step_x = np.abs(np.diff(grey, axis=1)) > EDGE_MIN_STEP
+    step_y = np.abs(np.diff(grey, axis=0)) > EDGE_MIN_STEP
+    edges = np.zeros(grey.shape, dtype=bool)
+    edges[:, 1:] |= step_x
+    edges[1:, :] |= step_y
+    count = int(edges.sum())
+    if count:
+        ys, xs = np.nonzero(edges)
+        area = (ys.max() - ys.min() + 1) * (xs.max() - xs.min() + 1) / edges.size
+    else:
+        area = 0.0
+    return {"std": float(grey.std()), "mean": float(grey.mean()), "edges": count / edges.size, "area": float(area)}
+
+
+def classify(stats):
+    """What one frame's statistics say: "blank", "spinner" or None (looks like a dashboard)."""
+    if stats["std"] < BLANK_MAX_STD:
+        return "blank"
+    if stats["edges"] < SPINNER_MAX_EDGES and stats["area"] < SPINNER_MAX_AREA:
+        return "spinner"
+    return None
+
+
+# ---- the monitor ----
+
+def capture_frame(driver, width=SCREEN_WIDTH):
+    """A width-pixel-wide PNG of the visible viewport, scaled down by Chromium."""
+    metrics = driver.execute_cdp_cmd("Page.getLayoutMetrics", {})
+    viewport = metrics.get("cssVisualViewport") or metrics["visualViewport"]
+    scale = width / max(1, viewport["clientWidth"])
+    shot = driver.execute_cdp_cmd(
+        "Page.captureScreenshot",
+        {
+            "format": "png",
+            "fromSurface": True,
+            "captureBeyondViewport": False,
+            "clip": {
+                "x": viewport.get("pageX", 0),
+                "y": viewport.get("pageY", 0),
+                "width": viewport["clientWidth"],
+                "height": viewport["clientHeight"],
+                "scale": scale,
+            },
+        },
+    )
+    return base64.b64decode(shot["data"])
+
+
+def animation_frame_ms(driver, timeout_ms=2000):
+    """How long the page took to deliver an animation frame; None if it did not."""
+    try:
+        elapsed = driver.execute_async_script(ANIMATION_FRAME_JS, timeout_ms)
+    except TimeoutException:
+        return None
+    return None if elapsed is None or elapsed < 0 else elapsed
+
+
+class ScreenMonitor:
+    """Looks at the screen of the visible dashboard between checks."""
+
+    def __init__(self, frozen_seconds, blank_checks=2, spinner_checks=3, width=SCREEN_WIDTH):
+        self.frozen_seconds = frozen_seconds
+        self.blank_checks = blank_checks
+        self.spinner_checks = spinner_checks
+        self.width = width
+        self.reset()
+
+    def reset(self):
+        """Forget earlier frames, e.g. after another dashboard came on screen."""
+        self._previous = None
+        self._previous_hash = None
+        self._unchanged_since = time.monotonic()
+        self._streak = (None, 0)
+
+    def check(self, driver):
+        """Look at the screen once and describe it."""
+        png = capture_frame(driver, self.width)
+        start = time.monotonic()
+        grey = to_grey(decode_png(png))
+        stats = frame_stats(grey)
+        frame_hash = dhash(grey)
+        kind = classify(stats)
+        now = time.monotonic()
+
+        if self._previous is not None and self._previous.shape == grey.shape:
+            unchanged = (hamming(frame_hash, self._previous_hash) <= 1
+                         and float(np.abs(grey - self._previous).mean()) < FROZEN_MAX_DIFF)
+        else:
+            unchanged = False
+        if not unchanged:
+            self._unchanged_since = now
+        self._previous, self._previous_hash = grey, frame_hash
+
+        streak_kind, streak = self._streak
+        self._streak = (kind, streak + 1 if kind == streak_kind else 1)
+        observe("screen_analysis", now - start)
+        set_gauge("screen_unchanged_seconds", round(now - self._unchanged_since, 1))
+        return dict(
+            stats,
+            kind=kind,
+            streak=self._streak[1],
+            hash=f"{frame_hash:016x}",
+            unchanged_seconds=now - self._unchanged_since,
+        )
+
+    def check_and_raise(self, driver):
+        """
+        Check the screen; raises ScreenStalled when it has been blank,
+        stuck on a spinner or frozen for too long.
+        """
+        try:
+            screen = self.check(driver)
+        except (WebDriverException, KeyError, ValueError, zlib.error) as e:
+            # A failed screenshot says nothing about the dashboard; the other checks go on
+            log_message(f"WARNING: Screen check skipped: {e}")
+            return None
+
+        kind, streak = screen["kind"], screen["streak"]
+        if kind == "blank" and streak >= self.blank_checks:
+            increment("screen_problems", kind="blank")
+            raise ScreenStalled(f"Screen blank for {streak} checks (std {screen['std']:.1f}). Reloading...")
+        if kind == "spinner" and streak >= self.spinner_checks:
+            increment("screen_problems", kind="spinner")
+            raise ScreenStalled(f"Screen shows only a loading spinner for {streak} checks. Reloading...")
+        if screen["unchanged_seconds"] >= self.frozen_seconds:
+            if animation_frame_ms(driver) is None:
+                increment("screen_problems", kind="frozen")
+                raise ScreenStalled(
+                    f"Screen frozen for {screen['unchanged_seconds']:.0f}s and the page renders no frames. "
+                    "Reloading..."
+                )
+            # Same picture, but the page is alive: a dashboard whose data did not change
+            self._unchanged_since = time.monotonic()
+        return screen
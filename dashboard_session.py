@@ -0,0 +1,131 @@
+"""
+Persistent Superset session cache.
+
+After a successful login the browser's Superset cookies are saved to a
+file only the current user can read. A new browser gets those cookies
+injected before it opens any page, so a restart can skip the login form
+entirely. /api/v1/me/ is used as a cheap check that Superset still
+accepts the cached session.
+"""
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+
+from selenium.common.exceptions import WebDriverException
+
+SESSION_CHECK_TIMEOUT_SECONDS = 5
+
+
+def superset_base_url(login_url):
+    """https://host/prefix/login/ -> https://host/prefix"""
+    parsed = urlparse(login_url)
+    prefix = parsed.path.split("/login")[0].rstrip("/")
+    return f"{parsed.scheme}://{parsed.netloc}{prefix}"
+
+
+def save_session(driver, path):
+    """Write the browser's current cookies to path with 0600 permissions."""
+    cookies = driver.get_cookies()
+    data = {"saved_at": time.time(), "cookies": cookies}
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    return len(cookies)
+
+
+def load_session(path):
+    """Return the cached cookies, or an empty list if there are none."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("cookies", [])
+    except (OSError, ValueError):
+        return []
+
+
+def clear_session(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def cookie_header(cookies):
+    return "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+
+
+def session_is_valid(base_url, cookies, timeout=SESSION_CHECK_TIMEOUT_SECONDS):
+    """Ask Superset whether the cached cookies still belong to a logged-in user."""
+    if not cookies:
+        return False
+    try:
+        superset_api_get(base_url, "/api/v1/me/", cookies, timeout)
+        return True
+    except (urllib.error.URLError, OSError, ValueError):
+        # 401 (HTTPError is a URLError), unreachable host, timeout...
+        return False
+
+
+def superset_api_get(base_url, path, cookies, timeout=SESSION_CHECK_TIMEOUT_SECONDS):
+    """GET a Superset REST endpoint with the session cookies and return the JSON."""
+    request = urllib.request.Request(
+        f"{base_url}{path}",
+        headers={"Cookie": cookie_header(cookies), "Accept": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode())
+
+
+def browser_cookies(driver, base_url):
+    """The browser's cookies for the Superset host, whatever page is open."""
+    try:
+        return driver.execute_cdp_cmd("Network.getCookies", {"urls": [base_url]})["cookies"]
+    except (AttributeError, WebDriverException, KeyError):
+        return driver.get_cookies()
+
+
+def _cdp_cookie(cookie):
+    """Convert a Selenium cookie dict to DevTools Network.setCookie params."""
+    params = {
+        "name": cookie["name"],
+        "value": cookie["value"],
+        "domain": cookie.get("domain"),
+        "path": cookie.get("path", "/"),
+        "secure": cookie.get("secure", False),
+        "httpOnly": cookie.get("httpOnly", False),
+    }
+    if cookie.get("sameSite"):
+        params["sameSite"] = cookie["sameSite"]
+    if cookie.get("expiry"):
+        params["expires"] = cookie["expiry"]
+    return params
+
+
+def inject_session(driver, cookies, base_url):
+    """
+    Put the cached cookies into the browser. DevTools lets us do this before
+    any Superset page is open; otherwise fall back to Selenium's add_cookie,
+    which needs a page on the Superset host first.
+    """
+    try:
+        for cookie in cookies:
+            driver.execute_cdp_cmd("Network.setCookie", _cdp_cookie(cookie))
+        return
+    except (AttributeError, WebDriverException):
+        pass
+
+    driver.get(f"{base_url}/login/")
+    for cookie in cookies:
+        driver.add_cookie(cookie)
+
+
+def clear_browser_session(driver):
+    """Drop every cookie in the browser so the next page load starts logged out."""
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except (AttributeError, WebDriverException):
+        driver.delete_all_cookies()
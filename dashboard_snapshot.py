@@ -0,0 +1,147 @@
+"""
+Last-known-good snapshots for network outages.
+
+While a dashboard is healthy, a compressed JPEG of it is captured now and
+then through DevTools (Page.captureScreenshot: JPEG, no re-layout beyond
+the viewport, at most once per interval per dashboard, and only right
+after a passing health check, when the page is idle). When Superset
+cannot be reached, the kiosk shows the latest snapshot of the dashboard
+for the current slot full screen, from a local file with a "data as of"
+overlay, instead of Chromium's error page, and goes back to the live
+dashboards as soon as Superset answers again.
+"""
+import base64
+import hashlib
+import html
+import json
+import os
+import time
+from datetime import datetime
+
+from selenium.common.exceptions import WebDriverException
+
+from dashboard_log import log_message
+from dashboard_metrics import increment
+
+OFFLINE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s (offline)</title>
+<style>
+  html, body { margin: 0; height: 100%%; background: #000; overflow: hidden; }
+  img { width: 100%%; height: 100%%; object-fit: contain; }
+  .note { position: fixed; right: 24px; bottom: 24px; padding: 12px 20px; border-radius: 6px;
+          background: rgba(20, 20, 20, 0.8); color: #fff; font: 22px/1.4 sans-serif; }
+  .note strong { color: #ffb020; }
+  .empty { color: #ccc; font: 32px sans-serif; text-align: center; padding-top: 40vh; }
+</style></head>
+<body>
+%(body)s
+</body></html>
+"""
+
+
+class SnapshotStore:
+    """Snapshots on disk, one JPEG plus a small JSON file per dashboard."""
+
+    def __init__(self, directory, interval_seconds=600, quality=60, clock=time.time):
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        self.quality = quality
+        self.clock = clock
+        # Snapshots show dashboard data: keep them private like the session cache
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _path(self, dashboard, extension):
+        key = hashlib.sha1(dashboard["url"].encode()).hexdigest()[:12]
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def metadata(self, dashboard):
+        """{"title", "url", "captured_at"} of the dashboard's snapshot, or None."""
+        try:
+            with open(self._path(dashboard, "json"), "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(self._path(dashboard, "jpg")) else None
+
+    def due(self, dashboard):
+        meta = self.metadata(dashboard)
+        return meta is None or self.clock() - meta["captured_at"] >= self.interval_seconds
+
+    def _screenshot(self, driver):
+        params = {"format": "jpeg", "quality": self.quality, "captureBeyondViewport": False}
+        try:
+            # optimizeForSpeed trades a little size for a much faster encode (Chrome 117+)
+            return driver.execute_cdp_cmd("Page.captureScreenshot", dict(params, optimizeForSpeed=True))
+        except WebDriverException:
+            return driver.execute_cdp_cmd("Page.captureScreenshot", params)
+
+    def capture(self, driver, dashboard):
+        """Save a snapshot of the dashboard on screen. False if it could not be taken."""
+        start = time.monotonic()
+        try:
+            data = base64.b64decode(self._screenshot(driver)["data"])
+        except (WebDriverException, KeyError, ValueError) as e:
+            log_message(f"Could not capture a snapshot of '{dashboard['title']}': {e}")
+            return False
+        meta = {"title": dashboard["title"], "url": dashboard["url"], "captured_at": self.clock()}
+        try:
+            _write_private(self._path(dashboard, "jpg"), data)
+            _write_private(self._path(dashboard, "json"), json.dumps(meta).encode())
+        except OSError as e:
+            # A full or read-only SD card must not take the dashboard down
+            log_message(f"WARNING: Could not save the snapshot of '{dashboard['title']}': {e}")
+            return False
+        increment("snapshots")
+        log_message(
+            f"Captured snapshot of '{dashboard['title']}' ({len(data) // 1024} KB in "
+            f"{(time.monotonic() - start) * 1000:.0f} ms)."
+        )
+        return True
+
+    def latest(self, dashboards):
+        """(dashboard, metadata) of the most recent snapshot among dashboards, or None."""
+        found = [(d, self.metadata(d)) for d in dashboards]
+        found = [(d, m) for d, m in found if m is not None]
+        return max(found, key=lambda f: f[1]["captured_at"]) if found else None
+
+    def offline_page(self, dashboard, dashboards):
+        """
+        Write the offline page for dashboard (or, without a snapshot of it,
+        the most recent snapshot of any dashboard) and return its file:// URL.
+        """
+        meta = self.metadata(dashboard)
+        if meta is None:
+            latest = self.latest(dashboards)
+            if latest is not None:
+                dashboard, meta = latest
+        if meta is None:
+            body = '<div class="empty">Superset is unreachable. Waiting for the network...</div>'
+            title = "Superset"
+        else:
+            as_of = datetime.fromtimestamp(meta["captured_at"]).strftime("%H:%M, %d %b %Y")
+            image = os.path.basename(self._path(dashboard, "jpg"))
+            body = (
+                f'<img src="{image}?v={int(meta["captured_at"])}" alt="">\n'
+                f'<div class="note"><strong>Offline</strong> &middot; {html.escape(meta["title"])}'
+                f"<br>Data as of {as_of}</div>"
+            )
+            title = meta["title"]
+        path = os.path.join(self.directory, "offline.html")
+        page = OFFLINE_PAGE % {"title": html.escape(title), "body": body}
+        _write_private(path, page.encode())
+        return f"file://{os.path.abspath(path)}"
+
+
+def _write_private(path, data):
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,113 @@
+"""
+Fleet-wide staggering of dashboard refreshes and rotation boundaries.
+
+Every kiosk used to set the same 5-minute auto-refresh when its dashboard
+loaded, and variant 3 switched dashboards on the same wall-clock
+boundaries, so after a power cut (and at every slot boundary) the whole
+fleet hit Superset's chart-data endpoint in the same second. Now each
+kiosk takes a phase from its device ID (a hash: stable across restarts,
+no coordination needed):
+
+- rotation: the timeline is shifted by up to rotation_spread_seconds
+  (Schedule(offset_seconds=...)); kiosks that must switch together share
+  a device ID;
+- refresh: instead of Superset's auto-refresh timer, the controller
+  refreshes the visible dashboard on a grid of the refresh interval
+  shifted by the kiosk's phase, plus a few seconds of random jitter per
+  refresh so kiosks whose phases happen to be close drift apart.
+
+benchmarks/load_simulator.py shows the peak request rate of a simulated
+fleet with and without staggering.
+"""
+import hashlib
+import math
+import os
+import random
+import socket
+import time
+
+from dashboard_log import log_message
+
+DEVICE_ID_ENV = "DASHBOARD_DEVICE_ID"
+MACHINE_ID_FILE = "/etc/machine-id"
+
+
+def device_id(configured=None):
+    """
+    The kiosk's identity: the configured ID, $DASHBOARD_DEVICE_ID, or the
+    machine ID plus the host name (cloned SD cards can share either one).
+    """
+    if configured:
+        return configured
+    if os.environ.get(DEVICE_ID_ENV):
+        return os.environ[DEVICE_ID_ENV]
+    try:
+        with open(MACHINE_ID_FILE, "r") as f:
+            machine_id = f.read().strip()
+    except OSError:
+        machine_id = ""
+    return f"{machine_id}:{socket.gethostname()}"
+
+
+def phase(device, purpose):
+    """A stable fraction in [0, 1) for a device and what it staggers ("refresh", "rotation")."""
+    digest = hashlib.sha256(f"{device}/{purpose}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def rotation_offset_seconds(device, spread_seconds):
+    """How far this kiosk's rotation boundaries are shifted (0 to spread_seconds)."""
+    return round(phase(device, "rotation") * spread_seconds, 1)
+
+
+class RefreshScheduler:
+    """
+    When the controller refreshes the visible dashboard: every
+    interval_seconds on a wall-clock grid shifted by phase_fraction of the
+    interval, each refresh moved by up to jitter_seconds either way.
+    """
+
+    def __init__(self, interval_seconds, phase_fraction, jitter_seconds=0, clock=time.time):
+        self.interval_seconds = interval_seconds
+        self.phase_fraction = phase_fraction
+        # Jitter near half the interval would let refreshes bunch up again
+        self.jitter_seconds = min(jitter_seconds, interval_seconds / 4)
+        self.clock = clock
+        self.due_at = self._next_after(clock())
+
+    @property
+    def offset_seconds(self):
+        return self.phase_fraction * self.interval_seconds
+
+    def _next_after(self, now):
+        """The next grid point that, even jittered early, lies after now."""
+        turn = math.floor((now + self.jitter_seconds - self.offset_seconds) / self.interval_seconds) + 1
+        at = turn * self.interval_seconds + self.offset_seconds
+        return at + random.uniform(-self.jitter_seconds, self.jitter_seconds)
+
+    def due(self):
+        return self.clock() >= self.due_at
+
+    def seconds_until_due(self):
+        return max(0.0, self.due_at - self.clock())
+
+    def mark_refreshed(self):
+        """Refreshed (or skipped): schedule the next one."""
+        self.due_at = self._next_after(self.clock())
+
+    def describe(self):
+        return (
+            f"every {self.interval_seconds / 60:g} min at +{self.offset_seconds:.0f}s "
+            f"(jitter ±{self.jitter_seconds:g}s)"
+        )
+
+
+def log_stagger(device, rotation_offset=None, refresher=None):
+    """Say once at start-up how this kiosk is staggered."""
+    parts = []
+    if rotation_offset is not None:
+        parts.append(f"rotation boundaries +{rotation_offset:g}s")
+    if refresher is not None:
+        parts.append(f"refresh {refresher.describe()}")
+    if parts:
+        log_message(f"Staggering as device '{device}': " + ", ".join(parts) + ".")
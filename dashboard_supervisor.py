@@ -0,0 +1,244 @@
+"""
+Supervisor for the dashboard controller (open_dashboard.py).
+
+Replaces the loop in open_dashboard.sh that checked `pgrep -f
+open_dashboard.py` once a minute: a crashed controller stayed down for up
+to 90 seconds, and pgrep also matched stray processes (an editor, a
+grep). The supervisor owns the controller as its child and waits on it
+through a pidfd, so a controller that exits is started again within a
+second. A crash loop (more than RESTART_BURST starts within
+RESTART_WINDOW_SECONDS) backs off exponentially up to
+MAX_RESTART_DELAY_SECONDS instead of spinning.
+
+Run as a systemd service (open_dashboard.service, Type=notify) it reports
+READY=1 once the controller runs, pets the service watchdog with
+WATCHDOG=1 and keeps STATUS= current. The controller dies with the
+supervisor (PR_SET_PDEATHSIG), so a restarted service never runs two; the
+browser, a separate process, outlives both (see dashboard_browser.py).
+
+    python dashboard_supervisor.py [controller.py] [controller args...]
+"""
+import ctypes
+import fcntl
+import os
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+CONTROLLER = os.path.join(script_dir, "open_dashboard.py")
+# Only one supervisor per installation (flock, released when the process dies)
+LOCK_FILE = os.path.join(script_dir, "dashboard_supervisor.lock")
+# More starts than RESTART_BURST within RESTART_WINDOW_SECONDS is a crash
+# loop: wait MIN_RESTART_DELAY_SECONDS before the next start, doubling up
+# to MAX_RESTART_DELAY_SECONDS while it goes on
+RESTART_BURST = 5
+RESTART_WINDOW_SECONDS = 60
+MIN_RESTART_DELAY_SECONDS = 2
+MAX_RESTART_DELAY_SECONDS = 300
+# How long the controller gets to exit after SIGTERM before it is killed
+STOP_TIMEOUT_SECONDS = 15
+# Poll interval when the kernel has no pidfd_open (before Linux 5.3)
+POLL_INTERVAL_SECONDS = 0.2
+
+PR_SET_PDEATHSIG = 1
+# Environment that belongs to the supervisor's service, not to the controller
+SERVICE_ENVIRONMENT = ("NOTIFY_SOCKET", "WATCHDOG_USEC", "WATCHDOG_PID")
+
+
+def log(message):
+    """Same line format as log_message(); stderr goes to the journal or bashscript_log.txt."""
+    print(f"{datetime.now()}: {message}", file=sys.stderr, flush=True)
+
+
+def sd_notify(state):
+    """Send state (e.g. "READY=1") to systemd. Does nothing outside a notify service."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address.startswith("@"):
+        address = "\0" + address[1:]  # abstract namespace
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+    except OSError as e:
+        log(f"WARNING: sd_notify failed: {e}")
+        return False
+    return True
+
+
+def watchdog_interval():
+    """How often to send WATCHDOG=1 (half of WatchdogSec), or None without a watchdog."""
+    usec = os.environ.get("WATCHDOG_USEC")
+    pid = os.environ.get("WATCHDOG_PID")
+    if not usec or (pid and int(pid) != os.getpid()):
+        return None
+    return int(usec) / 1_000_000 / 2
+
+
+def _die_with_parent():
+    """In the controller, before exec: get SIGTERM when the supervisor dies."""
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+
+
+class Supervisor:
+    """Keeps one controller process running; see the module docstring."""
+
+    def __init__(self, command, restart_burst=RESTART_BURST, restart_window_seconds=RESTART_WINDOW_SECONDS):
+        self.command = command
+        self.restart_burst = restart_burst
+        self.restart_window_seconds = restart_window_seconds
+        self.restarts = 0
+        self.process = None
+        self._starts = deque()
+        self._delay = MIN_RESTART_DELAY_SECONDS
+        self._stopping = False
+        self._kill_at = None  # when a controller that ignores SIGTERM gets SIGKILL
+        self._watchdog = watchdog_interval()
+        self._last_pet = 0.0
+        # stop() writes here to wake wait()'s select (PEP 475 would just resume it)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._environment = {k: v for k, v in os.environ.items() if k not in SERVICE_ENVIRONMENT}
+
+    def stop(self, signum=None, frame=None):
+        """Signal handler: stop the controller, then the supervisor."""
+        self._stopping = True
+        self._kill_at = time.monotonic() + STOP_TIMEOUT_SECONDS
+        sd_notify("STOPPING=1")
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # already woken
+
+    def pet(self):
+        if self._watchdog is not None and time.monotonic() - self._last_pet >= self._watchdog:
+            sd_notify("WATCHDOG=1")
+            self._last_pet = time.monotonic()
+
+    def sleep(self, seconds):
+        """Sleep, petting the watchdog, until seconds pass or we are stopping."""
+        deadline = time.monotonic() + seconds
+        while not self._stopping and time.monotonic() < deadline:
+            self.pet()
+            time.sleep(min(POLL_INTERVAL_SECONDS, max(0, deadline - time.monotonic())))
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command, cwd=script_dir, env=self._environment, preexec_fn=_die_with_parent
+        )
+        self._starts.append(time.monotonic())
+        log(f"Started controller (pid {self.process.pid}): {' '.join(self.command[1:])}")
+        sd_notify(f"READY=1\nSTATUS=Controller running (pid {self.process.pid}), "
+                  f"{self.restarts} restarts")
+
+    def wait(self):
+        """Wait for the controller to exit, petting the watchdog. Returns its exit code."""
+        try:
+            pidfd = os.pidfd_open(self.process.pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        try:
+            while True:
+                self.pet()
+                if self._kill_at is not None and time.monotonic() >= self._kill_at:
+                    log(f"Controller did not exit within {STOP_TIMEOUT_SECONDS}s. Killing it.")
+                    self.process.kill()
+                    self._kill_at = None
+                if pidfd is None:
+                    try:
+                        return self.process.wait(timeout=POLL_INTERVAL_SECONDS)
+                    except subprocess.TimeoutExpired:
+                        continue
+                timeout = self._watchdog
+                if self._kill_at is not None:
+                    timeout = max(0, min(timeout or STOP_TIMEOUT_SECONDS, self._kill_at - time.monotonic()))
+                ready, _, _ = select.select([pidfd, self._wake_r], [], [], timeout)
+                if self._wake_r in ready:
+                    try:
+                        os.read(self._wake_r, 64)
+                    except BlockingIOError:
+                        pass
+                if pidfd in ready:
+                    return self.process.wait()
+        finally:
+            if pidfd is not None:
+                os.close(pidfd)
+
+    def restart_delay(self, ran_seconds):
+        """0 normally; a growing delay while the controller is crash looping."""
+        if ran_seconds >= self.restart_window_seconds:
+            self._delay = MIN_RESTART_DELAY_SECONDS  # it ran for a while: no (more) crash loop
+        now = time.monotonic()
+        while self._starts and now - self._starts[0] > self.restart_window_seconds:
+            self._starts.popleft()
+        if len(self._starts) < self.restart_burst and self._delay == MIN_RESTART_DELAY_SECONDS:
+            return 0
+        delay, self._delay = self._delay, min(MAX_RESTART_DELAY_SECONDS, self._delay * 2)
+        return delay
+
+    def run(self):
+        """Run the controller until SIGTERM/SIGINT, starting it again whenever it exits."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.start()
+        while True:
+            started = self._starts[-1]
+            code = self.wait()
+            if self._stopping:
+                log(f"Controller stopped (exit code {code}). Supervisor exiting.")
+                return
+            self.restarts += 1
+            ran_seconds = time.monotonic() - started
+            log(f"Controller exited with code {code} after {ran_seconds:.0f}s. Restarting.")
+            delay = self.restart_delay(ran_seconds)
+            if delay:
+                log(f"Controller is crash looping. Waiting {delay}s before the next start.")
+                sd_notify(f"STATUS=Crash loop, next start in {delay}s ({self.restarts} restarts)")
+                self.sleep(delay)
+                if self._stopping:
+                    return
+            self.start()
+
+    def shutdown(self):
+        """Make sure the controller is gone (after run() returned or failed)."""
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=STOP_TIMEOUT_SECONDS)
+        except subprocess.TimeoutExpired:
+            log(f"Controller did not exit within {STOP_TIMEOUT_SECONDS}s. Killing it.")
+            self.process.kill()
+            self.process.wait()
+
+
+def main(argv):
+    command = [sys.executable, *(argv or [CONTROLLER])]
+    lock = open(LOCK_FILE, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        log(f"Another supervisor holds {LOCK_FILE}. Exiting.")
+        return 1
+    supervisor = Supervisor(command)
+    try:
+        supervisor.run()
+    finally:
+        supervisor.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
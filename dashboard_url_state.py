@@ -0,0 +1,134 @@
+"""
+URL-state fast path for dashboard setup.
+
+Superset restores a dashboard's state from its URL: `standalone` hides the
+navigation (what "Enter fullscreen" does), `expand_filters=0` starts with
+the filter bar collapsed and `native_filters` carries the native filter
+values as rison. Building those into the URL turns fullscreen, filtering
+and collapsing into a single navigation. verify_dashboard_state() checks
+that Superset actually applied it, so callers can fall back to the
+click-through workflow when it did not.
+
+Superset has no URL parameter for the auto-refresh interval; that still
+goes through the "Set auto-refresh interval" modal (or the dashboard's
+saved refresh frequency).
+"""
+import json
+import re
+import urllib.error
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from dashboard_readiness import is_dashboard_mounted
+from dashboard_session import superset_api_get
+
+STANDALONE_HIDE_NAV = 1
+
+_RISON_ID = re.compile(r"^[^-0-9 '!:(),*@$][^ '!:(),*@$]*$")
+
+
+def rison(value):
+    """Encode a Python value as rison (the format Superset uses in URLs)."""
+    if value is None:
+        return "!n"
+    if value is True:
+        return "!t"
+    if value is False:
+        return "!f"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        if _RISON_ID.match(value):
+            return value
+        return "'" + value.replace("!", "!!").replace("'", "!'") + "'"
+    if isinstance(value, (list, tuple)):
+        return "!(" + ",".join(rison(v) for v in value) + ")"
+    if isinstance(value, dict):
+        return "(" + ",".join(f"{rison(str(k))}:{rison(v)}" for k, v in value.items()) + ")"
+    raise TypeError(f"Cannot rison-encode {type(value).__name__}")
+
+
+def native_filter_state(filter_id, column, values):
+    """Native filter state for one "value" (select) filter."""
+    return {
+        filter_id: {
+            "id": filter_id,
+            "extraFormData": {"filters": [{"col": column, "op": "IN", "val": list(values)}]},
+            "filterState": {"value": list(values)},
+            "ownState": {},
+        }
+    }
+
+
+def build_dashboard_url(url, standalone=True, expand_filters=False, native_filters=None):
+    """Add the dashboard state to url, keeping any query parameters it already has."""
+    parsed = urlparse(url)
+    params = dict(parse_qsl(parsed.query))
+    if standalone:
+        params["standalone"] = str(STANDALONE_HIDE_NAV)
+    if expand_filters is not None:
+        params["expand_filters"] = "1" if expand_filters else "0"
+    if native_filters:
+        params["native_filters"] = rison(native_filters)
+    return urlunparse(parsed._replace(query=urlencode(params, safe="():,!'")))
+
+
+def dashboard_page(url):
+    """url without its state (query string, fragment, trailing slash), to compare dashboards."""
+    parsed = urlparse(url)
+    return urlunparse(parsed._replace(path=parsed.path.rstrip("/"), query="", fragment=""))
+
+
+def dashboard_id_from_url(url):
+    """The slug or numeric id in .../superset/dashboard/<id>/"""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if "dashboard" in parts and parts.index("dashboard") + 1 < len(parts):
+        return parts[parts.index("dashboard") + 1]
+    return None
+
+
+def discover_native_filter(base_url, dashboard_url, filter_name, cookies):
+    """
+    Look up a native filter's id and target column by its name through the
+    dashboard API, using the browser's session cookies. None if not found.
+    """
+    dashboard_id = dashboard_id_from_url(dashboard_url)
+    if dashboard_id is None:
+        return None
+    try:
+        result = superset_api_get(base_url, f"/api/v1/dashboard/{dashboard_id}", cookies)["result"]
+        metadata = json.loads(result.get("json_metadata") or "{}")
+    except (urllib.error.URLError, OSError, ValueError, KeyError):
+        return None
+    for native_filter in metadata.get("native_filter_configuration", []):
+        if native_filter.get("name") != filter_name:
+            continue
+        targets = native_filter.get("targets") or [{}]
+        column = targets[0].get("column", {}).get("name")
+        if column:
+            return {"id": native_filter["id"], "column": column}
+    return None
+
+
+def verify_dashboard_state(driver, standalone=True, filter_label=None, filter_values=()):
+    """
+    True if the dashboard is mounted in the requested state. Filter values
+    are checked against the selected tags of the filter called filter_label
+    (the filter bar stays in the DOM while collapsed).
+    """
+    if not is_dashboard_mounted(driver):
+        return False
+    if standalone and "standalone" not in driver.current_url:
+        return False
+    if filter_label and filter_values:
+        selected = driver.execute_script(
+            """
+            var box = document.querySelector('[aria-label="' + arguments[0] + '"]');
+            if (!box) { return []; }
+            var tags = box.querySelectorAll('.tag-content, .ant-select-selection-item');
+            return Array.prototype.map.call(tags, function (t) { return t.textContent.trim(); });
+            """,
+            filter_label,
+        )
+        if not set(filter_values).issubset(selected):
+            return False
+    return True
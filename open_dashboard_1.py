@@ -1,7 +1,8 @@
 import time
 import os
 import gc
-from selenium import webdriver
+import signal
+import sys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from datetime import datetime
@@ -9,41 +10,125 @@ from selenium.common.exceptions import NoSuchElementException, TimeoutException,
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from dashboard_readiness import (
+    install_request_tracker,
+    is_dashboard_mounted,
+    wait_for_dashboard_ready,
+    wait_for_invisible,
+    wait_for_login_form,
+    wait_for_login_redirect,
+    wait_for_url_contains,
+)
+from dashboard_boot import BootPipeline, set_splash_status, splash_url
+from dashboard_browser import KioskBrowser, default_devtools_port, describe_tabs
+from dashboard_config import apply_selectors, load_config
+from dashboard_connectivity import ConnectivityProbe, SupersetUnreachable, when_online
+from dashboard_health import DashboardStalled, RefreshHealthMonitor, refresh_dashboard
+from dashboard_log import log_message
+from dashboard_memory import MemoryWatchdog
+from dashboard_metrics import export_metrics, increment, set_gauge, timed_step
+from dashboard_network import DEFAULT_BLOCKED_URLS, describe_transfer, install_request_blocking, record_page_load
+from dashboard_recovery import RecoveryLadder, Workflow
+from dashboard_screen import ScreenMonitor
+from dashboard_stagger import RefreshScheduler, device_id, log_stagger, phase
+from dashboard_session import (
+    browser_cookies,
+    clear_browser_session,
+    clear_session,
+    inject_session,
+    load_session,
+    save_session,
+    superset_base_url,
+)
+from dashboard_url_state import (
+    build_dashboard_url,
+    discover_native_filter,
+    native_filter_state,
+    verify_dashboard_state,
+)
+
 # Get the absolute path of the script's directory
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-# Use the absolute path to read credentials.txt
-credentials_file = os.path.join(script_dir, "credentials.txt")
-
-# Read credentials from file
-with open(credentials_file, "r") as file:
-    lines = file.read().splitlines()
-    SUPSET_LOGIN_URL = lines[0]
-    SUPSET_DASH_URL = lines[1]
-    USERNAME = lines[2]
-    PASSWORD = lines[3]
-    DASHBOARD_TITLE = lines[4]
+# Use the absolute path to read credentials.txt (DASHBOARD_CREDENTIALS_FILE overrides it)
+credentials_file = os.environ.get("DASHBOARD_CREDENTIALS_FILE", os.path.join(script_dir, "credentials.txt"))
+
+# config.toml (see config.example.toml) replaces credentials.txt when it
+# exists; this variant shows its first dashboard and reads it once at start
+CONFIG_FILE = os.environ.get("DASHBOARD_CONFIG_FILE", os.path.join(script_dir, "config.toml"))
+
+if os.path.exists(CONFIG_FILE):
+    CONFIG = load_config(CONFIG_FILE)
+    SUPSET_LOGIN_URL = CONFIG["superset"]["login_url"]
+    SUPSET_DASH_URL = CONFIG["dashboards"][0]["url"]
+    USERNAME = CONFIG["superset"]["username"]
+    PASSWORD = CONFIG["superset"]["password"]
+    DASHBOARD_TITLE = CONFIG["dashboards"][0]["title"]
+else:
+    CONFIG = None
+    # Read credentials from file
+    with open(credentials_file, "r") as file:
+        lines = file.read().splitlines()
+        SUPSET_LOGIN_URL = lines[0]
+        SUPSET_DASH_URL = lines[1]
+        USERNAME = lines[2]
+        PASSWORD = lines[3]
+        DASHBOARD_TITLE = lines[4]
+
+SUPSET_BASE_URL = superset_base_url(SUPSET_LOGIN_URL)
+
+# Cached Superset session cookies (chmod 600, not tracked in git)
+SESSION_FILE = os.path.join(script_dir, "session_cookies.json")
+
+# Chromium runs as its own long-lived process with DevTools on this port.
+# The script attaches to it, so a restarted script takes over the running
+# browser and its dashboard instead of starting a new one (dashboard_browser.py).
+# The port is 9222 plus a block per user (kiosk accounts on one host must not
+# share a browser); $DASHBOARD_DEVTOOLS_PORT overrides it
+DEVTOOLS_PORT = default_devtools_port()
+
+# Chromium keeps its profile in BROWSER_PROFILE_DIR across restarts, with a
+# disk cache of at most BROWSER_CACHE_MB for Superset's static assets, so a
+# reload does not download the JS bundles again (empty: a fresh profile on
+# every start). Requests matching BLOCKED_URLS (telemetry, web fonts,
+# avatars) are never sent (see dashboard_network.py)
+BROWSER_PROFILE_DIR = os.path.join(script_dir, "chromium-profile")
+BROWSER_CACHE_MB = 100
+BLOCKED_URLS = DEFAULT_BLOCKED_URLS
+
+if CONFIG is not None:
+    BROWSER_PROFILE_DIR = CONFIG["browser"].get("profile_dir", BROWSER_PROFILE_DIR)
+    BROWSER_CACHE_MB = CONFIG["browser"].get("cache_size_mb", BROWSER_CACHE_MB)
+    BLOCKED_URLS = CONFIG["browser"].get("blocked_urls", BLOCKED_URLS)
+
+BROWSER = KioskBrowser(
+    ["/usr/bin/chromium-browser"],
+    [
+        "--start-fullscreen",
+        "--disable-session-crashed-bubble",
+        "--no-sandbox",
+        # "--headless",
+        "--disable-dev-shm-usage",
+    ],
+    prefs={"credentials_enable_service": False,
+           "profile.password_manager_enabled": False},
+    port=DEVTOOLS_PORT,
+    start_url=splash_url("Connecting to Superset..."),
+    profile_dir=BROWSER_PROFILE_DIR,
+    cache_size_mb=BROWSER_CACHE_MB,
+)
+
+# Time to the first dashboard, and the work done in parallel to get there
+# (see dashboard_boot.py)
+BOOT = BootPipeline()
 
 # Function to initialize the Chrome browser
+@timed_step("browser_start")
 def initialize_browser():
-    options = webdriver.ChromeOptions()
-    options.binary_location = "/usr/bin/chromium-browser"
-    options.add_argument("--start-fullscreen")
-    options.add_argument("--disable-session-crashed-bubble")
-    options.add_argument("--no-sandbox")
-    # options.add_argument("--remote-debugging-port=9222")
-    # options.add_argument("--headless")
-    options.add_argument("--disable-dev-shm-usage")
-    prefs = {"credentials_enable_service": False,
-             "profile.password_manager_enabled": False}
-    options.add_experimental_option("prefs", prefs)
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    return webdriver.Chrome(options=options)
-
-# Function to log errors and retries
-def log_message(message):
-    with open("python_log.txt", "a") as log_file:
-        log_file.write(f"{datetime.now()}: {message}\n")
+    driver = BROWSER.connect()
+    install_request_tracker(driver)
+    install_request_blocking(driver, BLOCKED_URLS)
+    return driver
 
 
 def cleanup_memory():
@@ -60,195 +145,532 @@ def calculate_week_number(date):
     days_since_start = (date - year_start).days + 1  # Add 1 to include January 1st
     return (days_since_start // 7) + 1
 
+
+def current_week_filter():
+    """The week filter value for today, e.g. 2025W7."""
+    current_date = datetime.now()
+    return f"{current_date.strftime('%Y')}W{calculate_week_number(current_date)}"
+
+# Deadlines for the readiness waits (generous for Raspberry Pis; on fast
+# machines the waits return as soon as Superset is actually ready)
+LOGIN_TIMEOUT_SECONDS = 60
+DASHBOARD_READY_TIMEOUT_SECONDS = 120
+UI_STEP_TIMEOUT_SECONDS = 10
+
+# Recovery ladder: retry the step, reload, re-navigate, log in again, restart
+# Chromium. Attempts back off exponentially (with jitter) up to the maximum;
+# a tier that fails RECOVERY_BREAKER_FAILURES times in a row is skipped for
+# the cool-down. The kiosk never gives up.
+RECOVERY_BASE_DELAY_SECONDS = 2
+RECOVERY_MAX_DELAY_SECONDS = 300
+RECOVERY_BREAKER_FAILURES = 3
+RECOVERY_BREAKER_COOLDOWN_SECONDS = 15 * 60
+
+# Recycle the browser when Chromium's whole process tree (PSS) grows past this
+MEMORY_BUDGET_MB = 1536
+MEMORY_SAMPLE_INTERVAL_SECONDS = 60
+
+# Auto-refresh interval set on the dashboard. The health check expects a
+# completed chart-data request within this plus the grace period, and
+# re-queries charts stuck loading (or in error) for CHART_STUCK_SECONDS.
+REFRESH_INTERVAL_SECONDS = 5 * 60
+REFRESH_GRACE_SECONDS = 60
+CHART_STUCK_SECONDS = 120
+
+# Build fullscreen, the week filter and the collapsed filter bar into the
+# dashboard URL (one navigation); the click workflow is only the fallback
+USE_URL_FAST_PATH = True
+WEEK_FILTER_NAME = "Week"
+# Superset has no URL parameter for auto-refresh. Set this to True if the
+# dashboard's own refresh frequency is saved (Edit properties) to skip the modal.
+REFRESH_SAVED_ON_DASHBOARD = False
+
+# Probe the Superset host in-process (see dashboard_connectivity.py): every
+# CONNECTIVITY_CHECK_SECONDS while it answers, backing off to at most
+# CONNECTIVITY_MAX_BACKOFF_SECONDS between probes while it does not
+CONNECTIVITY_CHECK_SECONDS = 30
+CONNECTIVITY_MAX_BACKOFF_SECONDS = 15
+
+# Look at a tiny screenshot after each health check (see dashboard_screen.py)
+# and reload a screen that is blank, only shows a spinner, or has not
+# changed (and renders no frames) for FROZEN_REFRESH_INTERVALS refreshes
+SCREEN_CHECK = True
+FROZEN_REFRESH_INTERVALS = 3
+
+# Stagger the fleet's load on Superset (see dashboard_stagger.py): instead
+# of Superset's auto-refresh timer, the dashboard is refreshed every
+# REFRESH_INTERVAL_SECONDS at this kiosk's own phase, give or take
+# STAGGER_JITTER_SECONDS. The phase comes from DEVICE_ID (empty:
+# $DASHBOARD_DEVICE_ID, else the machine ID and host name).
+STAGGER_REFRESH = True
+STAGGER_JITTER_SECONDS = 15
+DEVICE_ID = ""
+
+# Settings from config.toml override the defaults above
+if CONFIG is not None:
+    rotation, timeouts, memory = CONFIG["rotation"], CONFIG["timeouts"], CONFIG["memory"]
+    LOGIN_TIMEOUT_SECONDS = timeouts.get("login_seconds", LOGIN_TIMEOUT_SECONDS)
+    DASHBOARD_READY_TIMEOUT_SECONDS = timeouts.get("dashboard_ready_seconds", DASHBOARD_READY_TIMEOUT_SECONDS)
+    UI_STEP_TIMEOUT_SECONDS = timeouts.get("ui_step_seconds", UI_STEP_TIMEOUT_SECONDS)
+    MEMORY_BUDGET_MB = memory.get("budget_mb", MEMORY_BUDGET_MB)
+    MEMORY_SAMPLE_INTERVAL_SECONDS = memory.get("sample_interval_seconds", MEMORY_SAMPLE_INTERVAL_SECONDS)
+    REFRESH_INTERVAL_SECONDS = rotation.get("refresh_interval_minutes", REFRESH_INTERVAL_SECONDS // 60) * 60
+    USE_URL_FAST_PATH = rotation.get("use_url_fast_path", USE_URL_FAST_PATH)
+    WEEK_FILTER_NAME = rotation.get("week_filter_name", WEEK_FILTER_NAME)
+    REFRESH_SAVED_ON_DASHBOARD = rotation.get("refresh_saved_on_dashboard", REFRESH_SAVED_ON_DASHBOARD)
+    CONNECTIVITY_CHECK_SECONDS = CONFIG["connectivity"].get("check_interval_seconds", CONNECTIVITY_CHECK_SECONDS)
+    CONNECTIVITY_MAX_BACKOFF_SECONDS = CONFIG["connectivity"].get(
+        "max_backoff_seconds", CONNECTIVITY_MAX_BACKOFF_SECONDS
+    )
+    SCREEN_CHECK = CONFIG["screen"].get("enabled", SCREEN_CHECK)
+    FROZEN_REFRESH_INTERVALS = CONFIG["screen"].get("frozen_refresh_intervals", FROZEN_REFRESH_INTERVALS)
+    STAGGER_REFRESH = CONFIG["stagger"].get("refresh", STAGGER_REFRESH)
+    STAGGER_JITTER_SECONDS = CONFIG["stagger"].get("jitter_seconds", STAGGER_JITTER_SECONDS)
+    DEVICE_ID = CONFIG["stagger"].get("device_id", DEVICE_ID)
+    apply_selectors(CONFIG["selectors"])
+
+# Superset's auto-refresh timer is only set when neither the dashboard's
+# saved refresh frequency nor the staggered schedule refreshes it
+USES_AUTO_REFRESH = not REFRESH_SAVED_ON_DASHBOARD and not STAGGER_REFRESH
+
+MENU_TRIGGER_XPATH = "//button[@aria-label='Menu actions trigger']"
+
+
+def click_when_ready(driver, xpath, timeout=UI_STEP_TIMEOUT_SECONDS):
+    """Wait for an element to become clickable and click it."""
+    WebDriverWait(driver, timeout).until(
+        EC.element_to_be_clickable((By.XPATH, xpath))
+    ).click()
+
+
+def wait_for_dashboard(driver):
+    """Wait for the dashboard to render; a slow chart is logged, not fatal."""
+    try:
+        timings = wait_for_dashboard_ready(driver, DASHBOARD_READY_TIMEOUT_SECONDS)
+        transfer = record_page_load(driver, timings["total"])
+        log_message(
+            f"Dashboard ready in {timings['total']:.1f}s "
+            f"(grid {timings['grid']:.1f}s, charts {timings['charts']:.1f}s, "
+            f"network {timings['network']:.1f}s); {describe_transfer(transfer)}."
+        )
+    except TimeoutException as e:
+        log_message(f"WARNING: Dashboard not fully ready: {e}")
+
+
+@timed_step("login_to_superset")
+def login_to_superset(driver):
+    """Step 1 & 2: Open the Superset login page and sign in."""
+    driver.get(SUPSET_LOGIN_URL)
+    elapsed = wait_for_login_form(driver, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Opened Superset login page (form ready after {elapsed:.1f}s).")
+
+    username_field = driver.find_element(By.NAME, "username")
+    password_field = driver.find_element(By.NAME, "password")
+    username_field.send_keys(USERNAME)
+    password_field.send_keys(PASSWORD)
+    password_field.send_keys(Keys.RETURN)
+    elapsed = wait_for_login_redirect(driver, SUPSET_LOGIN_URL, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Logged in successfully (redirected after {elapsed:.1f}s).")
+
+
+@timed_step("ensure_logged_in")
+def ensure_logged_in(driver):
+    """
+    Reuse the cached Superset session if it is still valid; only type the
+    credentials when Superset rejects it.
+    """
+    cookies = load_session(SESSION_FILE)
+    # While booting, the session was checked as soon as Superset answered
+    if BOOT.session_valid(SUPSET_BASE_URL, cookies):
+        inject_session(driver, cookies, SUPSET_BASE_URL)
+        log_message(f"Reused cached Superset session ({len(cookies)} cookies). Skipped login.")
+        BOOT.mark("logged_in")
+        return
+
+    if cookies:
+        log_message("Cached Superset session was rejected. Logging in again.")
+    login_to_superset(driver)
+    saved = save_session(driver, SESSION_FILE)
+    log_message(f"Saved Superset session ({saved} cookies) to {SESSION_FILE}.")
+    BOOT.mark("logged_in")
+
+
+@timed_step("open_dashboard_page")
+def open_dashboard_page(driver):
+    """Step 2.5: Open the Dashboard page."""
+    driver.get(SUPSET_DASH_URL)
+    log_message("Opened Superset Dash page.")
+    wait_for_dashboard(driver)
+
+
+@timed_step("enter_fullscreen")
+def enter_fullscreen(driver):
+    """Step 3: Enter fullscreen mode."""
+    click_when_ready(driver, MENU_TRIGGER_XPATH)
+    click_when_ready(driver, "//li[contains(text(), 'Enter fullscreen')]")
+    # Superset reloads the dashboard in standalone mode
+    wait_for_url_contains(driver, "standalone", UI_STEP_TIMEOUT_SECONDS)
+    log_message("Entered fullscreen mode.")
+    wait_for_dashboard(driver)
+
+
+@timed_step("apply_week_filter")
+def apply_week_filter(driver):
+    """Step 4: Apply filters directly by typing and pressing Enter."""
+    wait = WebDriverWait(driver, UI_STEP_TIMEOUT_SECONDS)
+
+    try:
+        # Locate the week filter input box
+        week_filter_input = wait.until(
+            EC.presence_of_element_located((By.XPATH, "//h4[text()='Week']/ancestor::div[@aria-label='Week']//input[@role='combobox']"))
+        )
+        log_message("Week filter input box found.")
+
+        # Calculate current week
+        CURRENT_FILTER = current_week_filter()
+        log_message(f"Target filter value: {CURRENT_FILTER}")
+
+        # Check if an existing filter is already applied
+        try:
+            existing_filter_tag = week_filter_input.find_element(
+                By.XPATH, ".//ancestor::div[@aria-label='Week']//span[@class='tag-content']"
+            )
+            existing_filter_value = existing_filter_tag.text
+            log_message(f"Existing filter value: {existing_filter_value}")
+
+            if existing_filter_value == CURRENT_FILTER:
+                log_message("Current filter already applied. Skipping filter application.")
+            else:
+                # Clear existing filter if it differs from the current filter
+                clear_button = week_filter_input.find_element(
+                    By.XPATH, ".//ancestor::div[@aria-label='Week']//span[@aria-label='close']"
+                )
+                clear_button.click()
+                log_message("Cleared existing filter.")
+                wait.until(EC.staleness_of(existing_filter_tag))
+        except NoSuchElementException:
+            log_message("No existing filter found. Proceeding to apply the new filter.")
+
+        # Type the current filter and press Enter
+        week_filter_input.click()
+        week_filter_input.clear()
+        week_filter_input.send_keys(CURRENT_FILTER)
+        log_message(f"Typed filter value: {CURRENT_FILTER}")
+        week_filter_input.send_keys(Keys.RETURN)
+        log_message("Pressed Enter after typing filter.")
+
+        # Wait for the "Apply filters" button to become clickable and click it
+        apply_button = wait.until(
+            EC.element_to_be_clickable((By.XPATH, "//button[@data-test='filter-bar__apply-button' and not(@disabled)]"))
+        )
+        apply_button.click()
+        log_message("Clicked 'Apply filters' button.")
+        wait_for_dashboard(driver)
+
+        # Close the filter panel by clicking the collapse button
+        collapse_button = driver.find_element(By.XPATH, "//button[@data-test='filter-bar__collapse-button']")
+        collapse_button.click()
+        log_message("Filter bar collapsed.")
+
+    except Exception as e:
+        log_message(f"Error during filter handling: {str(e)}")
+        raise
+
+    return CURRENT_FILTER
+
+
+@timed_step("set_auto_refresh")
+def set_auto_refresh(driver):
+    """Step 5: Set auto-refresh interval (re-locating elements)."""
+    click_when_ready(driver, MENU_TRIGGER_XPATH)
+    log_message("Settings menu opened for auto-refresh setup.")
+
+    click_when_ready(driver, "//span[contains(text(), 'Set auto-refresh interval')]")
+    log_message("Auto-refresh option selected.")
+
+    click_when_ready(driver, "//div[@aria-label='Refresh interval']")
+    log_message("Refresh interval dropdown opened.")
+
+    minutes = REFRESH_INTERVAL_SECONDS // 60
+    click_when_ready(driver, f"//div[@class='ant-select-item-option-content' and text()='{minutes} minutes']")
+    log_message(f"{minutes} minutes interval selected.")
+
+    click_when_ready(driver, "//button[contains(@class, 'superset-button-primary')]//span[text()='Save for this session']/parent::button")
+    wait_for_invisible(driver, ".ant-modal", UI_STEP_TIMEOUT_SECONDS)
+    log_message(f"Auto-refresh interval set to {minutes} minutes.")
+
+    # Click settings button one final time to close the menu
+    click_when_ready(driver, MENU_TRIGGER_XPATH)
+    log_message("Settings menu closed for auto-refresh setup.")
+
+
+@timed_step("open_dashboard_fast")
+def open_dashboard_fast(driver):
+    """
+    Open the dashboard fullscreen, filtered to the current week and with the
+    filter bar collapsed, in a single navigation. Returns the filter value,
+    or None if Superset did not apply the state.
+    """
+    current_filter = current_week_filter()
+    week_filter = discover_native_filter(
+        SUPSET_BASE_URL, SUPSET_DASH_URL, WEEK_FILTER_NAME,
+        browser_cookies(driver, SUPSET_BASE_URL),
+    )
+    if week_filter is None:
+        log_message(f"URL fast path: native filter '{WEEK_FILTER_NAME}' not found.")
+        return None
+
+    driver.get(build_dashboard_url(
+        SUPSET_DASH_URL,
+        standalone=True,
+        expand_filters=False,
+        native_filters=native_filter_state(week_filter["id"], week_filter["column"], [current_filter]),
+    ))
+    log_message(f"Opened Superset Dash page with URL state (filter {current_filter}).")
+    wait_for_dashboard(driver)
+
+    if not verify_dashboard_state(driver, True, WEEK_FILTER_NAME, [current_filter]):
+        log_message("WARNING: URL state not applied. Falling back to the click workflow.")
+        return None
+    return current_filter
+
+
+def open_filtered_dashboard(driver):
+    """Steps 2.5-4: Open the dashboard fullscreen and filtered (URL fast path, clicks as fallback)."""
+    current_filter = open_dashboard_fast(driver) if USE_URL_FAST_PATH else None
+    if current_filter is None:
+        open_dashboard_page(driver)
+        enter_fullscreen(driver)
+        current_filter = apply_week_filter(driver)
+    log_message(f"Dashboard loaded with filters applied: {current_filter}.")
+
+
+def verify_dashboard(driver):
+    """Raise unless the dashboard is the page on screen and mounted."""
+    if DASHBOARD_TITLE not in driver.title:
+        raise WebDriverException("Dashboard title not found.")
+    if not is_dashboard_mounted(driver):
+        raise WebDriverException("Dashboard is not mounted.")
+
+
+def adopt_dashboard(driver):
+    """
+    Keep showing the dashboard of a browser that outlived the last run, as
+    it is: no reload, no login. False if its visible tab fails verify_dashboard.
+    """
+    visible = [tab for tab in describe_tabs(driver) if tab["visible"]]
+    if not visible:
+        return False
+    driver.switch_to.window(visible[0]["handle"])
+    try:
+        verify_dashboard(driver)
+    except WebDriverException as e:
+        log_message(f"Not taking over the running browser's page ({e.msg}). Setting up again.")
+        return False
+    # The tracker and blocklist for future page loads went with the last run's DevTools session
+    install_request_tracker(driver)
+    install_request_blocking(driver, BLOCKED_URLS)
+    log_message("Took over the dashboard of the running browser.")
+    return True
+
+
+def setup_workflow():
+    """Steps 1-5 as a workflow that can resume at the step that failed."""
+    steps = [("ensure_logged_in", ensure_logged_in), ("open_dashboard", open_filtered_dashboard)]
+    if USES_AUTO_REFRESH:
+        steps.append(("set_auto_refresh", set_auto_refresh))
+    return Workflow(steps, verify_dashboard)
+
+
+@timed_step("reload_dashboard")
+def reload_dashboard(driver):
+    """Soft recovery: reload the page. The URL keeps fullscreen and the filter."""
+    driver.refresh()
+    wait_for_dashboard(driver)
+    if USES_AUTO_REFRESH:
+        set_auto_refresh(driver)  # the interval only lives in the page session
+    verify_dashboard(driver)
+    return driver
+
+
+def reauthenticate(driver, workflow):
+    """Drop the (possibly expired) session and run the setup with a fresh login."""
+    clear_session(SESSION_FILE)
+    clear_browser_session(driver)
+    return workflow.run(driver)
+
+
+def restart_browser(driver, workflow):
+    """Last resort: a new Chromium, then the full setup."""
+    increment("browser_restarts", reason="error")
+    BROWSER.terminate(driver)
+    cleanup_memory()
+    new_driver = initialize_browser()
+    try:
+        return workflow.run(new_driver)
+    except Exception:
+        BROWSER.terminate(new_driver)
+        raise
+
+
+def recovery_ladder(workflow, connectivity):
+    """Recovery tiers, cheapest first. Each waits until Superset is reachable."""
+    tiers = {
+        "retry_step": workflow.resume,
+        "reload": reload_dashboard,
+        "renavigate": lambda driver: workflow.run(driver, start=1),
+        "reauth": lambda driver: reauthenticate(driver, workflow),
+        "restart": lambda driver: restart_browser(driver, workflow),
+    }
+    return RecoveryLadder(
+        {name: when_online(connectivity, action) for name, action in tiers.items()},
+        base_delay_seconds=RECOVERY_BASE_DELAY_SECONDS,
+        max_delay_seconds=RECOVERY_MAX_DELAY_SECONDS,
+        breaker_threshold=RECOVERY_BREAKER_FAILURES,
+        breaker_cooldown_seconds=RECOVERY_BREAKER_COOLDOWN_SECONDS,
+    )
+
+
+def recycle_browser(driver):
+    """Replace a browser that has grown past its memory budget."""
+    log_message("Recycling browser to release Chromium memory.")
+    increment("browser_restarts", reason="memory")
+    BROWSER.terminate(driver)
+    cleanup_memory()
+    return initialize_browser()
+
+
+def check_memory(watchdog, driver):
+    """Sample Chromium's memory if due; True when the budget has been crossed."""
+    if not watchdog.due():
+        return False
+    sample = watchdog.sample(driver)
+    if sample is None:
+        return False
+    set_gauge("browser_pss_bytes", int(sample["pss_mb"] * 1024 * 1024))
+    set_gauge("browser_rss_bytes", int(sample["rss_mb"] * 1024 * 1024))
+    set_gauge("browser_processes", sample["processes"])
+    log_message(
+        f"Browser memory: PSS {sample['pss_mb']:.0f} MB, RSS {sample['rss_mb']:.0f} MB "
+        f"across {sample['processes']} processes (budget {watchdog.budget_mb} MB)."
+    )
+    return watchdog.over_budget
+
+
+def new_refresh_scheduler():
+    """The staggered refresh schedule, or None when Superset refreshes the dashboard itself."""
+    if not STAGGER_REFRESH or REFRESH_SAVED_ON_DASHBOARD:
+        return None
+    return RefreshScheduler(REFRESH_INTERVAL_SECONDS, phase(device_id(DEVICE_ID), "refresh"), STAGGER_JITTER_SECONDS)
+
+
+def refresh_on_schedule(driver, refresher):
+    """This kiosk's turn to refresh the dashboard."""
+    refresher.mark_refreshed()
+    if refresh_dashboard(driver):
+        increment("scheduled_refreshes")
+    else:
+        # A dashboard that stopped refreshing is the health check's job
+        log_message("Scheduled refresh of the dashboard failed.")
+        increment("scheduled_refreshes_failed")
+
+
 # Main function to load and monitor the dashboard
 def load_dashboard():
+    # Probe Superset and check the cached session while Chromium starts
+    connectivity = ConnectivityProbe(
+        SUPSET_LOGIN_URL,
+        CONNECTIVITY_CHECK_SECONDS,
+        max_backoff_seconds=CONNECTIVITY_MAX_BACKOFF_SECONDS,
+    ).start()
+    BOOT.check_session(SUPSET_BASE_URL, load_session(SESSION_FILE), connectivity.wait_online)
     driver = initialize_browser()
-    retries = 0
-    max_retries = 10  # Maximum number of retries before giving up
-    refresh_interval_minutes = 5  # Expected refresh interval in minutes
-    last_refresh_time = datetime.now()
-    last_cleanup_time = datetime.now()
-    cleanup_interval_minutes = 30  # Perform cleanup every 30 minutes
+    BOOT.mark("browser")
+    watchdog = MemoryWatchdog(MEMORY_BUDGET_MB, MEMORY_SAMPLE_INTERVAL_SECONDS)
+    refresher = new_refresh_scheduler()
+    log_stagger(device_id(DEVICE_ID), refresher=refresher)
+    # Two jittered refreshes can be up to twice the jitter further apart
+    expected_refresh_seconds = REFRESH_INTERVAL_SECONDS + (2 * STAGGER_JITTER_SECONDS if refresher else 0)
+    health = RefreshHealthMonitor(expected_refresh_seconds, REFRESH_GRACE_SECONDS, CHART_STUCK_SECONDS)
+    screen = ScreenMonitor(FROZEN_REFRESH_INTERVALS * REFRESH_INTERVAL_SECONDS) if SCREEN_CHECK else None
+    workflow = setup_workflow()
+    ladder = recovery_ladder(workflow, connectivity)
+    # A browser that outlived the last run keeps showing its dashboard
+    needs_setup = not (BROWSER.attached and adopt_dashboard(driver))
+    error = None
 
     while True:
         try:
-            # Periodic memory cleanup
-            current_time = datetime.now()
-            if (current_time - last_cleanup_time).total_seconds() / 60 > cleanup_interval_minutes:
-                cleanup_memory()
-                last_cleanup_time = current_time
-
-            # Step 1: Open the Superset login page
-            driver.get(SUPSET_LOGIN_URL)
-            log_message("Opened Superset login page.")
-            time.sleep(5)
-
-            # Step 2: Enter login credentials
-            username_field = driver.find_element(By.NAME, "username")
-            password_field = driver.find_element(By.NAME, "password")
-            username_field.send_keys(USERNAME)
-            password_field.send_keys(PASSWORD)
-            password_field.send_keys(Keys.RETURN)
-            time.sleep(15)
-            log_message("Logged in successfully.")
-
-            # Step 2.5: Open the Dashboard page
-            driver.get(SUPSET_DASH_URL)
-            log_message("Opened Superset Dash page.")
-            time.sleep(15)
-
-            # Step 3: Enter fullscreen mode
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Menu actions trigger']"))
-            ).click()
-            time.sleep(2)
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//li[contains(text(), 'Enter fullscreen')]"))
-            ).click()
-            time.sleep(2)
-            log_message("Entered fullscreen mode.")
-
-            # Step 4: Apply filters directly by typing and pressing Enter
-            wait = WebDriverWait(driver, 10)
-
-            try:
-                # Locate the week filter input box
-                week_filter_input = wait.until(
-                    EC.presence_of_element_located((By.XPATH, "//h4[text()='Week']/ancestor::div[@aria-label='Week']//input[@role='combobox']"))
-                )
-                log_message("Week filter input box found.")
-
-                # Calculate current week
-                current_date = datetime.now()
-                CURRENT_YEAR = current_date.strftime("%Y")
-                CURRENT_WEEK = calculate_week_number(current_date)
-                CURRENT_FILTER = f"{CURRENT_YEAR}W{CURRENT_WEEK}"
-                log_message(f"Target filter value: {CURRENT_FILTER}")
-
-                # Check if an existing filter is already applied
-                try:
-                    existing_filter_tag = week_filter_input.find_element(
-                        By.XPATH, ".//ancestor::div[@aria-label='Week']//span[@class='tag-content']"
-                    )
-                    existing_filter_value = existing_filter_tag.text
-                    log_message(f"Existing filter value: {existing_filter_value}")
-
-                    if existing_filter_value == CURRENT_FILTER:
-                        log_message("Current filter already applied. Skipping filter application.")
-                    else:
-                        # Clear existing filter if it differs from the current filter
-                        clear_button = week_filter_input.find_element(
-                            By.XPATH, ".//ancestor::div[@aria-label='Week']//span[@aria-label='close']"
-                        )
-                        clear_button.click()
-                        log_message("Cleared existing filter.")
-                        time.sleep(2)
-                except NoSuchElementException:
-                    log_message("No existing filter found. Proceeding to apply the new filter.")
-
-                # Type the current filter and press Enter
-                week_filter_input.click()
-                week_filter_input.clear()
-                week_filter_input.send_keys(CURRENT_FILTER)
-                log_message(f"Typed filter value: {CURRENT_FILTER}")
-                week_filter_input.send_keys(Keys.RETURN)
-                log_message("Pressed Enter after typing filter.")
-
-                # Wait for the "Apply filters" button to become clickable and click it
-                apply_button = wait.until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[@data-test='filter-bar__apply-button' and not(@disabled)]"))
-                )
-                apply_button.click()
-                log_message("Clicked 'Apply filters' button.")
-                time.sleep(2)
-
-                # Close the filter panel by clicking the collapse button
-                collapse_button = driver.find_element(By.XPATH, "//button[@data-test='filter-bar__collapse-button']")
-                collapse_button.click()
-                log_message("Filter bar collapsed.")
-
-            except Exception as e:
-                log_message(f"Error during filter handling: {str(e)}")
-                raise
-
-            # Step 5: Set auto-refresh interval (re-locating elements)
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Menu actions trigger']"))
-            ).click()
-            time.sleep(2)
-            log_message("Settings menu opened for auto-refresh setup.")
-
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Set auto-refresh interval')]"))
-            ).click()
-            time.sleep(2)
-            log_message("Auto-refresh option selected.")
-
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[@aria-label='Refresh interval']"))
-            ).click()
-            time.sleep(1)
-            log_message("Refresh interval dropdown opened.")
-
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[@class='ant-select-item-option-content' and text()='5 minutes']"))
-            ).click()
-            time.sleep(1)
-            log_message("5 minutes interval selected.")
-
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'superset-button-primary')]//span[text()='Save for this session']/parent::button"))
-            ).click()
-            time.sleep(2)
-            log_message("Auto-refresh interval set to 5 minutes.")
-
-            # Click settings button one final time to close the menu
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@aria-label='Menu actions trigger']"))
-            ).click()
-            time.sleep(2)
-            log_message("Settings menu closed for auto-refresh setup.")
+            if error is not None:
+                # Take the cheapest recovery that works; a stalled page (or one
+                # that lost Superset) starts at a reload
+                first_tier = "reload" if isinstance(error, (DashboardStalled, SupersetUnreachable)) else None
+                recovered = ladder.recover(driver, error, first_tier)
+                if recovered is not driver:
+                    watchdog.reset()
+                driver, error, needs_setup = recovered, None, False
+            elif needs_setup:
+                # Steps 1-5: Log in, open the dashboard, go fullscreen, filter, auto-refresh
+                connectivity.wait_until_online()
+                BOOT.mark("superset_reachable", connectivity.online_since)
+                set_splash_status(driver, "Opening the dashboard...")
+                workflow.run(driver)
+                needs_setup = False
+            BOOT.finish()
+            health.reset()
+            if screen is not None:
+                screen.reset()
 
             # Step 6: Monitor the dashboard with memory management
-            log_message(f"Dashboard loaded with filters applied: {CURRENT_FILTER}. Monitoring...")
+            log_message("Monitoring dashboard...")
             while True:
-                time.sleep(60)  # Check every minute
+                export_metrics()
+                # Check every minute (or at the staggered refresh time), or as
+                # soon as Superset stops answering
+                wait_seconds = 60 if refresher is None else min(60, refresher.seconds_until_due() + 0.05)
+                connectivity.wait_for_change(wait_seconds)
+                if connectivity.online is False:
+                    raise SupersetUnreachable(f"Superset at {connectivity.target} does not answer.")
                 
-                # Perform periodic memory cleanup during monitoring
-                current_time = datetime.now()
-                if (current_time - last_cleanup_time).total_seconds() / 60 > cleanup_interval_minutes:
-                    cleanup_memory()
-                    last_cleanup_time = current_time
+                # Recycle Chromium in a controlled way once it is over budget
+                if check_memory(watchdog, driver):
+                    log_message(f"Browser memory over budget ({MEMORY_BUDGET_MB} MB).")
+                    driver = recycle_browser(driver)
+                    watchdog.reset()
+                    needs_setup = True
+                    break  # Re-run the setup steps in the new browser
                 
-                elapsed_time = (datetime.now() - last_refresh_time).total_seconds() / 60
-                if elapsed_time > refresh_interval_minutes + 1:  # Allow 1 minute buffer
-                    raise WebDriverException("Dashboard did not refresh. Reloading...")
-                if DASHBOARD_TITLE not in driver.title:
-                    raise WebDriverException("Dashboard title not found. Reloading...")
-                last_refresh_time = datetime.now()
-
-        except (NoSuchElementException, TimeoutException, WebDriverException) as e:
-            log_message(f"Error encountered: {e}. Retrying...")
-            cleanup_memory()  # Clean up memory before retry
-            retries += 1
-            if retries > max_retries:
-                log_message("Max retries reached. Exiting...")
-                break
-            time.sleep(30)  # Wait before retrying
-            driver.quit()
-            driver = initialize_browser()
-
-        except Exception as e:
-            log_message(f"Unexpected error: {e}. Exiting...")
-            cleanup_memory()
-            driver.quit()
-            break
+                verify_dashboard(driver)
+                if refresher is not None and refresher.due():
+                    refresh_on_schedule(driver, refresher)
+                # Re-query stuck or failed charts; raises DashboardStalled if
+                # the dashboard stopped refreshing and only a reload will help
+                health.check_and_repair(driver)
+                # A blank, spinner-only or frozen screen raises ScreenStalled (a reload)
+                if screen is not None:
+                    screen.check_and_raise(driver)
 
         except KeyboardInterrupt:
             log_message("Dashboard Shutdown by user.")
+            connectivity.stop()
             cleanup_memory()
-            driver.quit()
+            BROWSER.terminate(driver)  # any other exit leaves the browser for the next run
             break
 
+        except SystemExit:
+            # SIGTERM from the supervisor or systemd
+            log_message("Dashboard Shutdown by SIGTERM.")
+            connectivity.stop()
+            raise  # leaves the browser for the next run
+
+        except Exception as e:
+            if not isinstance(e, (NoSuchElementException, TimeoutException, WebDriverException, SupersetUnreachable)):
+                log_message(f"Unexpected error: {type(e).__name__}: {e}")
+            increment("retries")
+            cleanup_memory()
+            error = e
+
 if __name__ == "__main__":
+    # The supervisor and systemd stop the kiosk with SIGTERM; exit cleanly so the log is flushed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     load_dashboard()
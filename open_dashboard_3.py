@@ -2,101 +2,368 @@ import time
 import os
 import gc
 import shutil
-from selenium import webdriver
+import signal
+import sys
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
-from datetime import datetime
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from datetime import datetime, timedelta
+from selenium.common.exceptions import NoSuchElementException, NoSuchWindowException, TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
 
+from dashboard_readiness import (
+    install_request_tracker,
+    is_dashboard_mounted,
+    wait_for_dashboard_ready,
+    wait_for_invisible,
+    wait_for_login_form,
+    wait_for_login_redirect,
+    wait_for_url_contains,
+)
+from dashboard_boot import BootPipeline, set_splash_status, splash_url
+from dashboard_browser import KioskBrowser, default_devtools_port, describe_tabs
+from dashboard_config import ConfigError, ConfigWatcher, apply_selectors, changed_sections, load_config
+from dashboard_connectivity import ConnectivityProbe, SupersetUnreachable, when_online
+from dashboard_freshness import FreshnessPoller, SupersetApi
+from dashboard_health import DashboardStalled, RefreshHealthMonitor, refresh_dashboard
+from dashboard_log import log_message
+from dashboard_memory import MemoryWatchdog
+from dashboard_metrics import export_metrics, increment, set_gauge, set_info, timed_step
+from dashboard_network import DEFAULT_BLOCKED_URLS, describe_transfer, install_request_blocking, record_page_load
+from dashboard_mosaic import MosaicMonitor, is_mosaic, mosaic_host_url, mosaic_mounted, open_mosaic
+from dashboard_recovery import RecoveryLadder, Workflow
+from dashboard_schedule import Schedule, describe_timeline
+from dashboard_screen import ScreenMonitor
+from dashboard_snapshot import SnapshotStore
+from dashboard_stagger import RefreshScheduler, device_id, log_stagger, phase, rotation_offset_seconds
+from dashboard_session import (
+    browser_cookies,
+    clear_browser_session,
+    clear_session,
+    inject_session,
+    load_session,
+    save_session,
+    superset_base_url,
+)
+from dashboard_url_state import build_dashboard_url, dashboard_page, verify_dashboard_state
+
 
 # ----------------- CONFIG / CREDENTIALS -----------------
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
-credentials_file = os.path.join(script_dir, "credentials.txt")
-
-with open(credentials_file, "r") as file:
-    lines = file.read().splitlines()
-    USERNAME = lines[0]
-    PASSWORD = lines[1]
-    SUPERSET_LOGIN_URL = lines[2]   # https://data.znphi.co.zm/login/
-
-    DASHBOARD_TITLE_1 = lines[3]    # Threshold-based Alert Program
-    DASHBOARD_URL_1   = lines[4]    # https://.../alert-threshold/
-    DASHBOARD_TITLE_2 = lines[5]    # Excess Mortality
-    DASHBOARD_URL_2   = lines[6]    # https://.../excess-mortality/
-    DASHBOARD_TITLE_3 = lines[7]    # ND1 Data
-    DASHBOARD_URL_3   = lines[8]    # https://.../nd1-data/
-    DASHBOARD_TITLE_4 = lines[9]    # ND2 Data
-    DASHBOARD_URL_4   = lines[10]   # https://.../nd2-data/
-
-DASHBOARDS = [
-    {"title": DASHBOARD_TITLE_1, "url": DASHBOARD_URL_1},
-    {"title": DASHBOARD_TITLE_2, "url": DASHBOARD_URL_2},
-    {"title": DASHBOARD_TITLE_3, "url": DASHBOARD_URL_3},
-    {"title": DASHBOARD_TITLE_4, "url": DASHBOARD_URL_4},
-]
+credentials_file = os.environ.get("DASHBOARD_CREDENTIALS_FILE", os.path.join(script_dir, "credentials.txt"))
+
+# config.toml (see config.example.toml) replaces credentials.txt when it exists
+CONFIG_FILE = os.environ.get("DASHBOARD_CONFIG_FILE", os.path.join(script_dir, "config.toml"))
+
+if os.path.exists(CONFIG_FILE):
+    CONFIG = load_config(CONFIG_FILE)
+    USERNAME = CONFIG["superset"]["username"]
+    PASSWORD = CONFIG["superset"]["password"]
+    SUPERSET_LOGIN_URL = CONFIG["superset"]["login_url"]
+    DASHBOARDS = CONFIG["dashboards"]  # each carries its own schedule settings
+else:
+    CONFIG = None
+    with open(credentials_file, "r") as file:
+        lines = file.read().splitlines()
+        USERNAME = lines[0]
+        PASSWORD = lines[1]
+        SUPERSET_LOGIN_URL = lines[2]   # https://data.znphi.co.zm/login/
+
+        DASHBOARD_TITLE_1 = lines[3]    # Threshold-based Alert Program
+        DASHBOARD_URL_1   = lines[4]    # https://.../alert-threshold/
+        DASHBOARD_TITLE_2 = lines[5]    # Excess Mortality
+        DASHBOARD_URL_2   = lines[6]    # https://.../excess-mortality/
+        DASHBOARD_TITLE_3 = lines[7]    # ND1 Data
+        DASHBOARD_URL_3   = lines[8]    # https://.../nd1-data/
+        DASHBOARD_TITLE_4 = lines[9]    # ND2 Data
+        DASHBOARD_URL_4   = lines[10]   # https://.../nd2-data/
+
+    DASHBOARDS = [
+        {"title": DASHBOARD_TITLE_1, "url": DASHBOARD_URL_1},
+        {"title": DASHBOARD_TITLE_2, "url": DASHBOARD_URL_2},
+        {"title": DASHBOARD_TITLE_3, "url": DASHBOARD_URL_3},
+        {"title": DASHBOARD_TITLE_4, "url": DASHBOARD_URL_4},
+    ]
+
+SUPERSET_BASE_URL = superset_base_url(SUPERSET_LOGIN_URL)
+
+# Cached Superset session cookies (chmod 600, not tracked in git)
+SESSION_FILE = os.path.join(script_dir, "session_cookies.json")
+
+# Chromium runs as its own long-lived process with DevTools on this port.
+# The script attaches to it, so a restarted script takes over the running
+# browser and its tabs instead of starting a new one (dashboard_browser.py).
+# The port is 9222 plus a block per user (kiosk accounts on one host must not
+# share a browser); $DASHBOARD_DEVTOOLS_PORT overrides it
+DEVTOOLS_PORT = default_devtools_port()
+
+# Chromium keeps its profile in BROWSER_PROFILE_DIR across restarts, with a
+# disk cache of at most BROWSER_CACHE_MB for Superset's static assets, so a
+# reload does not download the JS bundles again (empty: a fresh profile on
+# every start). Requests matching BLOCKED_URLS (telemetry, web fonts,
+# avatars) are never sent (see dashboard_network.py)
+BROWSER_PROFILE_DIR = os.path.join(script_dir, "chromium-profile")
+BROWSER_CACHE_MB = 100
+BLOCKED_URLS = DEFAULT_BLOCKED_URLS
 
 REFRESH_INTERVAL_MINUTES = 5
-CLEANUP_INTERVAL_MINUTES = 30
+# The visible dashboard must complete a chart-data request within the
+# refresh interval plus this grace period; charts stuck loading (or in
+# error) for CHART_STUCK_SECONDS are re-queried on their own
+REFRESH_GRACE_SECONDS = 60
+CHART_STUCK_SECONDS = 120
+# Recycle the browser at the next rotation boundary once Chromium's whole
+# process tree (PSS) grows past this budget
+MEMORY_BUDGET_MB = 1536
+MEMORY_SAMPLE_INTERVAL_SECONDS = 60
 SWITCH_INTERVAL_MINUTES = 15
-DASHBOARD_CHECK_INTERVAL_SECONDS = 60  # how often we check the time
+DASHBOARD_CHECK_INTERVAL_SECONDS = 60  # how often the visible dashboard is health-checked
 
-# ----------------- UTILS -----------------
+# Optional schedule settings per dashboard, in the same order as DASHBOARDS
+# (see dashboard_schedule.py; with config.toml they go in [[dashboards]]), e.g.
+#   {"weight": 2}                                  twice as long on screen
+#   {"windows": ["07:00-18:00"]}                   only rotates in office hours
+#   {"cron": ["0 8 * * 1-5"], "dwell_minutes": 10, "weight": 0}
+#                                                  only at 08:00 on weekdays
+SCHEDULE_RULES = [{}, {}, {}, {}]
+TIMELINE_PREVIEW_HOURS = 6  # upcoming timeline published in the status file
+
+# Deadlines for the readiness waits (generous for Raspberry Pis; on fast
+# machines the waits return as soon as Superset is actually ready)
+LOGIN_TIMEOUT_SECONDS = 60
+DASHBOARD_READY_TIMEOUT_SECONDS = 120
+UI_STEP_TIMEOUT_SECONDS = 10
+
+# Recovery ladder: show the dashboard again, reload it, re-open the tabs,
+# log in again, restart Chromium. Attempts back off exponentially (with
+# jitter) up to the maximum; a tier that fails RECOVERY_BREAKER_FAILURES
+# times in a row is skipped for the cool-down. The kiosk never gives up.
+RECOVERY_BASE_DELAY_SECONDS = 2
+RECOVERY_MAX_DELAY_SECONDS = 300
+RECOVERY_BREAKER_FAILURES = 3
+RECOVERY_BREAKER_COOLDOWN_SECONDS = 15 * 60
+
+# Keep every dashboard open in its own tab (configured once) and rotate by
+# switching tabs instead of reloading. Set to False for one-tab rotation.
+PREWARM_TABS = True
+
+# Without pre-warmed tabs: load the next dashboard in a background tab this
+# many seconds before its slot starts and swap it in at the boundary (0 turns
+# this off). Skipped while the browser is above PREFETCH_MEMORY_LIMIT of its
+# memory budget.
+PREFETCH_SECONDS = 45
+PREFETCH_MEMORY_LIMIT = 0.85
+
+# Build fullscreen and the collapsed filter bar into the dashboard URL (one
+# navigation); the click workflow is only used if that is not verified
+USE_URL_FAST_PATH = True
+# Superset has no URL parameter for auto-refresh. Set this to True if the
+# dashboards' own refresh frequency is saved (Edit properties) to skip the modal.
+REFRESH_SAVED_ON_DASHBOARD = False
+# Instead of the auto-refresh timer, poll the Superset API every
+# FRESHNESS_POLL_SECONDS and refresh a dashboard only when its charts or
+# datasets changed (see dashboard_freshness.py); 0 keeps auto-refresh.
+# Dashboards are refreshed at least every FRESHNESS_MAX_AGE_MINUTES anyway.
+FRESHNESS_POLL_SECONDS = 0
+FRESHNESS_MAX_AGE_MINUTES = 60
+
+# Capture a JPEG of each healthy dashboard at most every
+# SNAPSHOT_INTERVAL_MINUTES and, while Superset is unreachable, show the
+# latest one with a "data as of" note instead of Chromium's error page.
+# 0 turns this off.
+SNAPSHOT_INTERVAL_MINUTES = 10
+SNAPSHOT_QUALITY = 60
+SNAPSHOT_DIR = os.path.join(script_dir, "snapshots")
+
+# Probe the Superset host in-process (see dashboard_connectivity.py): every
+# CONNECTIVITY_CHECK_SECONDS while it answers, backing off to at most
+# CONNECTIVITY_MAX_BACKOFF_SECONDS between probes while it does not
+CONNECTIVITY_CHECK_SECONDS = 30
+CONNECTIVITY_MAX_BACKOFF_SECONDS = 15
+
+# Look at a tiny screenshot after each health check (see dashboard_screen.py)
+# and reload a screen that is blank, only shows a spinner, or has not
+# changed (and renders no frames) for FROZEN_REFRESH_INTERVALS refreshes
+SCREEN_CHECK = True
+FROZEN_REFRESH_INTERVALS = 3
+
+# Stagger the fleet's load on Superset (see dashboard_stagger.py): instead
+# of Superset's auto-refresh timer, the visible dashboard is refreshed every
+# REFRESH_INTERVAL_MINUTES at this kiosk's own phase, give or take
+# STAGGER_JITTER_SECONDS, and the rotation boundaries are shifted by up to
+# ROTATION_STAGGER_SECONDS. Both phases come from DEVICE_ID (empty:
+# $DASHBOARD_DEVICE_ID, else the machine ID and host name); kiosks that must
+# switch in step share one DEVICE_ID.
+STAGGER_REFRESH = True
+STAGGER_JITTER_SECONDS = 15
+ROTATION_STAGGER_SECONDS = 60
+DEVICE_ID = ""
+
+# config.toml [section] key -> the setting above it overrides. Settings
+# missing from the file keep the defaults above.
+CONFIG_SETTINGS = {
+    ("rotation", "switch_interval_minutes"): "SWITCH_INTERVAL_MINUTES",
+    ("rotation", "check_interval_seconds"): "DASHBOARD_CHECK_INTERVAL_SECONDS",
+    ("rotation", "refresh_interval_minutes"): "REFRESH_INTERVAL_MINUTES",
+    ("rotation", "prewarm_tabs"): "PREWARM_TABS",
+    ("rotation", "prefetch_seconds"): "PREFETCH_SECONDS",
+    ("rotation", "use_url_fast_path"): "USE_URL_FAST_PATH",
+    ("rotation", "refresh_saved_on_dashboard"): "REFRESH_SAVED_ON_DASHBOARD",
+    ("rotation", "freshness_poll_seconds"): "FRESHNESS_POLL_SECONDS",
+    ("rotation", "freshness_max_age_minutes"): "FRESHNESS_MAX_AGE_MINUTES",
+    ("timeouts", "login_seconds"): "LOGIN_TIMEOUT_SECONDS",
+    ("timeouts", "dashboard_ready_seconds"): "DASHBOARD_READY_TIMEOUT_SECONDS",
+    ("timeouts", "ui_step_seconds"): "UI_STEP_TIMEOUT_SECONDS",
+    ("memory", "budget_mb"): "MEMORY_BUDGET_MB",
+    ("memory", "sample_interval_seconds"): "MEMORY_SAMPLE_INTERVAL_SECONDS",
+    ("snapshots", "interval_minutes"): "SNAPSHOT_INTERVAL_MINUTES",
+    ("snapshots", "quality"): "SNAPSHOT_QUALITY",
+    ("connectivity", "check_interval_seconds"): "CONNECTIVITY_CHECK_SECONDS",
+    ("connectivity", "max_backoff_seconds"): "CONNECTIVITY_MAX_BACKOFF_SECONDS",
+    ("screen", "enabled"): "SCREEN_CHECK",
+    ("screen", "frozen_refresh_intervals"): "FROZEN_REFRESH_INTERVALS",
+    ("stagger", "refresh"): "STAGGER_REFRESH",
+    ("stagger", "jitter_seconds"): "STAGGER_JITTER_SECONDS",
+    ("stagger", "rotation_spread_seconds"): "ROTATION_STAGGER_SECONDS",
+    ("stagger", "device_id"): "DEVICE_ID",
+    ("browser", "profile_dir"): "BROWSER_PROFILE_DIR",
+    ("browser", "cache_size_mb"): "BROWSER_CACHE_MB",
+    ("browser", "blocked_urls"): "BLOCKED_URLS",
+}
+SETTING_DEFAULTS = {name: globals()[name] for name in CONFIG_SETTINGS.values()}
+
+
+def apply_settings(config):
+    """Apply config.toml's settings and selectors; returns the names of the settings that changed."""
+    changed = set()
+    for (section, key), name in CONFIG_SETTINGS.items():
+        value = config[section].get(key, SETTING_DEFAULTS[name])
+        if globals()[name] != value:
+            globals()[name] = value
+            changed.add(name)
+    apply_selectors(config["selectors"])
+    return changed
+
+
+def build_schedule(dashboards, switch_interval_minutes):
+    """The rotation schedule, shifted by this kiosk's offset; credentials.txt dashboards get SCHEDULE_RULES."""
+    if CONFIG is None:
+        dashboards = [dict(dashboard, **rules) for dashboard, rules in zip(dashboards, SCHEDULE_RULES)]
+    offset = rotation_offset_seconds(device_id(DEVICE_ID), ROTATION_STAGGER_SECONDS)
+    return Schedule(dashboards, switch_interval_minutes, offset_seconds=offset)
 
-def log_message(message: str):
-    with open("python_log.txt", "a") as log_file:
-        log_file.write(f"{datetime.now()}: {message}\n")
 
+if CONFIG is not None:
+    apply_settings(CONFIG)
+SCHEDULE = build_schedule(DASHBOARDS, SWITCH_INTERVAL_MINUTES)
+
+# ----------------- UTILS -----------------
 
 def cleanup_memory():
     gc.collect()
     log_message("Memory cleanup performed")
 
 
+def refresh_mode():
+    """
+    What refreshes the dashboards: the freshness poller ("freshness"), their
+    saved refresh frequency ("saved"), the staggered schedule ("schedule")
+    or Superset's auto-refresh timer ("auto").
+    """
+    if FRESHNESS_POLL_SECONDS:
+        return "freshness"
+    if REFRESH_SAVED_ON_DASHBOARD:
+        return "saved"
+    return "schedule" if STAGGER_REFRESH else "auto"
+
+
+def uses_auto_refresh():
+    """Whether dashboards get Superset's auto-refresh timer."""
+    return refresh_mode() == "auto"
+
+
+def expected_refresh_seconds():
+    """How often the health check expects the visible dashboard's charts to refresh."""
+    if FRESHNESS_POLL_SECONDS:
+        return FRESHNESS_MAX_AGE_MINUTES * 60 + FRESHNESS_POLL_SECONDS
+    if refresh_mode() == "schedule":
+        # Two jittered refreshes can be this far apart
+        return REFRESH_INTERVAL_MINUTES * 60 + 2 * STAGGER_JITTER_SECONDS
+    return REFRESH_INTERVAL_MINUTES * 60
+
+
 # ----------------- BROWSER INIT -----------------
 
-def initialise_browser():
-    options = Options()
-    options.add_argument("--start-fullscreen")
-    options.add_argument("--disable-session-crashed-bubble")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-  
-    prefs = {
+BROWSER = KioskBrowser(
+    ["/usr/bin/chromium-browser", "/usr/bin/chromium"],           # Plug-and-Play for our AMD and ARM setup
+    [
+        "--start-fullscreen",
+        "--disable-session-crashed-bubble",
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        # Let the hidden pre-warmed tabs keep their auto-refresh timers on schedule
+        "--disable-background-timer-throttling",
+    ],
+    prefs={
         "credentials_enable_service": False,
         "profile.password_manager_enabled": False,
-    }
-    options.add_experimental_option("prefs", prefs)
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    },
+    port=DEVTOOLS_PORT,
+    driver_path="/usr/bin/chromedriver",
+    start_url=splash_url("Connecting to Superset..."),
+    profile_dir=BROWSER_PROFILE_DIR,
+    cache_size_mb=BROWSER_CACHE_MB,
+)
 
-    service = Service("/usr/bin/chromedriver")
+# Time to the first dashboard, and the work done in parallel to get there
+# (see dashboard_boot.py)
+BOOT = BootPipeline()
 
-    binaries = ["/usr/bin/chromium-browser", "/usr/bin/chromium"]           # Plug-and-Play for our AMD and ARM setup
-    last_error = None
-    for binary in binaries:
-        options.binary_location = binary
-        try:
-            driver = webdriver.Chrome(service=service, options=options)
-            log_message(f"Started browser with binary: {binary}")
-            return driver
-        except WebDriverException as e:
-            log_message(f"Failed to start with {binary}: {e}")
-            last_error = e
 
-    raise RuntimeError(f"Could not start Chromium with any known binary: {binaries}. Last error: {last_error}")
+@timed_step("browser_start")
+def initialise_browser():
+    """Attach to the running kiosk browser, starting it first if there is none."""
+    driver = BROWSER.connect()
+    install_request_tracker(driver)
+    install_request_blocking(driver, BLOCKED_URLS)
+    return driver
+
+def recycle_browser(driver):
+    """Replace a browser that has grown past its memory budget."""
+    log_message("Recycling browser to release Chromium memory.")
+    increment("browser_restarts", reason="memory")
+    BROWSER.terminate(driver)
+    cleanup_memory()
+    return initialise_browser()
+
+
+def check_memory(watchdog, driver):
+    """Sample Chromium's memory if due; True when the budget has been crossed."""
+    if not watchdog.due():
+        return False
+    sample = watchdog.sample(driver)
+    if sample is None:
+        return False
+    set_gauge("browser_pss_bytes", int(sample["pss_mb"] * 1024 * 1024))
+    set_gauge("browser_rss_bytes", int(sample["rss_mb"] * 1024 * 1024))
+    set_gauge("browser_processes", sample["processes"])
+    log_message(
+        f"Browser memory: PSS {sample['pss_mb']:.0f} MB, RSS {sample['rss_mb']:.0f} MB "
+        f"across {sample['processes']} processes (budget {watchdog.budget_mb} MB, "
+        f"trend {watchdog.growth_mb_per_hour():+.0f} MB/h)."
+    )
+    return watchdog.over_budget
 
 # ----------------- WORKFLOW HELPERS -----------------
 
+@timed_step("login_to_superset")
 def login_to_superset(driver):
     """Open login page and sign in once."""
     driver.get(SUPERSET_LOGIN_URL)
-    log_message("Opened Superset login page.")
-    time.sleep(5)
+    elapsed = wait_for_login_form(driver, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Opened Superset login page (form ready after {elapsed:.1f}s).")
 
     username_field = driver.find_element(By.NAME, "username")
     password_field = driver.find_element(By.NAME, "password")
@@ -104,8 +371,30 @@ def login_to_superset(driver):
     password_field.send_keys(PASSWORD)
     password_field.send_keys(Keys.RETURN)
 
-    time.sleep(15)
-    log_message("Logged in successfully.")
+    elapsed = wait_for_login_redirect(driver, SUPERSET_LOGIN_URL, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Logged in successfully (redirected after {elapsed:.1f}s).")
+
+
+@timed_step("ensure_logged_in")
+def ensure_logged_in(driver):
+    """
+    Reuse the cached Superset session if it is still valid; only type the
+    credentials when Superset rejects it.
+    """
+    cookies = load_session(SESSION_FILE)
+    # While booting, the session was checked as soon as Superset answered
+    if BOOT.session_valid(SUPERSET_BASE_URL, cookies):
+        inject_session(driver, cookies, SUPERSET_BASE_URL)
+        log_message(f"Reused cached Superset session ({len(cookies)} cookies). Skipped login.")
+        BOOT.mark("logged_in")
+        return
+
+    if cookies:
+        log_message("Cached Superset session was rejected. Logging in again.")
+    login_to_superset(driver)
+    saved = save_session(driver, SESSION_FILE)
+    log_message(f"Saved Superset session ({saved} cookies) to {SESSION_FILE}.")
+    BOOT.mark("logged_in")
 
 def safe_click(driver, xpath, description, timeout=10):
     """Click something if it exists; otherwise just log and continue."""
@@ -117,10 +406,26 @@ def safe_click(driver, xpath, description, timeout=10):
         log_message(description)
         return True
     except (TimeoutException, NoSuchElementException) as e:
-        log_message(f"Skipped '{description}': {e}")
+        log_message(f"Skipped '{description}' ({xpath}): {e}")
+        increment("safe_click_failures", step=description)
         return False
 
 
+def wait_for_dashboard(driver, title):
+    """Wait for the dashboard to render; a slow chart is logged, not fatal."""
+    try:
+        timings = wait_for_dashboard_ready(driver, DASHBOARD_READY_TIMEOUT_SECONDS)
+        transfer = record_page_load(driver, timings["total"])
+        log_message(
+            f"Dashboard '{title}' ready in {timings['total']:.1f}s "
+            f"(grid {timings['grid']:.1f}s, charts {timings['charts']:.1f}s, "
+            f"network {timings['network']:.1f}s); {describe_transfer(transfer)}."
+        )
+    except TimeoutException as e:
+        log_message(f"WARNING: Dashboard '{title}' not fully ready: {e}")
+
+
+@timed_step("enter_fullscreen")
 def enter_fullscreen(driver):
     # Open menu
     opened = safe_click(
@@ -131,16 +436,23 @@ def enter_fullscreen(driver):
     if not opened:
         return
 
-    time.sleep(5)
-
     # Click "Enter fullscreen"
-    safe_click(
+    if not safe_click(
         driver,
         "//li[contains(text(), 'Enter fullscreen')]",
         "Entered fullscreen mode."
-    )
+    ):
+        return
+
+    # Superset reloads the dashboard in standalone mode
+    try:
+        elapsed = wait_for_url_contains(driver, "standalone", UI_STEP_TIMEOUT_SECONDS)
+        log_message(f"Standalone view loaded after {elapsed:.1f}s.")
+    except TimeoutException as e:
+        log_message(f"WARNING: Fullscreen URL not observed: {e}")
 
 
+@timed_step("set_auto_refresh")
 def set_auto_refresh(driver, minutes=5):
     # Open settings menu
     opened = safe_click(
@@ -151,8 +463,6 @@ def set_auto_refresh(driver, minutes=5):
     if not opened:
         return
 
-    time.sleep(5)
-
     # Click "Set auto-refresh interval"
     if not safe_click(
         driver,
@@ -161,15 +471,12 @@ def set_auto_refresh(driver, minutes=5):
     ):
         return
 
-    time.sleep(5)
-
     # Open dropdown
     safe_click(
         driver,
         "//div[@aria-label='Refresh interval']",
         "Refresh interval dropdown opened."
     )
-    time.sleep(2)
 
     # Select "5 minutes"
     safe_click(
@@ -177,15 +484,17 @@ def set_auto_refresh(driver, minutes=5):
         f"//div[@class='ant-select-item-option-content' and text()='{minutes} minutes']",
         f"{minutes} minutes interval selected."
     )
-    time.sleep(1)
 
     # Save for this session
-    safe_click(
+    if safe_click(
         driver,
         "//button[contains(@class, 'superset-button-primary')]//span[text()='Save for this session']/parent::button",
         "Auto-refresh interval saved for this session."
-    )
-    time.sleep(1)
+    ):
+        try:
+            wait_for_invisible(driver, ".ant-modal", UI_STEP_TIMEOUT_SECONDS)
+        except TimeoutException as e:
+            log_message(f"WARNING: Auto-refresh modal did not close: {e}")
 
     # Close settings menu
     safe_click(
@@ -194,6 +503,7 @@ def set_auto_refresh(driver, minutes=5):
         "Settings menu closed after auto-refresh setup."
     )
 
+@timed_step("collapse_filters")
 def collapse_filters(driver):
     # This XPath is based our current Superset theme in 4.1.2; we should adjust this when updates are made in future.
     safe_click(
@@ -214,109 +524,831 @@ def clear_tooltips(driver):
     except Exception as e:
         log_message(f"Could not clear tooltips: {e}")
 
+@timed_step("switch_to_dashboard")
 def switch_to_dashboard(driver, dashboard):
     """Open a specific dashboard and apply fullscreen + auto-refresh."""
     title = dashboard["title"]
     url = dashboard["url"]
 
+    if is_mosaic(dashboard):
+        log_message(f"Switching to mosaic '{title}' ({len(dashboard['tiles'])} tiles)")
+        open_mosaic(driver, SUPERSET_BASE_URL, dashboard, DASHBOARD_READY_TIMEOUT_SECONDS)
+        return
+
     log_message(f"Switching to dashboard '{title}' -> {url}")
-    driver.get(url)
-    time.sleep(10)  # wait for Superset to render
+    fast = False
+    if USE_URL_FAST_PATH:
+        driver.get(build_dashboard_url(url, standalone=True, expand_filters=False))
+        wait_for_dashboard(driver, title)
+        fast = verify_dashboard_state(driver, standalone=True)
+        if not fast:
+            log_message(f"WARNING: URL state not applied for '{title}'. Falling back to the click workflow.")
+
+    if not fast:
+        driver.get(url)
+        wait_for_dashboard(driver, title)  # wait for Superset to render
+
+    configure_dashboard(driver, dashboard, fast)
+
+
+def configure_dashboard(driver, dashboard, fast):
+    """Apply fullscreen, auto-refresh and the collapsed filter bar to the open dashboard."""
+    title = dashboard["title"]
 
     # Ka sanity check che
     if title not in driver.title:
         log_message(f"WARNING: Page title does not contain '{title}'. Actual title: '{driver.title}'")
 
     # Apply shared workflow
-    enter_fullscreen(driver)
-    set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
-    collapse_filters(driver)
+    if not fast:
+        enter_fullscreen(driver)
+        wait_for_dashboard(driver, title)
+    if uses_auto_refresh():
+        set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
+    if not fast:
+        collapse_filters(driver)
     clear_tooltips(driver)
 
+# ----------------- PRE-WARMED TABS -----------------
+
+def dashboard_tab_healthy(driver, dashboard):
+    """Cheap health check for the tab that is currently selected."""
+    try:
+        if is_mosaic(dashboard):
+            return dashboard["title"] in driver.title and mosaic_mounted(driver, dashboard)
+        return dashboard["title"] in driver.title and is_dashboard_mounted(driver)
+    except WebDriverException:
+        return False
+
+
+@timed_step("open_dashboard_tabs")
+def open_dashboard_tabs(driver):
+    """
+    Open every dashboard in its own tab. The current slot's dashboard is
+    opened and configured first, in the visible tab; the others load in
+    background tabs and are configured when they are first shown.
+    Returns (dict of dashboard URL -> window handle, URLs still to configure).
+    """
+    current = get_dashboard_for_time(datetime.now())
+    switch_to_dashboard(driver, current)
+    tabs = {current["url"]: driver.current_window_handle}
+    for dashboard in DASHBOARDS:
+        if dashboard["url"] not in tabs:
+            tabs[dashboard["url"]] = open_background_tab(driver, dashboard_load_url(dashboard))
+    log_message(f"Pre-warmed {len(tabs)} dashboard tabs.")
+    return tabs, set(tabs) - {current["url"]}
+
+
+def close_extra_tabs(driver):
+    """Close every tab but the first, e.g. before opening the dashboard tabs again."""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+
+def dashboard_for_tab(tab):
+    """The dashboard a tab (see describe_tabs) shows, judged by its location, or None."""
+    for dashboard in DASHBOARDS:
+        if is_mosaic(dashboard):
+            # Mosaics are written into the /health page and carry their title
+            if tab["url"].startswith(mosaic_host_url(SUPERSET_BASE_URL)) and tab["title"] == dashboard["title"]:
+                return dashboard
+        elif dashboard_page(tab["url"]) == dashboard_page(dashboard["url"]):
+            return dashboard
+    return None
+
+
+@timed_step("adopt_tabs")
+def adopt_tabs(driver):
+    """
+    Take over the dashboard tabs of a browser that outlived the last run,
+    as they are: no reload, no login. Returns (tabs, URL of the visible
+    dashboard), or None when the browser does not show what the config
+    expects; the setup then runs again in the same browser.
+    """
+    found, visible = {}, None
+    for tab in describe_tabs(driver):
+        dashboard = dashboard_for_tab(tab)
+        if dashboard is None or dashboard["url"] in found:
+            continue
+        found[dashboard["url"]] = tab["handle"]
+        if tab["visible"]:
+            visible = dashboard
+    wanted = DASHBOARDS if PREWARM_TABS else [visible]
+    if visible is None or any(d["url"] not in found for d in wanted):
+        log_message("The running browser does not show the configured dashboards. Setting them up again.")
+        return None
+
+    tabs = {d["url"]: found[d["url"]] for d in wanted}
+    for handle in driver.window_handles:
+        if handle not in tabs.values():
+            close_tab(driver, handle)  # a prefetch or an offline page of the last run
+    for handle in tabs.values():
+        # The tracker and blocklist for future page loads went with the last run's DevTools session
+        driver.switch_to.window(handle)
+        install_request_tracker(driver)
+        install_request_blocking(driver, BLOCKED_URLS)
+    driver.switch_to.window(tabs[visible["url"]])
+    if not dashboard_tab_healthy(driver, visible):
+        log_message(f"Tab for '{visible['title']}' failed its health check. Setting the dashboards up again.")
+        return None
+    log_message(f"Took over {len(tabs)} dashboard tab(s) of the running browser, showing '{visible['title']}'.")
+    return (tabs if PREWARM_TABS else {}), visible
+
+
+@timed_step("show_dashboard_tab")
+def show_dashboard_tab(driver, tabs, dashboard):
+    """
+    Bring an already configured dashboard tab to the front. The tab is only
+    reloaded (or re-opened) when its own health check fails.
+    """
+    title = dashboard["title"]
+    start = time.monotonic()
+    try:
+        driver.switch_to.window(tabs[dashboard["url"]])
+    except (KeyError, NoSuchWindowException):
+        log_message(f"Tab for '{title}' is missing. Opening a new one.")
+        driver.switch_to.new_window("tab")
+        install_request_tracker(driver)
+        install_request_blocking(driver, BLOCKED_URLS)
+        switch_to_dashboard(driver, dashboard)
+        tabs[dashboard["url"]] = driver.current_window_handle
+
+    # switch_to.window only changes the WebDriver target; make it visible too
+    driver.execute_cdp_cmd("Page.bringToFront", {})
+
+    if not dashboard_tab_healthy(driver, dashboard):
+        log_message(f"Tab for '{title}' failed its health check. Reloading it.")
+        switch_to_dashboard(driver, dashboard)
+
+    elapsed_ms = (time.monotonic() - start) * 1000
+    log_message(f"Showing dashboard '{title}' (switched in {elapsed_ms:.0f} ms).")
+
+def new_health_monitor(dashboard):
+    """The refresh-health monitor of a dashboard (of each tile, for a mosaic)."""
+    if is_mosaic(dashboard):
+        return MosaicMonitor(dashboard, expected_refresh_seconds(), REFRESH_GRACE_SECONDS, CHART_STUCK_SECONDS)
+    return RefreshHealthMonitor(expected_refresh_seconds(), REFRESH_GRACE_SECONDS, CHART_STUCK_SECONDS)
+
+
+def new_health_monitors():
+    """One refresh-health monitor per dashboard, keyed by URL."""
+    return {d["url"]: new_health_monitor(d) for d in DASHBOARDS}
+
+
+def api_dashboards():
+    """The dashboards the Superset API can be asked about (mosaic tiles refresh on their own)."""
+    return [d for d in DASHBOARDS if not is_mosaic(d)]
+
+
+def new_screen_monitor():
+    """The blank/frozen screen detector for the visible dashboard, or None when it is off."""
+    if not SCREEN_CHECK:
+        return None
+    return ScreenMonitor(FROZEN_REFRESH_INTERVALS * expected_refresh_seconds())
+
+
+def new_freshness_poller():
+    """The data-freshness poller, or None when the dashboards use auto-refresh."""
+    if not FRESHNESS_POLL_SECONDS:
+        return None
+    return FreshnessPoller(
+        SupersetApi(SUPERSET_BASE_URL), api_dashboards(), FRESHNESS_POLL_SECONDS, FRESHNESS_MAX_AGE_MINUTES * 60
+    )
+
+
+def new_refresh_scheduler():
+    """The staggered refresh schedule, or None when something else refreshes the dashboards."""
+    if refresh_mode() != "schedule":
+        return None
+    return RefreshScheduler(
+        REFRESH_INTERVAL_MINUTES * 60, phase(device_id(DEVICE_ID), "refresh"), STAGGER_JITTER_SECONDS
+    )
+
+
+# ----------------- NEXT-SLOT PREFETCH -----------------
+
+def open_background_tab(driver, url):
+    """
+    Open url in a new tab that stays behind the visible one (switch_to.window
+    would bring it to the front). Returns its window handle.
+    """
+    before = set(driver.window_handles)
+    target_id = driver.execute_cdp_cmd("Target.createTarget", {"url": url, "background": True})["targetId"]
+    handles = driver.window_handles
+    if target_id in handles:
+        return target_id
+    new_handles = [h for h in handles if h not in before]
+    if not new_handles:
+        raise WebDriverException(f"Background tab for {url} did not appear.")
+    return new_handles[0]
+
+
+def close_tab(driver, handle):
+    """Close a tab without switching to it."""
+    try:
+        driver.execute_cdp_cmd("Target.closeTarget", {"targetId": handle})
+    except WebDriverException as e:
+        log_message(f"Could not close tab {handle}: {e}")
+
+
+def dashboard_load_url(dashboard):
+    """The URL a dashboard is first opened with."""
+    if is_mosaic(dashboard):
+        return mosaic_host_url(SUPERSET_BASE_URL)  # the grid is written into it once the tab is selected
+    if USE_URL_FAST_PATH:
+        return build_dashboard_url(dashboard["url"], standalone=True, expand_filters=False)
+    return dashboard["url"]
+
+
+@timed_step("prefetch_dashboard")
+def prefetch_dashboard(driver, dashboard):
+    """Start loading a dashboard in a background tab; returns the tab's handle."""
+    handle = open_background_tab(driver, dashboard_load_url(dashboard))
+    log_message(f"Prefetching dashboard '{dashboard['title']}' in a background tab.")
+    increment("prefetches")
+    return handle
+
+
+@timed_step("swap_in_dashboard")
+def swap_in_dashboard(driver, dashboard, handle):
+    """Show a prefetched tab and close the one it replaces."""
+    start = time.monotonic()
+    previous = driver.current_window_handle
+    driver.switch_to.window(handle)
+    driver.execute_cdp_cmd("Page.bringToFront", {})
+    if previous != handle:
+        close_tab(driver, previous)
+    elapsed_ms = (time.monotonic() - start) * 1000
+    log_message(f"Showing prefetched dashboard '{dashboard['title']}' (swapped in {elapsed_ms:.0f} ms).")
+
+    configure_background_tab(driver, dashboard)
+
+
+def configure_background_tab(driver, dashboard):
+    """Configure a dashboard that was loaded in a background tab, now that it is selected."""
+    # Background tabs are created without the request tracker
+    install_request_tracker(driver)
+    install_request_blocking(driver, BLOCKED_URLS)
+    if is_mosaic(dashboard):
+        open_mosaic(driver, SUPERSET_BASE_URL, dashboard, DASHBOARD_READY_TIMEOUT_SECONDS, navigate=False)
+        return
+    wait_for_dashboard(driver, dashboard["title"])
+    fast = USE_URL_FAST_PATH and verify_dashboard_state(driver, standalone=True)
+    configure_dashboard(driver, dashboard, fast)
+
 # ----------------- TIME-BASED ROTATION -----------------
 
 def get_dashboard_for_time(now: datetime):
     """
     Decide which dashboard should be visible at this moment.
 
-    Rotation is based on REAL clock time:
-    - We compute total minutes since midnight.
-    - We divide by SWITCH_INTERVAL_MINUTES to get a "slot" number.
-    - That slot picks the dashboard index (cycled with modulo).
+    Rotation is based on REAL clock time: SCHEDULE precomputes the day's
+    timeline from midnight (weights, dwell times, windows and cron rules),
+    so every kiosk with the same schedule shows the same dashboard.
     """
+    return SCHEDULE.slot_at(now)["dashboard"]
+
+
+def get_next_slot(now: datetime):
+    """The dashboard for the slot after the current one, and when that slot starts."""
+    slot = SCHEDULE.next_slot(now)
+    return slot["dashboard"], slot["start"]
+
 
-    # Total minutes since midnight (local time)
-    total_minutes = now.hour * 60 + now.minute
+def publish_timeline(now: datetime):
+    """Put the upcoming timeline in the status file for inspection."""
+    set_info(timeline=describe_timeline(SCHEDULE.timeline(now, hours=TIMELINE_PREVIEW_HOURS)))
 
-    # Which "time slot" are we in? (e.g. with 60 min: 0,1,2,... per hour)
-    slot = total_minutes // SWITCH_INTERVAL_MINUTES
 
-    # Map that slot to a dashboard index
-    idx = slot % len(DASHBOARDS)
+def seconds_until_next_event(now: datetime, next_health_check: datetime):
+    """Sleep time until the next slot boundary, prefetch or health check, whichever is first."""
+    starts_at = SCHEDULE.next_transition(now)
+    events = [starts_at, next_health_check]
+    if not PREWARM_TABS and PREFETCH_SECONDS:
+        events.append(starts_at - timedelta(seconds=PREFETCH_SECONDS))
+    upcoming = [(e - now).total_seconds() for e in events if e > now]
+    # Wake a moment after the event so the new slot is already current
+    return min(u + 0.05 for u in upcoming) if upcoming else 0.05
 
-    return DASHBOARDS[idx]
+# ----------------- CONFIG RELOAD -----------------
+
+def reload_config():
+    """
+    Re-read config.toml and apply it to the settings and the schedule.
+    Returns what changed for the browser to catch up with, or None when the
+    new file is invalid (the running configuration is kept).
+    """
+    global CONFIG, DASHBOARDS, SCHEDULE, USERNAME, PASSWORD, SUPERSET_LOGIN_URL, SUPERSET_BASE_URL
+    try:
+        new = load_config(CONFIG_FILE)
+        switch_minutes = new["rotation"].get("switch_interval_minutes", SETTING_DEFAULTS["SWITCH_INTERVAL_MINUTES"])
+        build_schedule(new["dashboards"], switch_minutes)  # rejects invalid schedule settings
+    except (ConfigError, ValueError) as e:
+        log_message(f"ERROR: Invalid configuration, keeping the current one: {e}")
+        increment("config_reloads", outcome="invalid")
+        return None
+
+    sections = changed_sections(CONFIG, new)
+    old_by_url = {d["url"]: d for d in DASHBOARDS}
+    new_urls = {d["url"] for d in new["dashboards"]}
+    changes = {
+        "sections": sections,
+        "settings": apply_settings(new),
+        "added": [d for d in new["dashboards"] if d["url"] not in old_by_url],
+        "removed": [d for d in DASHBOARDS if d["url"] not in new_urls],
+        "retitled": [d for d in new["dashboards"]
+                     if d["url"] in old_by_url and old_by_url[d["url"]]["title"] != d["title"]],
+    }
+    CONFIG, DASHBOARDS = new, new["dashboards"]
+    # Built again now that the [stagger] settings of the new file apply
+    SCHEDULE = build_schedule(DASHBOARDS, SWITCH_INTERVAL_MINUTES)
+    USERNAME = new["superset"]["username"]
+    PASSWORD = new["superset"]["password"]
+    SUPERSET_LOGIN_URL = new["superset"]["login_url"]
+    SUPERSET_BASE_URL = superset_base_url(SUPERSET_LOGIN_URL)
+
+    increment("config_reloads", outcome="applied")
+    summary = ", ".join(sorted(sections)) or "nothing"
+    log_message(f"Reloaded {CONFIG_FILE} (changed: {summary}).")
+    return changes
+
+# ----------------- OFFLINE SNAPSHOTS -----------------
+
+def new_snapshot_store():
+    """The snapshot store, or None when snapshots are off."""
+    if not SNAPSHOT_INTERVAL_MINUTES:
+        return None
+    return SnapshotStore(SNAPSHOT_DIR, SNAPSHOT_INTERVAL_MINUTES * 60, SNAPSHOT_QUALITY)
+
+
+@timed_step("offline")
+def show_offline_snapshots(driver, snapshots, connectivity):
+    """
+    Superset is unreachable: show the last snapshot of the dashboard for the
+    current slot, in a tab of its own, until Superset answers again.
+    """
+    log_message("Superset is unreachable. Showing last-known-good snapshots until it is back.")
+    increment("outages")
+    set_info(offline_since=datetime.now().isoformat())
+    start = time.monotonic()
+    previous, offline_tab, shown = None, None, None
+    while not connectivity.online:
+        dashboard = get_dashboard_for_time(datetime.now())
+        if shown != dashboard["url"]:
+            shown = dashboard["url"]  # the rotation goes on, with snapshots
+            try:
+                if offline_tab is None:
+                    previous = driver.current_window_handle
+                    driver.switch_to.new_window("tab")
+                    offline_tab = driver.current_window_handle
+                driver.get(snapshots.offline_page(dashboard, DASHBOARDS))
+                driver.execute_cdp_cmd("Page.bringToFront", {})
+            except WebDriverException as e:
+                log_message(f"Could not show the snapshot of '{dashboard['title']}': {e}")
+        export_metrics()
+        # Back online, or the next slot's snapshot is due
+        connectivity.wait_online(min(seconds_until_next_event(datetime.now(), datetime.max), 60))
+
+    log_message(f"Superset is reachable again after {time.monotonic() - start:.0f}s. Going live.")
+    set_info(offline_since=None)
+    if offline_tab is not None:
+        close_tab(driver, offline_tab)
+        try:
+            driver.switch_to.window(previous)
+        except WebDriverException:
+            pass  # the recovery that follows shows the dashboard again
+
+# ----------------- RECOVERY -----------------
+
+@timed_step("reload_dashboard")
+def reload_dashboard(driver, dashboard):
+    """Soft recovery: reload the visible page. The URL keeps fullscreen."""
+    if is_mosaic(dashboard):
+        open_mosaic(driver, SUPERSET_BASE_URL, dashboard, DASHBOARD_READY_TIMEOUT_SECONDS)
+        if not dashboard_tab_healthy(driver, dashboard):
+            raise WebDriverException(f"Mosaic '{dashboard['title']}' is still not healthy after a reload.")
+        return driver
+    driver.refresh()
+    wait_for_dashboard(driver, dashboard["title"])
+    if uses_auto_refresh():
+        set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
+    clear_tooltips(driver)
+    if not dashboard_tab_healthy(driver, dashboard):
+        raise WebDriverException(f"Dashboard '{dashboard['title']}' is still not healthy after a reload.")
+    return driver
+
+
+def restart_browser(driver, workflow):
+    """Last resort: a new Chromium, then the full setup."""
+    increment("browser_restarts", reason="error")
+    BROWSER.terminate(driver)
+    cleanup_memory()
+    new_driver = initialise_browser()
+    try:
+        return workflow.run(new_driver)
+    except Exception:
+        BROWSER.terminate(new_driver)
+        raise
 
 # ----------------- MAIN LOOP -----------------
 
 def load_dashboard():
+    # Probe Superset and check the cached session while Chromium starts
+    connectivity = ConnectivityProbe(
+        SUPERSET_LOGIN_URL, CONNECTIVITY_CHECK_SECONDS, max_backoff_seconds=CONNECTIVITY_MAX_BACKOFF_SECONDS
+    ).start()
+    BOOT.check_session(SUPERSET_BASE_URL, load_session(SESSION_FILE), connectivity.wait_online)
     driver = initialise_browser()
-    retries = 0
-    max_retries = 1
-
-    last_cleanup_time = datetime.now()
+    BOOT.mark("browser")
+    watchdog = MemoryWatchdog(MEMORY_BUDGET_MB, MEMORY_SAMPLE_INTERVAL_SECONDS)
+    recycle_pending = False
     current_dashboard_url = None
+    tabs = {}
+    health_monitors = new_health_monitors()
+    prefetch = None  # {"url": ..., "handle": ...} of the next dashboard, loading in the background
+    prefetch_skipped_for = None
+    next_health_check = datetime.now()
+    # Tabs still to be configured when they are next shown (after a config reload)
+    needs_configure = set()
+    freshness = new_freshness_poller()
+    refresher = new_refresh_scheduler()
+    mode = refresh_mode()
+    snapshots = new_snapshot_store()
+    screen = new_screen_monitor()
+    stale_data = {}  # hidden dashboard URL -> why it needs a refresh when next shown
+    watcher = ConfigWatcher(CONFIG_FILE) if CONFIG is not None else None
+    log_stagger(device_id(DEVICE_ID), SCHEDULE.offset.total_seconds(), refresher)
+
+    def open_tabs(driver):
+        nonlocal tabs, health_monitors
+        close_extra_tabs(driver)
+        tabs, pending = open_dashboard_tabs(driver)
+        health_monitors = new_health_monitors()
+        needs_configure.clear()
+        needs_configure.update(pending)
+
+    def show_current_dashboard(driver):
+        """Bring the dashboard for this time slot on screen and check it."""
+        nonlocal current_dashboard_url, prefetch
+        now = datetime.now()
+        dashboard = get_dashboard_for_time(now)
+        prefetched, prefetch = prefetch, None
+        if PREWARM_TABS:
+            show_dashboard_tab(driver, tabs, dashboard)
+            if dashboard["url"] in needs_configure:
+                needs_configure.discard(dashboard["url"])
+                configure_background_tab(driver, dashboard)
+        elif prefetched and prefetched["url"] == dashboard["url"]:
+            swap_in_dashboard(driver, dashboard, prefetched["handle"])
+            health_monitors[dashboard["url"]].reset()
+        else:
+            if prefetched:
+                close_tab(driver, prefetched["handle"])
+            switch_to_dashboard(driver, dashboard)
+            health_monitors[dashboard["url"]].reset()
+        if not dashboard_tab_healthy(driver, dashboard):
+            raise WebDriverException(f"Dashboard '{dashboard['title']}' failed its health check.")
+        if screen is not None:
+            screen.reset()
+        if freshness is not None and not PREWARM_TABS:
+            freshness.mark_refreshed(dashboard["url"])  # just loaded
+        elif PREWARM_TABS and dashboard["url"] in stale_data:
+            refresh_data(driver, dashboard, stale_data[dashboard["url"]])
+        if dashboard["url"] != current_dashboard_url:
+            current_dashboard_url = dashboard["url"]
+            increment("dashboard_switches")
+            set_info(current_dashboard=dashboard["title"], switched_at=now.isoformat())
+
+    def reload_current_dashboard(driver):
+        dashboard = get_dashboard_for_time(datetime.now())
+        reload_dashboard(driver, dashboard)
+        health_monitors[dashboard["url"]].reset()
+        if screen is not None:
+            screen.reset()
+        return driver
+
+    def reauthenticate(driver):
+        clear_session(SESSION_FILE)
+        clear_browser_session(driver)
+        return workflow.run(driver)
+
+    def refresh_data(driver, dashboard, reason):
+        """Refresh the visible dashboard: on schedule, or because its data changed (or got too old)."""
+        if reason == "data":
+            log_message(f"Data behind '{dashboard['title']}' changed. Refreshing it.")
+        elif reason != "schedule":
+            log_message(f"'{dashboard['title']}' not refreshed for {FRESHNESS_MAX_AGE_MINUTES} min. Refreshing it.")
+        if refresh_dashboard(driver):
+            stale_data.pop(dashboard["url"], None)
+            if reason == "schedule":
+                increment("scheduled_refreshes")
+                return
+            freshness.mark_refreshed(dashboard["url"])
+            increment("freshness_refreshes", reason=reason)
+        elif reason == "schedule":
+            # A dashboard that stopped refreshing is the health check's job
+            log_message(f"Scheduled refresh of '{dashboard['title']}' failed.")
+            increment("scheduled_refreshes_failed")
+
+    def refresh_on_schedule(driver):
+        """This kiosk's turn to refresh: the visible dashboard now, hidden tabs when they are next shown."""
+        refresher.mark_refreshed()
+        plain = {d["url"] for d in api_dashboards()}  # mosaics refresh their tiles themselves
+        dashboard = get_dashboard_for_time(datetime.now())
+        if dashboard["url"] == current_dashboard_url and dashboard["url"] in plain:
+            refresh_data(driver, dashboard, "schedule")
+        if PREWARM_TABS:
+            for url in tabs:
+                if url != current_dashboard_url and url in plain:
+                    stale_data.setdefault(url, "schedule")
+
+    def refresh_changed_dashboards(driver):
+        """Poll the Superset API; refresh the visible dashboard now and hidden tabs when shown."""
+        freshness.api.set_cookies(browser_cookies(driver, SUPERSET_BASE_URL))
+        for url, reason in freshness.poll().items():
+            if url == current_dashboard_url:
+                refresh_data(driver, get_dashboard_for_time(datetime.now()), reason)
+            elif PREWARM_TABS:
+                stale_data[url] = reason
+
+    def apply_config_changes(driver, changes):
+        """Bring the running browser in line with a reloaded config.toml, touching only what changed."""
+        nonlocal tabs, health_monitors, current_dashboard_url, prefetch, freshness, refresher, mode, snapshots, screen
+        settings = changes["settings"]
+        if settings & {"SNAPSHOT_INTERVAL_MINUTES", "SNAPSHOT_QUALITY"}:
+            snapshots = new_snapshot_store()
+        if "SCREEN_CHECK" in settings:
+            screen = new_screen_monitor()
+        elif screen is not None:
+            # Keep its frame history; only the frozen threshold follows the refresh settings
+            screen.frozen_seconds = FROZEN_REFRESH_INTERVALS * expected_refresh_seconds()
+        connectivity.check_interval_seconds = CONNECTIVITY_CHECK_SECONDS
+        connectivity.max_backoff_seconds = CONNECTIVITY_MAX_BACKOFF_SECONDS
+        if "superset" in changes["sections"]:
+            connectivity.set_target(SUPERSET_LOGIN_URL)
+        watchdog.budget_mb = MEMORY_BUDGET_MB
+        watchdog.sample_interval_seconds = MEMORY_SAMPLE_INTERVAL_SECONDS
+        for monitor in health_monitors.values():
+            monitor.refresh_interval_seconds = expected_refresh_seconds()
+        if freshness is not None:
+            freshness.set_dashboards(api_dashboards())
+            freshness.poll_interval_seconds = FRESHNESS_POLL_SECONDS or freshness.poll_interval_seconds
+            freshness.max_age_seconds = FRESHNESS_MAX_AGE_MINUTES * 60
+        for dashboard in changes["retitled"]:
+            log_message(f"Dashboard {dashboard['url']} is now titled '{dashboard['title']}'.")
+        # A new profile directory or cache size from the next browser start
+        BROWSER.profile_dir, BROWSER.cache_size_mb = BROWSER_PROFILE_DIR, BROWSER_CACHE_MB
+        if "BLOCKED_URLS" in settings:
+            visible = driver.current_window_handle
+            for handle in driver.window_handles:
+                driver.switch_to.window(handle)
+                install_request_blocking(driver, BLOCKED_URLS)
+            driver.switch_to.window(visible)
+
+        mode_changed = refresh_mode() != mode
+        mode = refresh_mode()
+        if mode_changed or settings & {"REFRESH_INTERVAL_MINUTES", "STAGGER_JITTER_SECONDS", "DEVICE_ID"}:
+            refresher = new_refresh_scheduler()
+        if "superset" in changes["sections"] or "PREWARM_TABS" in settings or mode_changed:
+            # Another Superset login, tab mode or refresh mode: set up again in the same browser
+            log_message("Superset login, tab mode or refresh mode changed. Setting up the dashboards again.")
+            if "superset" in changes["sections"]:
+                clear_session(SESSION_FILE)
+                clear_browser_session(driver)
+            close_extra_tabs(driver)
+            tabs, health_monitors, prefetch, current_dashboard_url = {}, new_health_monitors(), None, None
+            if freshness is not None:
+                freshness.api.close()
+            freshness = new_freshness_poller()
+            stale_data.clear()
+            workflow.steps = setup_steps()
+            workflow.run(driver)
+            publish_timeline(datetime.now())
+            return
+
+        for dashboard in changes["added"]:
+            log_message(f"Dashboard '{dashboard['title']}' added. Opening it in a background tab.")
+            health_monitors[dashboard["url"]] = new_health_monitor(dashboard)
+            if PREWARM_TABS:
+                tabs[dashboard["url"]] = open_background_tab(driver, dashboard_load_url(dashboard))
+                needs_configure.add(dashboard["url"])
+
+        removed = [d["url"] for d in changes["removed"]]
+        if current_dashboard_url in removed:
+            show_current_dashboard(driver)  # move off it before its tab closes
+        for dashboard in changes["removed"]:
+            log_message(f"Dashboard '{dashboard['title']}' removed. Closing its tab.")
+            url = dashboard["url"]
+            health_monitors.pop(url, None)
+            needs_configure.discard(url)
+            stale_data.pop(url, None)
+            if url in tabs:
+                close_tab(driver, tabs.pop(url))
+        if prefetch and prefetch["url"] in removed:
+            close_tab(driver, prefetch["handle"])
+            prefetch = None
+
+        if settings & {"REFRESH_INTERVAL_MINUTES", "REFRESH_SAVED_ON_DASHBOARD"} and uses_auto_refresh():
+            # The visible dashboard now; hidden tabs when they are next shown
+            plain = {d["url"] for d in api_dashboards()}  # mosaics refresh their tiles themselves
+            needs_configure.update(url for url in tabs if url != current_dashboard_url and url in plain)
+            if current_dashboard_url in plain:
+                set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
+        publish_timeline(datetime.now())
+
+    # Login once per (successful) browser session, then the tabs; the
+    # verification step shows the dashboard for the current time slot
+    def setup_steps():
+        steps = [("ensure_logged_in", ensure_logged_in)]
+        if PREWARM_TABS:
+            steps.append(("open_dashboard_tabs", open_tabs))
+        return steps
+
+    workflow = Workflow(setup_steps(), show_current_dashboard)
+
+    def while_offline(driver):
+        """Every recovery needs Superset: show the snapshots (or just wait) while it is unreachable."""
+        if snapshots is not None:
+            show_offline_snapshots(driver, snapshots, connectivity)
+        else:
+            connectivity.wait_until_online()
+
+    def online(action):
+        return when_online(connectivity, action, while_offline)
+
+    ladder = RecoveryLadder(
+        {
+            "retry_step": online(workflow.resume),
+            "reload": online(reload_current_dashboard),
+            "renavigate": online(lambda driver: workflow.run(driver, start=1)),
+            "reauth": online(reauthenticate),
+            "restart": online(lambda driver: restart_browser(driver, workflow)),
+        },
+        base_delay_seconds=RECOVERY_BASE_DELAY_SECONDS,
+        max_delay_seconds=RECOVERY_MAX_DELAY_SECONDS,
+        breaker_threshold=RECOVERY_BREAKER_FAILURES,
+        breaker_cooldown_seconds=RECOVERY_BREAKER_COOLDOWN_SECONDS,
+    )
+    needs_setup = True
+    error = None
+
+    # A browser that outlived the last run keeps showing its dashboards
+    adopted = adopt_tabs(driver) if BROWSER.attached else None
+    if adopted is not None:
+        tabs, visible = adopted
+        current_dashboard_url = visible["url"]
+        set_info(current_dashboard=visible["title"], switched_at=datetime.now().isoformat())
+        publish_timeline(datetime.now())
+        needs_setup = False
 
     while True:
         try:
-            # 1) Login once per (successful) browser session
-            login_to_superset(driver)
-            current_dashboard_url = None
+            if error is not None:
+                # Take the cheapest recovery that works; a stalled page (or one
+                # that lost Superset) starts at a reload
+                first_tier = "reload" if isinstance(error, (DashboardStalled, SupersetUnreachable)) else None
+                recovered = ladder.recover(driver, error, first_tier)
+                if recovered is not driver:
+                    watchdog.reset()
+                    recycle_pending = False
+                    prefetch = None
+                driver, error, needs_setup = recovered, None, False
+            elif needs_setup:
+                connectivity.wait_until_online()
+                BOOT.mark("superset_reachable", connectivity.online_since)
+                set_splash_status(driver, "Opening the dashboards...")
+                workflow.run(driver)
+                needs_setup = False
 
+            BOOT.finish()
             while True:
+                if connectivity.online is False:
+                    raise SupersetUnreachable(f"Superset at {connectivity.target} does not answer.")
                 now = datetime.now()
-
                 dashboard = get_dashboard_for_time(now)
 
-                # Only switch when the *target* URL changes (i.e., a new top-of-hour)
+                # Only switch when the *target* URL changes (i.e., a new time slot)
                 if dashboard["url"] != current_dashboard_url:
-                    switch_to_dashboard(driver, dashboard)
-                    current_dashboard_url = dashboard["url"]
+                    # Recycle an over-budget browser at the boundary, where
+                    # the screen is about to change anyway
+                    if recycle_pending:
+                        driver = recycle_browser(driver)
+                        watchdog.reset()
+                        recycle_pending = False
+                        prefetch = None
+                        workflow.run(driver)
+                    else:
+                        show_current_dashboard(driver)
+                    publish_timeline(now)
+                    next_health_check = now + timedelta(seconds=DASHBOARD_CHECK_INTERVAL_SECONDS)
+                elif now >= next_health_check:
+                    if PREWARM_TABS and not dashboard_tab_healthy(driver, dashboard):
+                        raise WebDriverException(f"Visible tab for '{dashboard['title']}' failed its health check.")
+                    # Re-query stuck or failed charts; raises DashboardStalled
+                    # if the dashboard stopped refreshing
+                    health = health_monitors[dashboard["url"]].check_and_repair(driver)
+                    # A blank, spinner-only or frozen screen raises ScreenStalled (a reload)
+                    looks = screen.check_and_raise(driver) if screen is not None else None
+                    # Keep a last-known-good snapshot of a dashboard that is fully healthy
+                    healthy = not (health["stuck"] or health["errored"] or health["stale"])
+                    healthy = healthy and (screen is None or (looks is not None and looks["kind"] is None))
+                    if snapshots is not None and healthy and snapshots.due(dashboard):
+                        snapshots.capture(driver, dashboard)
+                    next_health_check = now + timedelta(seconds=DASHBOARD_CHECK_INTERVAL_SECONDS)
 
-                time.sleep(60)
+                # Refresh dashboards whose data changed (instead of auto-refresh)
+                if freshness is not None and freshness.due():
+                    refresh_changed_dashboards(driver)
+                # ...or at this kiosk's staggered refresh time
+                if refresher is not None and refresher.due():
+                    refresh_on_schedule(driver)
 
-        except (NoSuchElementException, TimeoutException, WebDriverException) as e:
-            log_message(f"Error encountered: {e}. Retrying with a new browser...")
-            cleanup_memory()
-            retries += 1
-            if retries > max_retries:
-                log_message("Max retries reached. Exiting...")
-                break
-            time.sleep(30)
-            try:
-                driver.quit()
-            except Exception:
-                pass
-            driver = initialise_browser()
+                if not recycle_pending and check_memory(watchdog, driver):
+                    log_message(
+                        f"Browser memory over budget ({MEMORY_BUDGET_MB} MB). "
+                        "Recycling at the next dashboard switch."
+                    )
+                    recycle_pending = True
+
+                # Warm up the next slot's dashboard in the background, unless
+                # memory is tight (then it simply loads at the boundary)
+                if not PREWARM_TABS and PREFETCH_SECONDS:
+                    next_dashboard, starts_at = get_next_slot(datetime.now())
+                    memory_tight = recycle_pending or watchdog.near_budget(PREFETCH_MEMORY_LIMIT)
+                    if prefetch and memory_tight:
+                        log_message(f"Memory is tight. Cancelling the prefetch of '{next_dashboard['title']}'.")
+                        close_tab(driver, prefetch["handle"])
+                        prefetch = None
+                        increment("prefetches_cancelled")
+                    elif (prefetch is None
+                          and next_dashboard["url"] != current_dashboard_url
+                          and (starts_at - datetime.now()).total_seconds() <= PREFETCH_SECONDS):
+                        if not memory_tight:
+                            prefetch = {
+                                "url": next_dashboard["url"],
+                                "handle": prefetch_dashboard(driver, next_dashboard),
+                            }
+                        elif prefetch_skipped_for != starts_at:
+                            log_message(f"Memory is tight. Not prefetching '{next_dashboard['title']}'.")
+                            prefetch_skipped_for = starts_at
+                            increment("prefetches_cancelled")
+
+                export_metrics()
+                # Sleep until exactly the next slot boundary, prefetch or health
+                # check; an edit to config.toml or losing Superset wakes us up early
+                wait_seconds = seconds_until_next_event(datetime.now(), next_health_check)
+                if freshness is not None:
+                    wait_seconds = min(wait_seconds, freshness.seconds_until_due() + 0.05)
+                if refresher is not None:
+                    wait_seconds = min(wait_seconds, refresher.seconds_until_due() + 0.05)
+                if watcher is None:
+                    connectivity.wait_for_change(wait_seconds)
+                elif watcher.wait(wait_seconds, wake=[connectivity]):
+                    changes = reload_config()
+                    if changes is not None:
+                        apply_config_changes(driver, changes)
+                else:
+                    connectivity.wait_for_change(0)  # consume the wake-up, if that was one
 
         except KeyboardInterrupt:
             log_message("Dashboard rotation shutdown by user.")
+            connectivity.stop()
+            if watcher is not None:
+                watcher.close()
+            if freshness is not None:
+                freshness.api.close()
             cleanup_memory()
-            try:
-                driver.quit()
-            except Exception:
-                pass
+            BROWSER.terminate(driver)  # any other exit leaves the browser for the next run
             break
 
+        except SystemExit:
+            # SIGTERM from the supervisor or systemd
+            log_message("Dashboard rotation shutdown by SIGTERM.")
+            connectivity.stop()
+            if watcher is not None:
+                watcher.close()
+            if freshness is not None:
+                freshness.api.close()
+            raise  # leaves the browser for the next run
+
         except Exception as e:
-            log_message(f"Unexpected error: {e}. Exiting...")
+            if not isinstance(e, (NoSuchElementException, TimeoutException, WebDriverException, SupersetUnreachable)):
+                log_message(f"Unexpected error: {type(e).__name__}: {e}")
+            increment("retries")
             cleanup_memory()
-            try:
-                driver.quit()
-            except Exception:
-                pass
-            break
+            error = e
 
 # ----------------- ENTRY POINT -----------------
 
 if __name__ == "__main__":
-    load_dashboard()
+    # The supervisor and systemd stop the kiosk with SIGTERM; exit cleanly so the log is flushed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if "--timeline" in sys.argv[1:]:
+        # Print the upcoming rotation instead of starting the kiosk
+        for slot in describe_timeline(SCHEDULE.timeline(datetime.now(), hours=24)):
+            print(f"{slot['start']}  {slot['end']}  {slot['reason']:<8}  {slot['title']}")
+    else:
+        load_dashboard()
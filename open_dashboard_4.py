@@ -0,0 +1,463 @@
+import asyncio
+import os
+import signal
+import sys
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from datetime import datetime
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.action_chains import ActionChains
+
+from dashboard_readiness import (
+    install_request_tracker,
+    is_dashboard_mounted,
+    wait_for_dashboard_ready,
+    wait_for_invisible,
+    wait_for_login_form,
+    wait_for_login_redirect,
+    wait_for_url_contains,
+)
+from dashboard_boot import BootPipeline, splash_url
+from dashboard_browser import KioskBrowser, default_devtools_port
+from dashboard_config import ConfigError, apply_selectors, load_config
+from dashboard_connectivity import ConnectivityProbe
+from dashboard_fleet import BrowserHost, Fleet, Screen, SharedSession
+from dashboard_health import RefreshHealthMonitor, refresh_dashboard
+from dashboard_log import log_message
+from dashboard_metrics import increment, timed_step
+from dashboard_mosaic import is_mosaic
+from dashboard_network import DEFAULT_BLOCKED_URLS, describe_transfer, install_request_blocking, record_page_load
+from dashboard_schedule import Schedule, describe_timeline
+from dashboard_session import load_session, superset_base_url
+from dashboard_stagger import RefreshScheduler, device_id, log_stagger, phase, rotation_offset_seconds
+from dashboard_url_state import build_dashboard_url, verify_dashboard_state
+
+# ----------------- CONFIG -----------------
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# The fleet needs config.toml (see config.example.toml): its [[screens]] say
+# which dashboards rotate on which display. Without [[screens]] there is one
+# screen on $DISPLAY rotating through every dashboard.
+CONFIG_FILE = os.environ.get("DASHBOARD_CONFIG_FILE", os.path.join(script_dir, "config.toml"))
+
+CONFIG = load_config(CONFIG_FILE)
+USERNAME = CONFIG["superset"]["username"]
+PASSWORD = CONFIG["superset"]["password"]
+SUPERSET_LOGIN_URL = CONFIG["superset"]["login_url"]
+SUPERSET_BASE_URL = superset_base_url(SUPERSET_LOGIN_URL)
+SCREENS = CONFIG["screens"] or [{"name": "main", "dashboards": CONFIG["dashboards"]}]
+
+# Cached Superset session cookies (chmod 600, not tracked in git), shared by every screen
+SESSION_FILE = os.path.join(script_dir, "session_cookies.json")
+
+# One Chromium per X display, with DevTools on DEVTOOLS_PORT, DEVTOOLS_PORT + 1, ...
+# in the order the displays first appear in [[screens]] (see dashboard_browser.py).
+# DEVTOOLS_PORT is 9222 plus a block of 10 per user; $DASHBOARD_DEVTOOLS_PORT overrides it
+DEVTOOLS_PORT = default_devtools_port()
+
+# Every browser keeps its profile in BROWSER_PROFILE_DIR/<DevTools port>
+# across restarts, with a disk cache of at most BROWSER_CACHE_MB for
+# Superset's static assets, so a reload does not download the JS bundles
+# again (empty: a fresh profile on every start). Requests matching
+# BLOCKED_URLS (telemetry, web fonts, avatars) are never sent (see
+# dashboard_network.py)
+BROWSER_PROFILE_DIR = os.path.join(script_dir, "chromium-profile")
+BROWSER_CACHE_MB = 100
+BLOCKED_URLS = DEFAULT_BLOCKED_URLS
+
+REFRESH_INTERVAL_MINUTES = 5
+# The visible dashboard must complete a chart-data request within the
+# refresh interval plus this grace period; charts stuck loading (or in
+# error) for CHART_STUCK_SECONDS are re-queried on their own
+REFRESH_GRACE_SECONDS = 60
+CHART_STUCK_SECONDS = 120
+# Recycle a browser at the next dashboard switch once its process tree
+# (PSS) grows past this budget; every window of the browser counts
+MEMORY_BUDGET_MB = 1536
+MEMORY_SAMPLE_INTERVAL_SECONDS = 60
+SWITCH_INTERVAL_MINUTES = 15  # default for screens without switch_interval_minutes
+DASHBOARD_CHECK_INTERVAL_SECONDS = 60  # how often every screen is health-checked
+
+# Deadlines for the readiness waits (generous for Raspberry Pis; on fast
+# machines the waits return as soon as Superset is actually ready)
+LOGIN_TIMEOUT_SECONDS = 60
+DASHBOARD_READY_TIMEOUT_SECONDS = 120
+UI_STEP_TIMEOUT_SECONDS = 10
+
+# Recovery ladder per screen: reload the dashboard, open it again, log in
+# again, restart the screen's browser (see dashboard_recovery.py)
+RECOVERY_BASE_DELAY_SECONDS = 2
+RECOVERY_MAX_DELAY_SECONDS = 300
+RECOVERY_BREAKER_FAILURES = 3
+RECOVERY_BREAKER_COOLDOWN_SECONDS = 15 * 60
+
+# Build fullscreen and the collapsed filter bar into the dashboard URL (one
+# navigation); the click workflow is only used if that is not verified
+USE_URL_FAST_PATH = True
+# Superset has no URL parameter for auto-refresh. Set this to True if the
+# dashboards' own refresh frequency is saved (Edit properties) to skip the modal.
+REFRESH_SAVED_ON_DASHBOARD = False
+
+# One probe of the Superset host for the whole fleet (see dashboard_connectivity.py)
+CONNECTIVITY_CHECK_SECONDS = 30
+CONNECTIVITY_MAX_BACKOFF_SECONDS = 15
+
+# Stagger the load on Superset (see dashboard_stagger.py): instead of
+# Superset's auto-refresh timer, every screen's dashboard is refreshed every
+# REFRESH_INTERVAL_MINUTES at a phase of its own, give or take
+# STAGGER_JITTER_SECONDS, and the whole fleet's rotation is shifted by up to
+# ROTATION_STAGGER_SECONDS (its screens still switch together). The phases
+# come from DEVICE_ID (empty: $DASHBOARD_DEVICE_ID, else the machine ID and
+# host name).
+STAGGER_REFRESH = True
+STAGGER_JITTER_SECONDS = 15
+ROTATION_STAGGER_SECONDS = 60
+DEVICE_ID = ""
+
+# config.toml [section] key -> the setting above it overrides. Settings
+# missing from the file keep the defaults above.
+CONFIG_SETTINGS = {
+    ("rotation", "switch_interval_minutes"): "SWITCH_INTERVAL_MINUTES",
+    ("rotation", "check_interval_seconds"): "DASHBOARD_CHECK_INTERVAL_SECONDS",
+    ("rotation", "refresh_interval_minutes"): "REFRESH_INTERVAL_MINUTES",
+    ("rotation", "use_url_fast_path"): "USE_URL_FAST_PATH",
+    ("rotation", "refresh_saved_on_dashboard"): "REFRESH_SAVED_ON_DASHBOARD",
+    ("timeouts", "login_seconds"): "LOGIN_TIMEOUT_SECONDS",
+    ("timeouts", "dashboard_ready_seconds"): "DASHBOARD_READY_TIMEOUT_SECONDS",
+    ("timeouts", "ui_step_seconds"): "UI_STEP_TIMEOUT_SECONDS",
+    ("memory", "budget_mb"): "MEMORY_BUDGET_MB",
+    ("memory", "sample_interval_seconds"): "MEMORY_SAMPLE_INTERVAL_SECONDS",
+    ("connectivity", "check_interval_seconds"): "CONNECTIVITY_CHECK_SECONDS",
+    ("connectivity", "max_backoff_seconds"): "CONNECTIVITY_MAX_BACKOFF_SECONDS",
+    ("stagger", "refresh"): "STAGGER_REFRESH",
+    ("stagger", "jitter_seconds"): "STAGGER_JITTER_SECONDS",
+    ("stagger", "rotation_spread_seconds"): "ROTATION_STAGGER_SECONDS",
+    ("stagger", "device_id"): "DEVICE_ID",
+    ("browser", "profile_dir"): "BROWSER_PROFILE_DIR",
+    ("browser", "cache_size_mb"): "BROWSER_CACHE_MB",
+    ("browser", "blocked_urls"): "BLOCKED_URLS",
+}
+
+for (section, key), name in CONFIG_SETTINGS.items():
+    globals()[name] = CONFIG[section].get(key, globals()[name])
+apply_selectors(CONFIG["selectors"])
+
+for screen in SCREENS:
+    for dashboard in screen["dashboards"]:
+        if is_mosaic(dashboard):
+            raise ConfigError(f"Screen '{screen['name']}': mosaics are not supported by the fleet ('{dashboard['title']}')")
+
+# ----------------- BROWSER INIT -----------------
+
+BROWSER_BINARIES = ["/usr/bin/chromium-browser", "/usr/bin/chromium"]  # Plug-and-Play for our AMD and ARM setup
+BROWSER_ARGUMENTS = [
+    "--start-fullscreen",
+    "--disable-session-crashed-bubble",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    # Every window is on screen somewhere; keep their auto-refresh timers running
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+]
+BROWSER_PREFS = {
+    "credentials_enable_service": False,
+    "profile.password_manager_enabled": False,
+}
+
+# Time to the first dashboards (see dashboard_boot.py)
+BOOT = BootPipeline()
+
+
+def new_host(display, port):
+    """The browser for the screens on one X display."""
+    browser = KioskBrowser(
+        BROWSER_BINARIES,
+        BROWSER_ARGUMENTS,
+        prefs=BROWSER_PREFS,
+        port=port,
+        driver_path="/usr/bin/chromedriver",
+        start_url=splash_url("Connecting to Superset..."),
+        display=display,
+        # Two browsers cannot share a profile
+        profile_dir=os.path.join(BROWSER_PROFILE_DIR, str(port)) if BROWSER_PROFILE_DIR else None,
+        cache_size_mb=BROWSER_CACHE_MB,
+    )
+    return BrowserHost(display or os.environ.get("DISPLAY", ":0"), browser, MEMORY_BUDGET_MB,
+                       MEMORY_SAMPLE_INTERVAL_SECONDS, on_connect=prepare_window)
+
+
+def prepare_window(driver):
+    """The request tracker and the blocklist, in each window of a (re)connected browser."""
+    install_request_tracker(driver)
+    install_request_blocking(driver, BLOCKED_URLS)
+
+
+def build_fleet_screens():
+    """The screens, each with its rotation (and refresh schedule), and one browser host per X display."""
+    device = device_id(DEVICE_ID)
+    rotation_offset = rotation_offset_seconds(device, ROTATION_STAGGER_SECONDS)
+    hosts, screens = {}, []
+    for config in SCREENS:
+        display = config.get("display")
+        if display not in hosts:
+            hosts[display] = new_host(display, DEVTOOLS_PORT + len(hosts))
+        schedule = Schedule(
+            config["dashboards"], config.get("switch_interval_minutes", SWITCH_INTERVAL_MINUTES),
+            offset_seconds=rotation_offset,
+        )
+        screen = Screen(config["name"], schedule, config.get("position"), config.get("size"))
+        if uses_scheduled_refresh():
+            screen.refresher = RefreshScheduler(
+                REFRESH_INTERVAL_MINUTES * 60, phase(f"{device}/{screen.name}", "refresh"), STAGGER_JITTER_SECONDS
+            )
+        screen.host = hosts[display]
+        screen.host.screens.append(screen)
+        screens.append(screen)
+    return screens, list(hosts.values())
+
+# ----------------- WORKFLOW HELPERS -----------------
+
+def uses_scheduled_refresh():
+    """Whether the fleet refreshes the dashboards at staggered times (not saved, not auto-refresh)."""
+    return STAGGER_REFRESH and not REFRESH_SAVED_ON_DASHBOARD
+
+
+def uses_auto_refresh():
+    return not REFRESH_SAVED_ON_DASHBOARD and not STAGGER_REFRESH
+
+
+def expected_refresh_seconds():
+    """How often the health check expects a screen's charts to refresh."""
+    if uses_scheduled_refresh():
+        # Two jittered refreshes can be this far apart
+        return REFRESH_INTERVAL_MINUTES * 60 + 2 * STAGGER_JITTER_SECONDS
+    return REFRESH_INTERVAL_MINUTES * 60
+
+
+@timed_step("login_to_superset")
+def login_to_superset(driver):
+    """Open login page and sign in once (for every screen)."""
+    driver.get(SUPERSET_LOGIN_URL)
+    elapsed = wait_for_login_form(driver, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Opened Superset login page (form ready after {elapsed:.1f}s).")
+
+    username_field = driver.find_element(By.NAME, "username")
+    password_field = driver.find_element(By.NAME, "password")
+    username_field.send_keys(USERNAME)
+    password_field.send_keys(PASSWORD)
+    password_field.send_keys(Keys.RETURN)
+
+    elapsed = wait_for_login_redirect(driver, SUPERSET_LOGIN_URL, LOGIN_TIMEOUT_SECONDS)
+    log_message(f"Logged in successfully (redirected after {elapsed:.1f}s).")
+
+
+def safe_click(driver, xpath, description, timeout=10):
+    """Click something if it exists; otherwise just log and continue."""
+    try:
+        elem = WebDriverWait(driver, timeout).until(
+            EC.element_to_be_clickable((By.XPATH, xpath))
+        )
+        elem.click()
+        log_message(description)
+        return True
+    except (TimeoutException, NoSuchElementException) as e:
+        log_message(f"Skipped '{description}' ({xpath}): {e}")
+        increment("safe_click_failures", step=description)
+        return False
+
+
+def wait_for_dashboard(driver, title):
+    """Wait for the dashboard to render; a slow chart is logged, not fatal."""
+    try:
+        timings = wait_for_dashboard_ready(driver, DASHBOARD_READY_TIMEOUT_SECONDS)
+        transfer = record_page_load(driver, timings["total"])
+        log_message(
+            f"Dashboard '{title}' ready in {timings['total']:.1f}s "
+            f"(grid {timings['grid']:.1f}s, charts {timings['charts']:.1f}s, "
+            f"network {timings['network']:.1f}s); {describe_transfer(transfer)}."
+        )
+    except TimeoutException as e:
+        log_message(f"WARNING: Dashboard '{title}' not fully ready: {e}")
+
+
+@timed_step("enter_fullscreen")
+def enter_fullscreen(driver):
+    if not safe_click(driver, "//button[@aria-label='Menu actions trigger']", "Settings menu opened for fullscreen."):
+        return
+    if not safe_click(driver, "//li[contains(text(), 'Enter fullscreen')]", "Entered fullscreen mode."):
+        return
+    # Superset reloads the dashboard in standalone mode
+    try:
+        elapsed = wait_for_url_contains(driver, "standalone", UI_STEP_TIMEOUT_SECONDS)
+        log_message(f"Standalone view loaded after {elapsed:.1f}s.")
+    except TimeoutException as e:
+        log_message(f"WARNING: Fullscreen URL not observed: {e}")
+
+
+@timed_step("set_auto_refresh")
+def set_auto_refresh(driver, minutes=5):
+    if not safe_click(driver, "//button[@aria-label='Menu actions trigger']",
+                      "Settings menu opened for auto-refresh setup."):
+        return
+    if not safe_click(driver, "//span[contains(text(), 'Set auto-refresh interval')]", "Auto-refresh option selected."):
+        return
+    safe_click(driver, "//div[@aria-label='Refresh interval']", "Refresh interval dropdown opened.")
+    safe_click(
+        driver,
+        f"//div[@class='ant-select-item-option-content' and text()='{minutes} minutes']",
+        f"{minutes} minutes interval selected."
+    )
+    if safe_click(
+        driver,
+        "//button[contains(@class, 'superset-button-primary')]//span[text()='Save for this session']/parent::button",
+        "Auto-refresh interval saved for this session."
+    ):
+        try:
+            wait_for_invisible(driver, ".ant-modal", UI_STEP_TIMEOUT_SECONDS)
+        except TimeoutException as e:
+            log_message(f"WARNING: Auto-refresh modal did not close: {e}")
+    safe_click(driver, "//button[@aria-label='Menu actions trigger']", "Settings menu closed after auto-refresh setup.")
+
+
+@timed_step("collapse_filters")
+def collapse_filters(driver):
+    # This XPath is based our current Superset theme in 4.1.2; we should adjust this when updates are made in future.
+    safe_click(driver, "//button[contains(@class, 'superset-button-link')]", "Filter bar collapsed.")
+
+
+def clear_tooltips(driver):
+    """Click in a neutral area to dismiss any hover popovers/tooltips."""
+    try:
+        body = WebDriverWait(driver, 10).until(
+            EC.presence_of_element_located((By.TAG_NAME, "body"))
+        )
+        # Click near the top-left of the page, away from charts/text
+        ActionChains(driver).move_to_element_with_offset(body, 10, 10).click().perform()
+    except Exception as e:
+        log_message(f"Could not clear tooltips: {e}")
+
+# ----------------- SCREEN WORKFLOW -----------------
+
+# Refresh-health monitor of the dashboard on each screen, by screen name
+HEALTH_MONITORS = {}
+
+
+def dashboard_healthy(driver, dashboard):
+    try:
+        return dashboard["title"] in driver.title and is_dashboard_mounted(driver)
+    except WebDriverException:
+        return False
+
+
+@timed_step("switch_to_dashboard")
+def show_dashboard(driver, screen, dashboard):
+    """Open a dashboard in the screen's window and apply fullscreen + auto-refresh."""
+    title = dashboard["title"]
+    screen.log(f"Switching to dashboard '{title}' -> {dashboard['url']}")
+    fast = False
+    if USE_URL_FAST_PATH:
+        driver.get(build_dashboard_url(dashboard["url"], standalone=True, expand_filters=False))
+        wait_for_dashboard(driver, title)
+        fast = verify_dashboard_state(driver, standalone=True)
+        if not fast:
+            screen.log(f"WARNING: URL state not applied for '{title}'. Falling back to the click workflow.")
+    if not fast:
+        driver.get(dashboard["url"])
+        wait_for_dashboard(driver, title)
+        enter_fullscreen(driver)
+        wait_for_dashboard(driver, title)
+    if uses_auto_refresh():
+        set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
+    if not fast:
+        collapse_filters(driver)
+    clear_tooltips(driver)
+    if not dashboard_healthy(driver, dashboard):
+        raise WebDriverException(f"Dashboard '{title}' failed its health check.")
+    HEALTH_MONITORS[screen.name] = RefreshHealthMonitor(
+        expected_refresh_seconds(), REFRESH_GRACE_SECONDS, CHART_STUCK_SECONDS
+    )
+
+
+def reload_dashboard(driver, screen):
+    """Soft recovery: reload the screen's page. The URL keeps fullscreen."""
+    dashboard = screen.dashboard or screen.schedule.slot_at(datetime.now())["dashboard"]
+    driver.refresh()
+    wait_for_dashboard(driver, dashboard["title"])
+    if uses_auto_refresh():
+        set_auto_refresh(driver, minutes=REFRESH_INTERVAL_MINUTES)
+    clear_tooltips(driver)
+    if not dashboard_healthy(driver, dashboard):
+        raise WebDriverException(f"Dashboard '{dashboard['title']}' is still not healthy after a reload.")
+    if screen.name in HEALTH_MONITORS:
+        HEALTH_MONITORS[screen.name].reset()
+
+
+def check_dashboard(driver, screen):
+    """Health check of the dashboard on a screen; re-queries stuck charts, raises DashboardStalled."""
+    if not dashboard_healthy(driver, screen.dashboard):
+        raise WebDriverException(f"Screen '{screen.name}' failed its health check.")
+    HEALTH_MONITORS[screen.name].check_and_repair(driver)
+
+
+def refresh_on_schedule(driver, screen):
+    """The screen's staggered turn to refresh its dashboard."""
+    if refresh_dashboard(driver):
+        increment("scheduled_refreshes", screen=screen.name)
+    else:
+        # A dashboard that stopped refreshing is the health check's job
+        screen.log(f"Scheduled refresh of '{screen.dashboard['title']}' failed.")
+        increment("scheduled_refreshes_failed", screen=screen.name)
+
+# ----------------- MAIN -----------------
+
+def run_fleet():
+    screens, hosts = build_fleet_screens()
+    log_message(
+        f"Fleet: {len(screens)} screens on {len(hosts)} browsers: "
+        + ", ".join(f"{s.name} on {s.host.name}" for s in screens) + "."
+    )
+    log_stagger(device_id(DEVICE_ID), screens[0].schedule.offset.total_seconds())
+    for screen in screens:
+        if screen.refresher is not None:
+            screen.log(f"Refreshing {screen.refresher.describe()}.")
+    # Probe Superset and check the cached session while the browsers start
+    connectivity = ConnectivityProbe(
+        SUPERSET_LOGIN_URL, CONNECTIVITY_CHECK_SECONDS, max_backoff_seconds=CONNECTIVITY_MAX_BACKOFF_SECONDS
+    ).start()
+    BOOT.check_session(SUPERSET_BASE_URL, load_session(SESSION_FILE), connectivity.wait_online)
+    fleet = Fleet(
+        screens,
+        hosts,
+        connectivity,
+        SharedSession(SUPERSET_BASE_URL, SESSION_FILE, login_to_superset, is_valid=BOOT.session_valid),
+        show=show_dashboard,
+        reload=reload_dashboard,
+        check=check_dashboard,
+        refresh=refresh_on_schedule,
+        check_interval_seconds=DASHBOARD_CHECK_INTERVAL_SECONDS,
+        recovery_options={
+            "base_delay_seconds": RECOVERY_BASE_DELAY_SECONDS,
+            "max_delay_seconds": RECOVERY_MAX_DELAY_SECONDS,
+            "breaker_threshold": RECOVERY_BREAKER_FAILURES,
+            "breaker_cooldown_seconds": RECOVERY_BREAKER_COOLDOWN_SECONDS,
+        },
+        boot=BOOT,
+    )
+    asyncio.run(fleet.run())
+
+# ----------------- ENTRY POINT -----------------
+
+if __name__ == "__main__":
+    # The supervisor and systemd stop the kiosk with SIGTERM; exit cleanly so the log is flushed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    if "--timeline" in sys.argv[1:]:
+        # Print every screen's upcoming rotation instead of starting the fleet
+        for screen in build_fleet_screens()[0]:
+            print(f"[{screen.name}]")
+            for slot in describe_timeline(screen.schedule.timeline(datetime.now(), hours=24)):
+                print(f"{slot['start']}  {slot['end']}  {slot['reason']:<8}  {slot['title']}")
+    else:
+        run_fleet()